@@ -1,104 +1,115 @@
 from __future__ import annotations
 
+import heapq
+import itertools
 from collections import deque
-from typing import Callable, Optional, Deque, Literal
+import warnings
+from typing import Callable, Optional, Deque, Literal, Any
 from greenlet import greenlet
 from sortedcontainers import SortedList
-from Desim.Utils import UniquePriorityQueue, ClassProperty, UniqueDeque
+from Desim.Utils import UniquePriorityQueue, ClassProperty, UniqueDeque, BucketPriorityQueue, \
+    invariant_checker, CheckLevel
 
 
-class SimTime:
-    def __init__(self, cycle: int = 0, delta_cycle: int = 1):
-        if not isinstance(cycle, int):
-            raise TypeError("cycle must be an int")
-        if not isinstance(delta_cycle, int):
-            raise TypeError("delta_cycle must be an int")
-        self.cycle = cycle
-        self.delta_cycle = delta_cycle
+_DELTA_BITS = 32
+_DELTA_MASK = (1 << _DELTA_BITS) - 1
 
-    def __eq__(self, other):
-        if isinstance(other, SimTime):
-            return self.cycle == other.cycle and self.delta_cycle == other.delta_cycle
-        return False
-
-    def __ne__(self, other):
-        if isinstance(other, SimTime):
-            return self.cycle != other.cycle or self.delta_cycle != other.delta_cycle
-        return True
 
-    def __lt__(self, other):
-        if isinstance(other, SimTime):
-            if self.cycle == other.cycle:
-                return self.delta_cycle < other.delta_cycle
-            return self.cycle < other.cycle
-        return NotImplemented
+class SimTime(int):
+    """
+    仿真时间, 由 cycle 和 delta cycle 组成
+    内部打包为一个不可变的整数 (cycle << 32) | delta_cycle, 比较和 hash 都直接使用 int 的实现
+    delta_cycle 需要小于 2**32
+    """
+    __slots__ = ()
 
-    def __le__(self, other):
-        if isinstance(other, SimTime):
-            if self.cycle == other.cycle:
-                return self.delta_cycle <= other.delta_cycle
-            return self.cycle <= other.cycle
-        return NotImplemented
-
-    def __gt__(self, other):
-        if isinstance(other, SimTime):
-            if self.cycle == other.cycle:
-                return self.delta_cycle > other.delta_cycle
-            return self.cycle > other.cycle
-        return NotImplemented
+    def __new__(cls, cycle: int = 0, delta_cycle: int = 1):
+        try:
+            raw = (cycle << _DELTA_BITS) | delta_cycle
+        except TypeError:
+            raise TypeError("cycle and delta_cycle must be int") from None
+        interned = _INTERNED.get(raw)
+        if interned is not None:
+            return interned
+        return int.__new__(cls, raw)
 
-    def __ge__(self, other):
-        if isinstance(other, SimTime):
-            if self.cycle == other.cycle:
-                return self.delta_cycle >= other.delta_cycle
-            return self.cycle >= other.cycle
-        return NotImplemented
+    @property
+    def cycle(self) -> int:
+        return int(self) >> _DELTA_BITS
 
-    def __hash__(self):
-        # Combine the hash of cycle and delta_cycle to ensure uniqueness
-        return hash((self.cycle, self.delta_cycle))
+    @property
+    def delta_cycle(self) -> int:
+        return int(self) & _DELTA_MASK
 
     def __repr__(self):
         return f"SimTime(cycle={self.cycle}, delta_cycle={self.delta_cycle})"
-    
+
+    __str__ = __repr__
+
+    def __format__(self, format_spec):
+        return format(repr(self), format_spec)
+
+    def __reduce__(self):
+        return SimTime, (self.cycle, self.delta_cycle)
+
     def __add__(self, other):
-        # if isinstance(other, SimTime):
-        #     new_cycle = self.cycle + other.cycle
-        #     new_delta_cycle = self.delta_cycle + other.delta_cycle
-        #     if new_delta_cycle >= 1:
-        #         new_cycle += new_delta_cycle // 1
-        #         new_delta_cycle = new_delta_cycle % 1
-        #     return SimTime(new_cycle, new_delta_cycle)
-        # return NotImplemented
         if isinstance(other,SimTime):
-            if self.cycle == 0 or other.cycle == 0:
-                new_cycle = self.cycle + other.cycle
-                new_delta_cycle = self.delta_cycle + other.delta_cycle
-            else:
-                new_cycle = self.cycle + other.cycle 
-                new_delta_cycle = 0
-            
-            return SimTime(new_cycle,new_delta_cycle)
-        return NotImplemented
-
+            self_cycle = int(self) >> _DELTA_BITS
+            other_cycle = int(other) >> _DELTA_BITS
+            if self_cycle == 0 or other_cycle == 0:
+                # 直接相加即可, cycle 和 delta cycle 分别相加
+                return _new_sim_time(int(self) + int(other))
+            return _new_sim_time((self_cycle + other_cycle) << _DELTA_BITS)
+        raise TypeError(f"unsupported operand type(s) for +: 'SimTime' and '{type(other).__name__}'")
 
     def __sub__(self, other):
         if isinstance(other,SimTime):
             # delta cycle 是不能减少的
-            if other.cycle == 0 :
-                new_delta_cycle = self.delta_cycle
+            other_cycle = int(other) >> _DELTA_BITS
+            if other_cycle == 0 :
+                new_delta_cycle = int(self) & _DELTA_MASK
             else:
                 new_delta_cycle = 0
-            new_cycle = self.cycle - other.cycle
-            return SimTime(new_cycle,new_delta_cycle)
-        return NotImplemented
+            new_cycle = (int(self) >> _DELTA_BITS) - other_cycle
+            return _new_sim_time((new_cycle << _DELTA_BITS) | new_delta_cycle)
+        raise TypeError(f"unsupported operand type(s) for -: 'SimTime' and '{type(other).__name__}'")
+
+    def __radd__(self, other):
+        raise TypeError(f"unsupported operand type(s) for +: '{type(other).__name__}' and 'SimTime'")
+
+    def __rsub__(self, other):
+        raise TypeError(f"unsupported operand type(s) for -: '{type(other).__name__}' and 'SimTime'")
+
+
+def _new_sim_time(raw: int) -> SimTime:
+    # 直接由打包后的整数构造 SimTime, 跳过 __new__ 中的拆分
+    return int.__new__(SimTime, raw)
+
+
+# 常用的 SimTime(n) / SimTime(n, 0) 预先创建好, 避免重复分配
+_INTERNED: dict[int, SimTime] = {
+    raw: int.__new__(SimTime, raw)
+    for raw in ((cycle << _DELTA_BITS) | delta_cycle for cycle in range(256) for delta_cycle in (0, 1))
+}
 
 
 class SimCoroutine(greenlet):
-    def __init__(self,func:Callable):
+    # greenlet 的 __dict__ 在第一次使用时才创建, 属性全部放在 __slots__ 中时不会创建
+    # bench_scaling.py 中每个挂起的 coroutine 因此少约 90 B
+    __slots__ = ('func','status','_timer_seq','daemon')
+
+    def __init__(self,func:Callable,daemon:bool=False):
         super(SimCoroutine, self).__init__(func)
 
+        self.func:Callable = func # greenlet 启动之后会删除 run, 这里保留一份用于报告
         self.status = "created"
+        self._timer_seq:int = 0 # 当前有效的 timer, 0 表示没有等待 timer
+        # daemon 表示一直循环等待触发的服务进程, 仿真结束时处于等待状态是正常的, 不参与死锁检测
+        self.daemon:bool = daemon
+
+    @property
+    def name(self)->str:
+        return getattr(self.func,'__qualname__',repr(self.func))
 
     def register(self):
         self.status = 'registered'
@@ -110,70 +121,219 @@ class SimCoroutine(greenlet):
 
 
 
+class SimMethod:
+    """
+    类似 systemc 中的 SC_METHOD
+    一个普通的函数, 被触发时由 scheduler 在 evaluate 阶段直接调用, 不需要切换 greenlet
+    函数中不能调用 wait, 只能通过 SimModule.next_trigger 修改下一次触发的条件
+    """
+    __slots__ = ('func','static_events','status','parent','_timer_seq','_dynamic_events')
+
+    # method 不会阻塞, 不参与死锁检测
+    daemon = True
+
+    def __init__(self,func:Callable,static_events:tuple[Event,...]=()):
+        self.func = func
+        self.static_events:tuple[Event,...] = static_events
+
+        self.status = "created"
+        self.parent:Optional[greenlet] = None # 与 SimCoroutine 保持一致, 由 scheduler 设置
+        self._timer_seq:int = 0
+
+        # next_trigger 设置的动态敏感列表, 非 None 时静态敏感列表被暂时移除
+        self._dynamic_events:Optional[tuple[Event,...]] = None
+
+    def register(self):
+        self.status = 'registered'
+
+    def is_registered(self)->bool:
+        return self.status == 'registered'
+
+    @property
+    def name(self)->str:
+        return getattr(self.func,'__qualname__',repr(self.func))
+
+    def switch(self):
+        # 由 scheduler 在 evaluate 阶段调用, 每次触发之后恢复静态敏感列表
+        self.clear_next_trigger()
+
+        scheduler = SimSession.scheduler
+        scheduler.running_method = self
+        try:
+            self.func()
+        finally:
+            scheduler.running_method = None
+
+    def next_trigger(self,*args:Event|SimTime):
+        # 多次调用时以最后一次为准
+        self.clear_next_trigger()
+        if not args:
+            return
+
+        for event in self.static_events:
+            event.remove_static_waiting_coroutine(self)
+        self._dynamic_events = tuple(arg for arg in args if isinstance(arg,Event))
+
+        scheduler = SimSession.scheduler
+        for arg in args:
+            if isinstance(arg,Event):
+                arg.add_waiting_coroutine(self)
+            elif isinstance(arg,SimTime):
+                scheduler.add_timer(self, scheduler.sim_time + arg)
+            else:
+                raise TypeError(f"next_trigger expects Event or SimTime, got {type(arg).__name__}")
+
+    def clear_next_trigger(self):
+        self._timer_seq = 0
+        if self._dynamic_events is None:
+            return
+        for event in self._dynamic_events:
+            event.remove_waiting_coroutine(self)
+        for event in self.static_events:
+            event.add_static_waiting_coroutine(self)
+        self._dynamic_events = None
+
+
 class SimModule:
+    """
+    仿真模块的基类, 通过 register_coroutine / register_method 注册进程
+
+    内存开销 (CPython 3.11, 64 位, 使用 bench_scaling.py 测量, 版本之间可以对比):
+        空的 SimModule                          约 240 B
+        Event (没有等待者)                       约 80 B, 等待者的集合在第一次使用时才创建
+        每个 method (包括 event 中的静态敏感集合)  约 340 B
+        每个已经启动并挂起的 coroutine           约 2.6 KB, 主要是 greenlet 保存的栈
+    大规模的模型中尽量使用 method 实现只做简单响应的逻辑
+    """
     def __init__(self):
-        self._coroutines:set[SimCoroutine] = set() # method 会被改写为 coroutine
+        self._coroutines:list[SimCoroutine|SimMethod] = [] # 包括 coroutine 和 method
 
-        SimSession.sim_modules.append(self)
+        if SimSession.track_modules:
+            SimSession.sim_modules.append(self)
 
 
-    def register_coroutine(self,func:Callable,*events:Event):
-        coroutine = SimCoroutine(func)
-        self._coroutines.add(coroutine)
+    def register_coroutine(self,func:Callable,*events:Event,daemon:bool=False):
+        """
+        :param daemon: 是否为一直循环等待触发的服务进程, daemon 在仿真结束时处于等待状态不会被当作死锁
+        """
+        coroutine = SimCoroutine(func,daemon)
+        self._coroutines.append(coroutine)
         for event in events:
             event.add_static_waiting_coroutine(coroutine)
 
         SimSession.scheduler.add_coroutine(coroutine)
         
         
-    def register_method(self,func:Callable,*events:Event):
-        pass
+    def register_method(self,func:Callable,*events:Event,dont_initialize:bool=False):
+        """
+        注册一个 method, 任意一个 event 触发时直接调用 func
+        :param dont_initialize: 与 systemc 一致, 默认在仿真开始时调用一次, 为 True 时只在触发时调用
+        """
+        method = SimMethod(func,events)
+        self._coroutines.append(method)
+        for event in events:
+            event.add_static_waiting_coroutine(method)
+
+        if dont_initialize:
+            method.register()
+        else:
+            SimSession.scheduler.add_coroutine(method)
+
+    @staticmethod
+    def next_trigger(*args:Event|SimTime):
+        """
+        在 method 中调用, 指定下一次触发的条件 (Event 或者延迟的 SimTime)
+        期间静态敏感列表不生效, 不带参数时恢复静态敏感列表
+        """
+        method = SimSession.scheduler.running_method
+        if method is None:
+            raise RuntimeError("next_trigger can only be called inside a method")
+        method.next_trigger(*args)
 
 
     @staticmethod
-    def wait(*args,**kwargs):
+    def wait(*args,reason:Any=None,**kwargs):
+        """
+        等待任意一个 event 触发
+        :param reason: 等待的对象 (semaphore, fifo, memory request 等), 用于死锁检测时的报告
+        """
+        scheduler = SimSession.scheduler
+        if scheduler.running_method is not None:
+            raise RuntimeError("wait can not be called inside a method, use next_trigger instead")
+
+        coroutine = greenlet.getcurrent()
         for event in args:
             assert isinstance(event,Event)
             # 注册 event 将当前的Coroutine加入到 event的列表中
-            event.add_waiting_coroutine(greenlet.getcurrent()) 
+            event.add_waiting_coroutine(coroutine)
+
+        # 记录等待关系, 用于死锁检测
+        scheduler.blocked[coroutine] = (args,reason)
 
         # 切换出 协程, 切换到指定的 scheduler 的线程
-        SimSession.scheduler.executor_coroutine.switch()
+        scheduler.executor_coroutine.switch()
+
+        del scheduler.blocked[coroutine]
 
         # 切换回来，取消event 当 wait 多个 event 的时候，只要一个 event 触发了，就结束了
         event:Event
         for event in args:
-            event.remove_waiting_coroutine(greenlet.getcurrent())
+            event.remove_waiting_coroutine(coroutine)
         
         # 结束 wait 恢复到协程继续执行
 
 
     @staticmethod
     def wait_time(sim_time:SimTime):
-        event = Event()
-        event.notify(sim_time)
-        SimModule.wait(event)
-
-
-
+        # 纯延迟的等待不需要 Event, 直接在 scheduler 中注册一个只唤醒当前 coroutine 的 timer
+        scheduler = SimSession.scheduler
+        if scheduler.running_method is not None:
+            raise RuntimeError("wait_time can not be called inside a method, use next_trigger instead")
+        coroutine = greenlet.getcurrent()
+        scheduler.add_timer(coroutine, scheduler.sim_time + sim_time)
+        scheduler.executor_coroutine.switch()
+        coroutine._timer_seq = 0
 
+    @staticmethod
+    def wait_cycles(cycles:int):
+        """
+        等待 cycles 个周期, 与 wait_time(SimTime(cycles)) 的语义一致
+        直接在打包后的整数上计算唤醒时间, 不需要构造中间的 SimTime
+        """
+        scheduler = SimSession.scheduler
+        if scheduler.running_method is not None:
+            raise RuntimeError("wait_cycles can not be called inside a method, use next_trigger instead")
+        now = int(scheduler.sim_time)
+        now_cycle = now >> _DELTA_BITS
+        if cycles == 0 or now_cycle == 0:
+            # 与 SimTime.__add__ 一致, 其中一个 cycle 为 0 时 delta cycle 累加
+            wake_time = now + (cycles << _DELTA_BITS) + 1
+        else:
+            wake_time = (now_cycle + cycles) << _DELTA_BITS
+        coroutine = greenlet.getcurrent()
+        scheduler.add_timer(coroutine, _new_sim_time(wake_time))
+        scheduler.executor_coroutine.switch()
+        coroutine._timer_seq = 0
 
 
-    def _method_wrapper(self,func:Callable,events:list[Event]):
-        def method_loop():
-            pass
-        return method_loop
 
 
 
 
 
 class Event:
+    __slots__ = ('_notify_time','_generation','_in_queue','static_waiting_coroutines','waiting_coroutines')
+
     def __init__(self):
         self._notify_time:Optional[SimTime] = None
 
-        self.static_waiting_coroutines:set[SimCoroutine] = set()
-        self.waiting_coroutines:set[SimCoroutine] = set()
+        # 供 HeapEventQueue 使用, generation 不一致的堆元素会在 pop 时被跳过
+        self._generation:int = 0
+        self._in_queue:bool = False
+
+        # 等待的 coroutine 集合在第一次使用时才创建, 大部分 event 只有很少的等待者
+        self.static_waiting_coroutines:Optional[set[SimCoroutine]] = None
+        self.waiting_coroutines:Optional[set[SimCoroutine]] = None
 
     @property
     def notify_time(self):
@@ -183,10 +343,17 @@ class Event:
         # 调用此函数的时候将 event 插入到 event queue中 支持更新操作
         SimSession.scheduler.notify_event(self, SimSession.sim_time + delay_time)
 
+    def queue_notify(self,delay_time:SimTime):
+        """
+        类似 systemc 中的 sc_event_queue, 多次调用不会相互覆盖, 每一个 notify time 都会触发一次
+        所有 pending 的 notify time 直接保存在 scheduler 的 timer queue 中
+        """
+        SimSession.scheduler.queue_event(self, SimSession.sim_time + delay_time)
+
     def cancel(self):
-        # 取消下一次的 notify 操作
-        self.set_notify_time(None)
+        # 取消下一次的 notify 操作, 需要先从 event queue 中删除再清除 notify time
         SimSession.scheduler.cancel_event(self)
+        self.set_notify_time(None)
 
     def wait(self,*args,**kwargs):
         SimModule.wait(*(self,*args),**kwargs)
@@ -198,25 +365,37 @@ class Event:
         return SimSession.sim_time == self.notify_time
 
     def add_static_waiting_coroutine(self,*coroutines:SimCoroutine):
+        if self.static_waiting_coroutines is None:
+            self.static_waiting_coroutines = set()
         for coroutine in coroutines:
             self.static_waiting_coroutines.add(coroutine)
 
+    def remove_static_waiting_coroutine(self,*coroutines:SimCoroutine):
+        if self.static_waiting_coroutines is None:
+            return
+        for coroutine in coroutines:
+            self.static_waiting_coroutines.discard(coroutine)
+
 
     def add_waiting_coroutine(self,*coroutines:SimCoroutine):
         # dynamic
+        if self.waiting_coroutines is None:
+            self.waiting_coroutines = set()
         for coroutine in coroutines:
             self.waiting_coroutines.add(coroutine)
 
     def remove_waiting_coroutine(self,*coroutines:SimCoroutine):
+        if self.waiting_coroutines is None:
+            return
         for coroutine in coroutines:
             self.waiting_coroutines.discard(coroutine)
 
     def get_waiting_coroutines(self)->set[SimCoroutine]:
-        return self.static_waiting_coroutines | self.waiting_coroutines
+        return (self.static_waiting_coroutines or set()) | (self.waiting_coroutines or set())
 
 
     def clear_waiting_coroutine(self):
-        self.waiting_coroutines = set()
+        self.waiting_coroutines = None
 
     def __lt__(self, other):
         if self.notify_time == other.notify_time:
@@ -229,9 +408,6 @@ class Event:
         return self.notify_time > other.notify_time
 
 
-    def __eq__(self, other):
-        return self.notify_time == other.notify_time and (id(self) == id(other))
-
 
     def __le__(self, other):
         if self.notify_time == other.notify_time:
@@ -244,25 +420,181 @@ class Event:
             return id(self) >= id(other)
         return self.notify_time >= other.notify_time
 
+    # __eq__ / __hash__ 使用默认的 id 语义, 便于在 dict/set 中快速查找
 
-    def __ne__(self, other):
-        return self.notify_time != other.notify_time or (id(self) != id(other))
 
-    def __hash__(self):
-        return id(self)
 
+class SortedEventQueue:
+    """
+    基于 UniquePriorityQueue (SortedList) 的 event queue, 按照 Event 的 notify time 排序
+    提供与 BucketPriorityQueue 相同的接口, 供 Scheduler 选择
+    """
+    def __init__(self):
+        self._queue:UniquePriorityQueue[Event] = UniquePriorityQueue()
 
+    def push(self, event:Event, notify_time:SimTime):
+        # 更新 notify time 之前需要先删除, 否则排序就不对了
+        if event in self._queue:
+            self._queue.remove(event)
+        event.set_notify_time(notify_time)
+        self._queue.add(event)
 
-class Scheduler:
+    def discard(self, event:Event):
+        if event in self._queue:
+            self._queue.remove(event)
+
+    def peek_key(self)->SimTime:
+        return self._queue.peek().notify_time
+
+    def pop_min(self)->list[Event]:
+        time = self.peek_key()
+        events = []
+        while self._queue and self._queue.peek().notify_time == time:
+            events.append(self._queue.pop())
+        return events
+
+    def __len__(self)->int:
+        return len(self._queue)
+
+    def __bool__(self)->bool:
+        return bool(self._queue)
+
+    def __contains__(self, event:Event)->bool:
+        return event in self._queue
+
+    def valid_check(self)->bool:
+        return self._queue.valid_check()
+
+
+class HeapEventQueue:
+    """
+    基于 heapq 的 lazy deletion event queue
+    堆中的元素为 (notify_time, seq, event, generation) 的 tuple, SimTime 本身是打包后的 int, 使用原生的比较
+    重新 notify 或者 cancel 的时候只增加 event 的 generation, 旧的元素在 pop 的时候被跳过
+    """
     def __init__(self):
-        self.runnable_queue:UniqueDeque[SimCoroutine] = UniqueDeque()
+        self._heap:list[tuple[SimTime,int,Event,int]] = []
+        self._seq:int = 0
+        self._size:int = 0 # 有效元素的个数
+
+    def push(self, event:Event, notify_time:SimTime):
+        generation = event._generation + 1
+        event._generation = generation
+        if not event._in_queue:
+            event._in_queue = True
+            self._size += 1
+
+        self._seq += 1
+        heapq.heappush(self._heap,(notify_time, self._seq, event, generation))
+
+        # 失效的元素太多时重建堆, 避免内存一直增长
+        if len(self._heap) > 64 and len(self._heap) > 4 * self._size:
+            self._compact()
+
+    def discard(self, event:Event):
+        if event._in_queue:
+            event._in_queue = False
+            event._generation += 1
+            self._size -= 1
+
+    def _drop_stale(self):
+        heap = self._heap
+        while heap and heap[0][2]._generation != heap[0][3]:
+            heapq.heappop(heap)
+
+    def _compact(self):
+        self._heap = [entry for entry in self._heap if entry[2]._generation == entry[3]]
+        heapq.heapify(self._heap)
+
+    def peek_key(self)->SimTime:
+        if not self._size:
+            raise IndexError("优先级队列为空！")
+        self._drop_stale()
+        return self._heap[0][0]
+
+    def pop_min(self)->list[Event]:
+        notify_time = self.peek_key()
+        heap = self._heap
+        events = []
+        while heap and heap[0][0] == notify_time:
+            _, _, event, generation = heapq.heappop(heap)
+            if event._generation == generation:
+                event._in_queue = False
+                events.append(event)
+        self._size -= len(events)
+        return events
+
+    def __len__(self)->int:
+        return self._size
+
+    def __bool__(self)->bool:
+        return self._size > 0
+
+    def __contains__(self, event:Event)->bool:
+        return event._in_queue
+
+    def valid_check(self)->bool:
+        live = [entry for entry in self._heap if entry[2]._generation == entry[3]]
+        assert len(live) == self._size
+        assert len(set(entry[2] for entry in live)) == self._size
+        for notify_time, _, event, _ in live:
+            assert event._in_queue
+            assert event.notify_time == notify_time
+        return True
+
+
+EventQueueBackend = Literal['sorted','calendar','heap']
+
+# timer queue 中 Event.queue_notify 对应元素的 seq 偏移, 保证其 seq 为负数
+_QUEUED_EVENT_SEQ_BASE = 1 << 62
+
+# 死锁报告的大小限制, 大量进程阻塞在同一个 event 上时报告不会随之增长
+_REPORT_MAX_PROCESSES = 20
+_REPORT_MAX_NAMES = 5
+_REPORT_MAX_CHARS = 8000
+
+
+DeadlockPolicy = Literal['warn','raise','ignore']
+
+
+class SimDeadlockError(RuntimeError):
+    """
+    仍有非 daemon 的进程被阻塞, 但是已经没有 event 可以唤醒它们 (或者 watchdog 周期内没有任何进展)
+    report 为 wait-for graph 的文本报告
+    """
+    def __init__(self,report:str):
+        super().__init__(report)
+        self.report = report
+
+
+class Scheduler:
+    # 可选的 event queue 实现, 都提供 push/discard/peek_key/pop_min 接口
+    event_queue_backends:dict[str,type] = {
+        'sorted': SortedEventQueue,
+        'calendar': BucketPriorityQueue,
+        'heap': HeapEventQueue,
+    }
+
+    def __init__(self,event_queue:EventQueueBackend='calendar',
+                 on_deadlock:DeadlockPolicy='warn',watchdog:Optional[int]=None):
+        self.runnable_queue:UniqueDeque[SimCoroutine|SimMethod] = UniqueDeque()
         self.waiting_queue = None
         self.running_coroutine = None
+        self.running_method:Optional[SimMethod] = None # 正在执行的 method, method 在 scheduler 的 greenlet 中执行
 
-        self.event_queue:UniquePriorityQueue[Event] = UniquePriorityQueue()
+        if event_queue not in self.event_queue_backends:
+            raise ValueError(f"unknown event queue backend: {event_queue}")
+        self.event_queue:BucketPriorityQueue[Event]|SortedEventQueue = self.event_queue_backends[event_queue]()
 
         # self.notified_events:deque[Event] = deque()
 
+        # 纯延迟等待使用的 timer, 每个元素只唤醒一个 coroutine
+        # (wake_time, seq, coroutine), seq 与 coroutine._timer_seq 不一致的 timer 已经失效
+        # Event.queue_notify 的多次 notify 也保存在这里, (notify_time, seq - _QUEUED_EVENT_SEQ_BASE, event)
+        # 其 seq 为负数, 不会失效, 同一时间内仍然按照插入顺序排列
+        self.timer_queue:list[tuple[SimTime,int,SimCoroutine|SimMethod|Event]] = []
+        self._timer_seq:int = 0
+
 
         self.sim_time:SimTime = SimTime(0,0)
 
@@ -271,14 +603,78 @@ class Scheduler:
         # self.initialize_coroutine = greenlet(self.initialize)
         self.main_loop_coroutine = greenlet(self.main_loop)
 
-        self.status:Literal['uninitialized','initializing','initialized','running','finished'] = 'uninitialized'
-
-
-    def run(self):
+        self.status:Literal['uninitialized','initializing','initialized','running','paused','finished'] = 'uninitialized'
+
+        # 已经处理的 event 和 timer 的数量
+        self.event_count:int = 0
+
+        # run / step 设置的停止条件, 以及调用 run 的 greenlet, main loop 暂停时切换回去
+        self._stop_time:Optional[SimTime] = None
+        self._event_limit:Optional[int] = None
+        self._step_mode:bool = False
+        self._caller:Optional[greenlet] = None
+
+        # 死锁检测, 记录所有在 wait 中阻塞的 coroutine 以及等待的 (events, reason)
+        if on_deadlock not in ('warn','raise','ignore'):
+            raise ValueError(f"unknown deadlock policy: {on_deadlock}")
+        self.blocked:dict[SimCoroutine,tuple[tuple[Event,...],Any]] = {}
+        self.on_deadlock:DeadlockPolicy = on_deadlock
+        # 超过 watchdog 个周期没有非 daemon 的进程被唤醒时报告, None 表示关闭
+        self.watchdog:Optional[int] = watchdog
+        self._last_progress_cycle:int = 0
+        self._deadlock_report:Optional[str] = None
+        # on_deadlock='warn' 时的报告, 切换回 run 的调用者之后再输出警告, 使警告指向调用 run 的位置
+        self._deadlock_warnings:list[str] = []
+
+
+    def run(self,until:Optional[SimTime|int]=None,max_events:Optional[int]=None)->bool:
+        """
+        运行仿真, 满足停止条件或者没有新的 event 时返回, 之后可以再次调用 run 继续运行
+        :param until: 只处理时间不晚于 until 的 event, 为 int 时表示周期, 包括该周期内所有的 delta cycle
+            sim_time 停留在最后一次处理的时间, 不会被推进到 until
+        :param max_events: 本次最多处理的 event (包括 timer) 数量, 在一个时间点处理完之后检查, 可能略微超出
+        :return: 是否还有未处理的 event
+        """
         # self.initialize_coroutine.switch()
         # self.status = 'initialized'
+        if until is None or isinstance(until,SimTime):
+            self._stop_time = until
+        else:
+            self._stop_time = _new_sim_time((until << _DELTA_BITS) | _DELTA_MASK)
+        self._event_limit = None if max_events is None else self.event_count + max_events
+        self._step_mode = False
+        return self._resume()
+
+    def step(self)->bool:
+        """
+        执行一次 evaluate / update 的迭代: 运行当前所有 runnable 的 coroutine, 之后推进到下一个时间点
+        :return: 是否还有未处理的 event 或者 runnable 的 coroutine
+        """
+        self._stop_time = None
+        self._event_limit = None
+        self._step_mode = True
+        return self._resume()
+
+    def _resume(self)->bool:
+        if self.status == 'running':
+            raise RuntimeError("scheduler can not be run from inside the simulation")
+        self._caller = greenlet.getcurrent()
         self.main_loop_coroutine.switch()
-        self.status = 'finished'
+        if self._deadlock_warnings:
+            reports, self._deadlock_warnings = self._deadlock_warnings, []
+            for report in reports:
+                # _resume <- run / step <- 调用者
+                warnings.warn(report, RuntimeWarning, stacklevel=3)
+        if self._deadlock_report is not None:
+            report, self._deadlock_report = self._deadlock_report, None
+            raise SimDeadlockError(report)
+        return bool(self.runnable_queue) or self.next_time() is not None
+
+    def _pause(self,status:Literal['paused','finished']):
+        # 切换回调用 run 的 greenlet, 再次调用 run 时从这里继续
+        self.status = status
+        self._caller.switch()
+        self.status = 'running'
 
     # def initialize(self):
     #     self.status = 'initializing'
@@ -296,14 +692,22 @@ class Scheduler:
         self.status = 'running'
         self.executor_coroutine = greenlet.getcurrent()
 
-        # 执行主体的循环，直到所有的coroutine都执行完毕，才会退出
+        # 执行主体的循环，没有新的 event 或者满足停止条件时暂停，切换回 run 的调用者
         while True:
 
             # 类似于systemc 的 evaluate 阶段
             # 遍历 runnable queue 中的线程，取出里面所有可跑的进程，依次执行
-            while self.runnable_queue:
-                coroutine = self.runnable_queue.pop()
-                coroutine.switch()
+            if self.watchdog is None:
+                while self.runnable_queue:
+                    coroutine = self.runnable_queue.pop()
+                    coroutine.switch()
+            else:
+                # 记录非 daemon 进程最近一次被唤醒的周期
+                while self.runnable_queue:
+                    coroutine = self.runnable_queue.pop()
+                    if not coroutine.daemon:
+                        self._last_progress_cycle = self.sim_time >> _DELTA_BITS
+                    coroutine.switch()
 
 
             # 进入 update 阶段， 更新delta cycle 或者 sim cycle 推动时间前进
@@ -312,51 +716,196 @@ class Scheduler:
                 # # 支持 delta cycle 功能  在这里进行delta cycle 的更新工作
                 # self.handle_notified_events(self.sim_time) # 处理 delta cycle 的event 实现数据的更新
 
-            # 检查 event queue，找到时间最小的 event，，作为新的时间，然后更新runnable queue，之后运行
-            if self.event_queue:
-                # 更新时间
-                assert self.event_queue.peek().notify_time > self.sim_time
-                self.sim_time = self.event_queue.peek().notify_time
-
-                self.handle_notified_events(self.sim_time)
-            else:
-                # 没有新的event了，退 main loop
-                break
-
-
-        pass
+            # 检查 event queue 和 timer queue，找到时间最小的 event，，作为新的时间，然后更新runnable queue，之后运行
+            next_time = self.next_time()
+            if next_time is None:
+                # 没有新的event了，暂停 main loop, 之后可以添加新的 module 继续运行
+                if self.report_deadlock('no pending events'):
+                    self._pause('paused')
+                else:
+                    self._pause('finished')
+                continue
+
+            if (self._stop_time is not None and next_time > self._stop_time) or \
+                    (self._event_limit is not None and self.event_count >= self._event_limit):
+                self._pause('paused')
+                continue
+
+            if self.watchdog is not None and \
+                    (next_time >> _DELTA_BITS) - self._last_progress_cycle > self.watchdog:
+                self._last_progress_cycle = next_time >> _DELTA_BITS
+                if self.report_deadlock(f'no progress for {self.watchdog} cycles'):
+                    self._pause('paused')
+                    continue
+
+            # 更新时间
+            assert next_time > self.sim_time
+            self.sim_time = next_time
+
+            self.handle_notified_events(next_time)
+            self.handle_timers(next_time)
+
+            if self._step_mode:
+                self._pause('paused')
+
+    def next_time(self)->Optional[SimTime]:
+        """
+        返回 event queue 和 timer queue 中最早的时间, 都为空时返回 None
+        """
+        timer_queue = self.timer_queue
+        # 跳过已经失效的 timer
+        while timer_queue and timer_queue[0][1] > 0 and timer_queue[0][2]._timer_seq != timer_queue[0][1]:
+            heapq.heappop(timer_queue)
+
+        if self.event_queue:
+            next_time = self.event_queue.peek_key()
+            if timer_queue and timer_queue[0][0] < next_time:
+                next_time = timer_queue[0][0]
+            return next_time
+        if timer_queue:
+            return timer_queue[0][0]
+        return None
+
+    def wait_for_graph(self,include_daemon:bool=False)->dict[SimCoroutine,tuple[tuple[Event,...],Any]]:
+        """
+        返回当前阻塞的进程, 以及每个进程等待的 events 和 reason
+        """
+        return {coroutine: waiting for coroutine, waiting in self.blocked.items()
+                if include_daemon or not coroutine.daemon}
+
+    def format_wait_for_report(self,cause:str)->str:
+        """
+        报告的大小有上限: 最多列出 _REPORT_MAX_PROCESSES 个进程, 每个 event 只列出一次,
+        并且最多显示 _REPORT_MAX_NAMES 个等待者的名字, 超过 _REPORT_MAX_CHARS 时截断
+        """
+        graph = self.wait_for_graph(include_daemon=True)
+        blocked = [coroutine for coroutine in graph if not coroutine.daemon]
+        lines = [f"{len(blocked)} process(es) blocked at {self.sim_time}: {cause}"]
+        # 非 daemon 的进程在前, daemon 进程 (例如阻塞在 FIFO 上的 pipe stage) 帮助定位依赖链
+        coroutines = sorted(graph, key=lambda c: c.daemon)
+        shared_events:dict[int,Event] = {}
+        for coroutine in coroutines[:_REPORT_MAX_PROCESSES]:
+            events, reason = graph[coroutine]
+            lines.append(f"    {coroutine.name}" + (" (daemon)" if coroutine.daemon else ""))
+            if reason is not None:
+                lines.append(f"        waiting for {reason!r}")
+            for event in events:
+                num_waiters = len(event.waiting_coroutines or ())
+                lines.append(f"        on event {id(event):#x} ({num_waiters} waiter(s))")
+                if num_waiters > 1:
+                    shared_events[id(event)] = event
+        if len(coroutines) > _REPORT_MAX_PROCESSES:
+            lines.append(f"    ... +{len(coroutines) - _REPORT_MAX_PROCESSES} more process(es)")
+
+        # 同一个 event 上的等待者, 用于分析进程之间的依赖
+        for event in shared_events.values():
+            waiters = event.waiting_coroutines
+            names = [c.name for c in itertools.islice(waiters,_REPORT_MAX_NAMES)]
+            if len(waiters) > _REPORT_MAX_NAMES:
+                names.append(f"+{len(waiters) - _REPORT_MAX_NAMES} more")
+            lines.append(f"    event {id(event):#x} shared by {', '.join(names)}")
+
+        report = '\n'.join(lines)
+        if len(report) > _REPORT_MAX_CHARS:
+            report = report[:_REPORT_MAX_CHARS] + "\n    ... (report truncated)"
+        return report
+
+    def report_deadlock(self,cause:str)->bool:
+        """
+        存在阻塞的非 daemon 进程时, 按照 on_deadlock 报告
+        :return: 是否需要暂停并在 run 中抛出 SimDeadlockError
+        """
+        if self.on_deadlock == 'ignore' or not self.wait_for_graph():
+            return False
+        report = self.format_wait_for_report(cause)
+        if self.on_deadlock == 'raise':
+            self._deadlock_report = report
+            return True
+        self._deadlock_warnings.append(report)
+        return False
 
     def handle_notified_events(self,time:SimTime):
-        while self.event_queue and self.event_queue.peek().notify_time == time:
-            notified_event:Event = self.event_queue.pop()
-
-            # 使所有的 coroutine 都设置为runnable 状态
-            for coroutine in notified_event.get_waiting_coroutines():
-                self.runnable_queue.append(coroutine)
-
-            # 可以考虑一个event 的特殊回调函数，实现值更新的功能
+        if not self.event_queue or self.event_queue.peek_key() != time:
+            return
 
-            # 清空状态
-            notified_event.clear_waiting_coroutine()
+        if invariant_checker.enabled:
+            invariant_checker.check(self.event_queue)
+
+        notified_events = self.event_queue.pop_min()
+        self.event_count += len(notified_events)
+
+        notified_event:Event
+        for notified_event in notified_events:
+            self.trigger_event(notified_event)
+
+    def trigger_event(self,event:Event):
+        # 使所有的 coroutine 都设置为runnable 状态
+        append = self.runnable_queue.append
+        if event.static_waiting_coroutines:
+            for coroutine in event.static_waiting_coroutines:
+                append(coroutine)
+
+        # 可以考虑一个event 的特殊回调函数，实现值更新的功能
+
+        # 清空状态
+        waiting_coroutines = event.waiting_coroutines
+        if waiting_coroutines:
+            event.waiting_coroutines = None
+            for coroutine in waiting_coroutines:
+                append(coroutine)
+
+    def handle_timers(self,time:SimTime):
+        timer_queue = self.timer_queue
+        while timer_queue and timer_queue[0][0] == time:
+            _, seq, target = heapq.heappop(timer_queue)
+            if seq < 0:
+                # Event.queue_notify 产生的 notify
+                # event 同时在 event queue 中时不修改 notify time, 否则会破坏 event queue 的排序
+                if target not in self.event_queue:
+                    target.set_notify_time(time)
+                self.trigger_event(target)
+                self.event_count += 1
+            elif target._timer_seq == seq:
+                self.runnable_queue.append(target)
+                self.event_count += 1
+
+    def queue_event(self, event:Event, notify_time:SimTime):
+        """
+        为 event 增加一个 notify time, 与 notify_event 不同, 不会覆盖之前的 notify time
+        notify time 不晚于当前时间时, 在下一个 delta cycle 触发
+        """
+        if notify_time <= self.sim_time:
+            notify_time = _new_sim_time(int(self.sim_time) + 1)
+        self._timer_seq += 1
+        heapq.heappush(self.timer_queue, (notify_time, self._timer_seq - _QUEUED_EVENT_SEQ_BASE, event))
+
+    def add_timer(self, coroutine:SimCoroutine|SimMethod, wake_time:SimTime)->int:
+        """
+        在 wake_time 唤醒 coroutine, 会覆盖 coroutine 之前的 timer
+        :return: timer 的序号
+        """
+        self._timer_seq += 1
+        coroutine._timer_seq = self._timer_seq
+        heapq.heappush(self.timer_queue, (wake_time, self._timer_seq, coroutine))
+        return self._timer_seq
 
     def notify_event(self, event:Event, new_notify_time:SimTime):
-        if event in self.event_queue:
-            self.event_queue.remove(event)
-            event.set_notify_time(new_notify_time)
-            self.event_queue.add(event)
-        else:
-            event.set_notify_time(new_notify_time)
-            self.event_queue.add(event)
+        # event queue 负责处理重复插入的情况 (更新 notify time)
+        self.event_queue.push(event, new_notify_time)
+        event.set_notify_time(new_notify_time)
+
+        if invariant_checker.enabled:
+            invariant_checker.check(self.event_queue)
 
     def cancel_event(self, event:Event):
-        self.event_queue.remove(event)
+        self.event_queue.discard(event)
 
     # 受限于初始化机制，目前动态初始化需要借助特殊的函数进行。
     def add_module(self, module:SimModule):
         for coroutine in module._coroutines:
             self.add_coroutine(coroutine)
 
-    def add_coroutine(self, coroutine:SimCoroutine):
+    def add_coroutine(self, coroutine:SimCoroutine|SimMethod):
         # 手动执行类似初始化的操作
         if coroutine.is_registered():
             return
@@ -370,6 +919,8 @@ class SimSession:
     scheduler:Optional[Scheduler] = None
     
     sim_modules:list[SimModule] = []
+    # 为 False 时不记录创建的 SimModule, 模块的生命周期由使用者管理
+    track_modules:bool = True
 
 
     @ClassProperty
@@ -385,11 +936,31 @@ class SimSession:
     def reset(cls):
         cls.scheduler = None 
         cls.sim_modules = []
+        cls.track_modules = True
 
     @classmethod
-    def init(cls):
-        cls.scheduler = Scheduler()
+    def init(cls,event_queue:EventQueueBackend='calendar',
+             check_level:CheckLevel='never',check_interval:int=1024,
+             track_modules:bool=True,
+             on_deadlock:DeadlockPolicy='warn',watchdog:Optional[int]=None):
+        """
+        :param event_queue: scheduler 使用的 event queue 实现
+            'calendar' 按照 SimTime 分桶, 适合大量 event 集中在少数几个周期的情况
+            'sorted' 基于 SortedList 的实现
+            'heap' 基于 heapq 的 lazy deletion 实现, 重新 notify 和 cancel 都是 O(1) 的
+        :param check_level: 容器一致性检查的等级 'never' / 'sampled' / 'always'
+            'always' 对应原来 debug 模式下每次操作都检查的行为, 复杂度为 O(n)
+        :param check_interval: 'sampled' 模式下每多少次操作检查一次
+        :param track_modules: 是否在 sim_modules 中记录所有的 SimModule
+            大规模仿真中可以关闭, 避免所有模块在仿真结束前都无法释放
+        :param on_deadlock: 没有 event 但仍有阻塞的非 daemon 进程时的处理方式
+            'warn' 在 run 返回时以 RuntimeWarning 输出 wait-for graph 报告, 'raise' 暂停并由 run 抛出 SimDeadlockError, 'ignore' 不检查
+        :param watchdog: 超过多少个周期没有非 daemon 进程被唤醒时同样按照 on_deadlock 报告, None 表示关闭
+        """
+        invariant_checker.configure(check_level,check_interval)
+        cls.scheduler = Scheduler(event_queue,on_deadlock,watchdog)
         cls.sim_modules = []
+        cls.track_modules = track_modules
 
 
 
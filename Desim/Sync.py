@@ -1,15 +1,19 @@
 from collections import deque
-from typing import Callable, Deque
+from typing import Callable, Deque, Optional
 
 
 from Desim.Core import Event, SimModule, SimSession, SimTime
-from Desim.Utils import UniquePriorityQueue
 
 
 class SimSemaphore:
-    def __init__(self,value:int):
+    def __init__(self,value:int,name:Optional[str]=None):
         self.free_ent:Event = Event()
         self.value:int = value
+        # 用于死锁检测的报告
+        self.name:Optional[str] = name
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name or hex(id(self))}, value={self.value})"
 
     def get_value(self):
         return self.value
@@ -25,55 +29,47 @@ class SimSemaphore:
         # value会一直保持0， 因为提前进入wait了
         # 唤醒的顺序是不能保证的， systemc 原版中也是随机进行唤醒的
         while self.in_use():
-            SimModule.wait(self.free_ent)
+            SimModule.wait(self.free_ent,reason=self)
         self.value -= 1
 
+    def wait_n(self,n:int):
+        # 一次获取 n 个资源, 资源不足时不会预先占用一部分
+        while self.value < n:
+            SimModule.wait(self.free_ent,reason=self)
+        self.value -= n
+
+    def try_wait_n(self,n:int)->bool:
+        if self.value < n:
+            return False
+        self.value -= n
+        return True
+
     def post(self):
         self.value += 1
         self.free_ent.notify(SimTime(0))
 
+    def post_n(self,n:int):
+        # 一次释放 n 个资源, 只需要一次 notify
+        if n <= 0:
+            return
+        self.value += n
+        self.free_ent.notify(SimTime(0))
+
     def in_use(self)->bool:
         return self.value <= 0
 
 
 
-class EventQueue(SimModule):
+class EventQueue:
     # 实现一个类似 systemc中 event queue 的操作
     # 不同普通的event 只有一个 notify time， 这个queue有一系列notify time， 依次进行notify 操作
+    # 所有的 notify time 都直接交给 scheduler 保存 (Event.queue_notify), 不需要额外的 coroutine
     def __init__(self):
-        super().__init__()
-
         self.event = Event() # 对外的 event
- 
-        self.notify_time_queue = UniquePriorityQueue()
-        
-        self.update_event = Event()
-
-        self.register_coroutine(self.update)
-        self.register_coroutine(self.post_event)
 
     def next_notify(self,delay_time:SimTime):
-        self.notify_time_queue.add(SimSession.sim_time + delay_time)
-        self.update_event.notify(SimTime(0))
+        self.event.queue_notify(delay_time)
 
-    
-    def update(self):
-        while True:
-            SimModule.wait(self.update_event)
-
-            if self.notify_time_queue:
-                delay_time = self.notify_time_queue.peek() - SimSession.sim_time
-                if delay_time == SimTime(0,0):
-                    delay_time = SimTime(0,1)
-                self.event.notify(delay_time)
-
-    def post_event(self):
-        # event 被触发之后进行的操作
-        while True:
-            SimModule.wait(self.event)
-            assert self.notify_time_queue.peek().cycle == SimSession.sim_time.cycle
-            self.notify_time_queue.pop()
-            self.update_event.notify(SimTime(0))
 
 class DelayHandler(SimModule):
     def __init__(self,callback:Callable):
@@ -85,38 +81,55 @@ class DelayHandler(SimModule):
 
         self.callback = callback
 
-        self.register_coroutine(self.process)
+        # 使用 method 实现, 每次触发直接调用 callback, 不需要 coroutine
+        self.register_method(self.process,self.trigger_ent,dont_initialize=True)
 
     def delay_call(self,delay_time:SimTime):
         self.event_queue.next_notify(delay_time)
 
     def process(self):
-        while True:
-            SimModule.wait(self.trigger_ent)
-            self.callback()
+        self.callback()
 
 
 class SimDelaySemaphore(SimSemaphore):
-    def __init__(self, value:int):
-        super().__init__(value)
+    def __init__(self, value:int,name:Optional[str]=None):
+        super().__init__(value,name)
     
         self.delay_handler = DelayHandler(self._post)
+        # 每个生效时间上需要释放的资源数量, 同一时间的多次 post 合并为一次
+        self._pending_posts:dict[SimTime,int] = {}
 
 
     def _post(self):
         # 真正的 post 函数
-        self.value += 1
-        self.free_ent.notify(SimTime(0))
+        n = self._pending_posts.pop(SimSession.sim_time,0)
+        if n:
+            self.value += n
+            self.free_ent.notify(SimTime(0))
         
 
     def post(self,delay_time:SimTime=SimTime(0)):
-        self.delay_handler.delay_call(delay_time)
+        self.post_n(1,delay_time)
+
+    def post_n(self,n:int,delay_time:SimTime=SimTime(0)):
+        if n <= 0:
+            return
+        now = SimSession.sim_time
+        post_time = now + delay_time
+        if post_time <= now:
+            # 与 Scheduler.queue_event 一致, 不晚于当前时间的 post 在下一个 delta cycle 生效
+            post_time = SimTime(now.cycle,now.delta_cycle + 1)
+        if post_time in self._pending_posts:
+            self._pending_posts[post_time] += n
+        else:
+            self._pending_posts[post_time] = n
+            self.delay_handler.delay_call(delay_time)
 
 
 
 class SimOrderedSemaphore(SimSemaphore):
-    def __init__(self,value:int):
-        super().__init__(value)
+    def __init__(self,value:int,name:Optional[str]=None):
+        super().__init__(value,name)
 
         self.event_list:Deque[Event] = deque()
 
@@ -127,7 +140,7 @@ class SimOrderedSemaphore(SimSemaphore):
             # 如果资源不够，就进入等待状态
             event = Event() # 每次都创建一个新的 event 并进入排队
             self.event_list.append(event)
-            SimModule.wait(event)
+            SimModule.wait(event,reason=self)
         else:
             self.value -= 1
 
@@ -1,10 +1,58 @@
-from typing import TypeVar, Generic, Callable, Deque, Set
+import heapq
+from typing import TypeVar, Generic, Callable, Deque, Set, Any, Literal
 from sortedcontainers import SortedList
 from collections import deque 
 
 # 定义一个泛型 T
 T = TypeVar("T")
 
+
+CheckLevel = Literal['never','sampled','always']
+
+
+class InvariantChecker:
+    """
+    控制容器内部一致性检查 (valid_check) 的频率
+    'never': 不进行检查, 默认值
+    'sampled': 每 interval 次操作检查一次
+    'always': 每次操作前后都进行检查, 即最严格的检查, 与原来 __debug__ 下的行为一致
+    valid_check 需要遍历整个容器, 是 O(n) 的, 'always' 会让仿真变成平方复杂度
+    """
+    def __init__(self):
+        self.level:CheckLevel = 'never'
+        self.interval:int = 1024
+        self.enabled:bool = False # 供热路径快速判断
+        self._count:int = 0
+
+    def configure(self, level:CheckLevel = 'never', interval:int = 1024):
+        if level not in ('never','sampled','always'):
+            raise ValueError(f"unknown check level: {level}")
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        self.level = level
+        self.interval = interval
+        self.enabled = level != 'never'
+        self._count = 0
+
+    def check(self, container) -> bool:
+        """
+        根据检查等级决定是否调用 container.valid_check()
+        :return: 是否进行了检查
+        """
+        if self.level == 'sampled':
+            self._count += 1
+            if self._count < self.interval:
+                return False
+            self._count = 0
+        elif self.level == 'never':
+            return False
+        container.valid_check()
+        return True
+
+
+# 全局的检查配置, 通过 SimSession.init(check_level=...) 修改
+invariant_checker = InvariantChecker()
+
 class UniquePriorityQueue(Generic[T]):
     def __init__(self):
         """
@@ -20,8 +68,8 @@ class UniquePriorityQueue(Generic[T]):
         添加一个元素到队列中，如果元素已经存在，则忽略。
         :param item: 待加入的元素
         """
-        if __debug__:
-            self.valid_check()
+        if invariant_checker.enabled:
+            invariant_checker.check(self)
 
         if item in self._set:
             # raise ValueError(f"{item} already exists")
@@ -29,8 +77,8 @@ class UniquePriorityQueue(Generic[T]):
         self._queue.add(item)
         self._set.add(item)
 
-        if __debug__:
-            self.valid_check()
+        if invariant_checker.enabled:
+            invariant_checker.check(self)
 
     # 这个函数没什么用， 因为 更改了value之后 堆就不对了，得在更新前就把原来的item删除
     # def append(self, item: T):
@@ -58,8 +106,8 @@ class UniquePriorityQueue(Generic[T]):
         删除队列中的某个元素。
         :param item: 待删除的元素
         """
-        if __debug__:
-            self.valid_check()
+        if invariant_checker.enabled:
+            invariant_checker.check(self)
 
         if item not in self._set:
             print(f"{item} 不在队列中，无法删除。")
@@ -67,8 +115,8 @@ class UniquePriorityQueue(Generic[T]):
         self._queue.remove(item)
         self._set.remove(item)
 
-        if __debug__:
-            self.valid_check()
+        if invariant_checker.enabled:
+            invariant_checker.check(self)
         # print(f"已删除: {item}")
 
     def update(self, old_item: T, new_item: T):
@@ -87,16 +135,16 @@ class UniquePriorityQueue(Generic[T]):
         弹出优先级最高的元素。
         :return: 优先级最高的元素
         """
-        if __debug__:
-            self.valid_check()
+        if invariant_checker.enabled:
+            invariant_checker.check(self)
 
         if not self._queue:
             raise IndexError("优先级队列为空！")
         item = self._queue.pop(0)  # 弹出优先级最高的元素
         self._set.remove(item)
 
-        if __debug__:
-            self.valid_check()
+        if invariant_checker.enabled:
+            invariant_checker.check(self)
 
         return item
 
@@ -151,15 +199,15 @@ class UniqueDeque(Generic[T]):
         self.set: Set[T] = set()
 
     def append(self, item: T) -> None:
-        if __debug__:
-            self.valid_check()
+        if invariant_checker.enabled:
+            invariant_checker.check(self)
 
         if item not in self.set:
             self.set.add(item)
             self.deque.append(item)
 
-        if __debug__:
-            self.valid_check()
+        if invariant_checker.enabled:
+            invariant_checker.check(self)
 
     def appendleft(self, item: T) -> None:
         if item not in self.set:
@@ -167,14 +215,14 @@ class UniqueDeque(Generic[T]):
             self.deque.appendleft(item)
 
     def pop(self) -> T:
-        if __debug__:
-            self.valid_check()
+        if invariant_checker.enabled:
+            invariant_checker.check(self)
 
         item = self.deque.pop()
         self.set.remove(item)
 
-        if __debug__:
-            self.valid_check()
+        if invariant_checker.enabled:
+            invariant_checker.check(self)
 
         return item
 
@@ -184,14 +232,14 @@ class UniqueDeque(Generic[T]):
         return item
 
     def remove(self, item: T) -> None:
-        if __debug__:
-            self.valid_check()
+        if invariant_checker.enabled:
+            invariant_checker.check(self)
 
         self.deque.remove(item)
         self.set.remove(item)
 
-        if __debug__:
-            self.valid_check()
+        if invariant_checker.enabled:
+            invariant_checker.check(self)
 
     def __contains__(self, item: T) -> bool:
         return item in self.set
@@ -207,13 +255,97 @@ class UniqueDeque(Generic[T]):
 
 
     def valid_check(self)->bool:
-        for item in self.deque:
-            if item not in self.set:
-                assert False
-        for item in self.set:
-            if item not in self.deque:
-                assert False
+        # deque 的 in 操作是 O(n) 的, 这里转成 set 比较, 整体是 O(n)
+        assert len(self.deque) == len(self.set)
+        assert set(self.deque) == self.set
+
+        return True
 
+
+
+
+class BucketPriorityQueue(Generic[T]):
+    """
+    calendar queue / bucket queue 的实现
+    元素按照 key 分桶, 同一个 key 的元素放在一个桶中并保持插入顺序 (FIFO)
+    不同的 key 使用一个最小堆维护, 每个 key 在堆中只出现一次
+    适用于大量元素集中在少数几个 key 上的情况, 插入和删除都是 O(1), 只有出现新的 key 时才需要 O(log k) 的堆操作
+    """
+    def __init__(self):
+        self._buckets: dict[Any, dict[T, None]] = {}  # key -> 桶, 使用 dict 保持顺序同时支持 O(1) 删除
+        self._keys: list = []  # 所有存在桶的 key 组成的最小堆
+        self._item_key: dict[T, Any] = {}  # 记录元素当前所在的桶
+
+    def push(self, item: T, key):
+        """
+        插入一个元素, 如果元素已经存在, 则将其移动到新的 key 中
+        :param item: 待加入的元素
+        :param key: 元素的优先级, 越小越先弹出
+        """
+        item_key = self._item_key
+        if item in item_key:
+            old_key = item_key[item]
+            if old_key == key:
+                return
+            del self._buckets[old_key][item]
+
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = {}
+            heapq.heappush(self._keys, key)
+        bucket[item] = None
+        item_key[item] = key
+
+    def discard(self, item: T):
+        """
+        删除某个元素, 元素不存在时直接忽略
+        桶即使为空也保留, 等到 peek 时再从堆中清除
+        """
+        if item in self._item_key:
+            del self._buckets[self._item_key.pop(item)][item]
+
+    def peek_key(self):
+        """
+        返回最小的 key, 队列为空时抛出 IndexError
+        """
+        if not self._item_key:
+            raise IndexError("优先级队列为空！")
+        keys = self._keys
+        buckets = self._buckets
+        while not buckets[keys[0]]:
+            del buckets[heapq.heappop(keys)]
+        return keys[0]
+
+    def pop_min(self) -> list[T]:
+        """
+        弹出最小 key 对应的所有元素, 按照插入的顺序返回
+        """
+        key = self.peek_key()
+        bucket = self._buckets.pop(key)
+        heapq.heappop(self._keys)
+        item_key = self._item_key
+        for item in bucket:
+            del item_key[item]
+        return list(bucket)
+
+    def __len__(self) -> int:
+        return len(self._item_key)
+
+    def __bool__(self) -> bool:
+        return len(self._item_key) > 0
+
+    def __contains__(self, item) -> bool:
+        return item in self._item_key
+
+    def valid_check(self) -> bool:
+        assert len(self._keys) == len(self._buckets)
+        assert set(self._keys) == set(self._buckets.keys())
+        count = 0
+        for key, bucket in self._buckets.items():
+            for item in bucket:
+                assert self._item_key[item] == key
+            count += len(bucket)
+        assert count == len(self._item_key)
         return True
 
 
@@ -0,0 +1,302 @@
+from __future__ import annotations
+
+import random
+from array import array
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Literal, Optional
+
+from Desim.Core import SimModule, SimTime
+from Desim.memory.Memory import ChunkMemory, ChunkMemoryPort, ChunkMemoryRequest, ChunkPacket
+
+
+ReplacementPolicy = Literal['lru','plru','random']
+WritePolicy = Literal['write_back','write_through']
+
+
+@dataclass(slots=True)
+class MSHR:
+    # 一个正在 fill 的 cache line, 同一 line 上的 miss 合并到 targets 中
+    line:int
+    fills:list[ChunkMemoryRequest] = field(repr=False)
+    targets:list[ChunkMemoryRequest] = field(default_factory=list,repr=False)
+
+
+class Cache(SimModule):
+    """
+    位于 ChunkMemory 之前的组相联 cache
+    地址与 ChunkMemory 相同, 以 chunk 为单位, 每个 cache line 包含 line_size 个连续的 chunk
+    对外提供与 ChunkMemory 相同的 handle_read_request / handle_write_request 接口,
+    因此直接使用 ChunkMemoryPort(cache) 访问, 支持阻塞的 read / write 以及 issue / wait
+
+    cache 只建模数据的存放位置和时序, 不维护 ChunkMemory 的依赖 tag:
+    经过 cache 的 read 不检查 tag_value, 也不会 clear, write 不检查也不修改 tag
+    需要通过 tag 同步的数据应该使用直接连接 ChunkMemory 的 port
+
+    tag, dirty 以及替换信息都保存在按照 set * num_ways + way 排列的数组中
+    """
+
+    def __init__(self,memory:ChunkMemory,num_sets:int=64,num_ways:int=4,line_size:int=1,
+                 replacement:ReplacementPolicy='lru',write_policy:WritePolicy='write_back',
+                 num_mshrs:int=8,hit_latency:int=1,seed:int=0):
+        """
+        :param line_size: 每个 cache line 包含的 chunk 数量
+        :param num_mshrs: 同时进行 fill 的 line 的数量, 用完之后新的 miss 需要排队
+        :param hit_latency: 命中的延迟, miss 时在 fill 完成之后再经过 hit_latency 返回
+        """
+        super().__init__()
+
+        if replacement not in ('lru','plru','random'):
+            raise ValueError(f"unknown replacement policy: {replacement}")
+        if write_policy not in ('write_back','write_through'):
+            raise ValueError(f"unknown write policy: {write_policy}")
+        if replacement == 'plru' and num_ways & (num_ways - 1):
+            raise ValueError("plru replacement requires num_ways to be a power of two")
+
+        self.memory = memory
+        self.num_sets = num_sets
+        self.num_ways = num_ways
+        self.line_size = line_size
+        self.replacement:ReplacementPolicy = replacement
+        self.write_policy:WritePolicy = write_policy
+        self.num_mshrs = num_mshrs
+        self.hit_latency = SimTime(hit_latency)
+        self.rng = random.Random(seed)
+
+        num_frames = num_sets * num_ways
+        # line 编号, -1 表示无效
+        self.line_tags = array('q',[-1]) * num_frames
+        self.dirty = bytearray(num_frames)
+        # lru 使用访问的时间戳, plru 每个 set 使用 num_ways - 1 个 bit 的树
+        self.lru_stamps = array('q',[0]) * num_frames
+        self.plru_bits = array('q',[0]) * num_sets
+        self._stamp:int = 0
+        # 每个 frame 中 line_size 个 chunk 的 payload, timing only 时不保存
+        self.line_data:list[Optional[list]] = [None] * num_frames
+
+        # 通过内部的 port 访问 memory, fill 完成时触发 on_fill
+        self.mem_port = ChunkMemoryPort(memory)
+        self.mshrs:dict[int,MSHR] = {}
+        # 没有空闲 MSHR 时等待的 req
+        self.stalled_reqs:deque[ChunkMemoryRequest] = deque()
+        self.register_method(self.on_fill,self.mem_port.read_finish_event,dont_initialize=True)
+
+        # 统计信息
+        self.hits:int = 0
+        self.misses:int = 0
+        self.mshr_merges:int = 0
+        self.mshr_stalls:int = 0
+        self.evictions:int = 0
+        self.writebacks:int = 0
+
+    @property
+    def timing_only(self)->bool:
+        return self.memory.timing_only
+
+    @property
+    def hit_rate(self)->float:
+        accesses = self.hits + self.misses
+        return self.hits / accesses if accesses else 0.0
+
+    def handle_read_request(self,read_req:ChunkMemoryRequest):
+        self.access(read_req)
+
+    def handle_write_request(self,write_req:ChunkMemoryRequest):
+        self.access(write_req)
+
+    def handle_requests(self,reqs:list[ChunkMemoryRequest]):
+        for req in reqs:
+            self.access(req)
+
+    def lookup(self,line:int)->int:
+        """
+        :return: line 所在的 frame, 不在 cache 中时返回 -1
+        """
+        base = (line % self.num_sets) * self.num_ways
+        tags = self.line_tags
+        for frame in range(base,base + self.num_ways):
+            if tags[frame] == line:
+                return frame
+        return -1
+
+    def access(self,req:ChunkMemoryRequest):
+        line, offset = divmod(req.addr,self.line_size)
+        frame = self.lookup(line)
+
+        if frame >= 0:
+            self.hits += 1
+            self.touch(frame)
+            self.apply(req,frame,offset)
+            req.status = 'running'
+            req.finish(self.hit_latency)
+            return
+
+        if req.command == 'write' and self.write_policy == 'write_through':
+            # write through 不分配 cache line, 直接写入 memory, 不需要等待 memory 完成
+            self.misses += 1
+            self.forward_write(req.addr,req.data)
+            req.status = 'running'
+            req.finish(self.hit_latency)
+            return
+
+        mshr = self.mshrs.get(line)
+        if mshr is not None:
+            self.misses += 1
+            self.mshr_merges += 1
+            mshr.targets.append(req)
+        elif len(self.mshrs) < self.num_mshrs:
+            self.misses += 1
+            self.mshrs[line] = MSHR(line,self.fill(line,req.data),[req])
+        else:
+            # 之后重新访问, 届时再统计 hit / miss
+            self.mshr_stalls += 1
+            self.stalled_reqs.append(req)
+            return
+        req.status = 'running'
+
+    def fill(self,line:int,packet:ChunkPacket)->list[ChunkMemoryRequest]:
+        # 读取整个 line, chunk 的大小与触发 miss 的 req 相同
+        fills = []
+        for addr in range(line * self.line_size,(line + 1) * self.line_size):
+            fill_req = ChunkMemoryRequest(
+                port=self.mem_port,
+                command='read',
+                addr=addr,
+                read_finish_event=self.mem_port.read_finish_event,
+                ignore_tag=True,
+                data=ChunkPacket(
+                    num_elements=packet.num_elements,
+                    batch_size=packet.batch_size,
+                    element_bytes=packet.element_bytes
+                )
+            )
+            fills.append(fill_req)
+        # 一次提交整个 line, memory 开启 coalesce 时合并为一个 burst
+        self.mem_port.issue_many(fills)
+        return fills
+
+    def forward_write(self,addr:int,packet:ChunkPacket):
+        write_req = ChunkMemoryRequest(
+            port=self.mem_port,
+            command='write',
+            addr=addr,
+            write_finish_event=self.mem_port.write_finish_event,
+            check_write_tag=False,
+            ignore_tag=True,
+            data=ChunkPacket(
+                payload=packet.payload,
+                num_elements=packet.num_elements,
+                batch_size=packet.batch_size,
+                element_bytes=packet.element_bytes
+            )
+        )
+        self.mem_port.issue(write_req)
+
+    def on_fill(self):
+        # memory 上有 fill 完成, 检查所有的 MSHR
+        finished = [mshr for mshr in self.mshrs.values() if all(fill_req.done() for fill_req in mshr.fills)]
+        for mshr in finished:
+            del self.mshrs[mshr.line]
+            frame = self.install(mshr)
+            offset_base = mshr.line * self.line_size
+            for req in mshr.targets:
+                self.apply(req,frame,req.addr - offset_base)
+                req.finish(self.hit_latency)
+
+        # 有空闲的 MSHR 之后重新访问等待的 req
+        while self.stalled_reqs and len(self.mshrs) < self.num_mshrs:
+            self.access(self.stalled_reqs.popleft())
+
+    def install(self,mshr:MSHR)->int:
+        frame = self.victim(mshr.line % self.num_sets)
+        if self.line_tags[frame] >= 0:
+            self.evictions += 1
+            if self.dirty[frame]:
+                self.write_back(frame,mshr.fills[0].data)
+
+        self.line_tags[frame] = mshr.line
+        self.dirty[frame] = 0
+        self.line_data[frame] = None if self.timing_only else [fill_req.data.payload for fill_req in mshr.fills]
+        self.touch(frame)
+        return frame
+
+    def write_back(self,frame:int,packet:ChunkPacket):
+        self.writebacks += 1
+        line = self.line_tags[frame]
+        data = self.line_data[frame]
+        for offset in range(self.line_size):
+            self.forward_write(line * self.line_size + offset,ChunkPacket(
+                payload=None if data is None else data[offset],
+                num_elements=packet.num_elements,
+                batch_size=packet.batch_size,
+                element_bytes=packet.element_bytes
+            ))
+
+    def flush(self,packet:Optional[ChunkPacket]=None):
+        """
+        将所有 dirty 的 line 写回 memory, 不等待写入完成
+        :param packet: 提供写回的 chunk 大小, 默认与 ChunkMemoryPort 的默认大小相同
+        """
+        packet = packet or ChunkPacket(num_elements=128,batch_size=16,element_bytes=1)
+        for frame in range(len(self.line_tags)):
+            if self.dirty[frame]:
+                self.write_back(frame,packet)
+                self.dirty[frame] = 0
+
+    def apply(self,req:ChunkMemoryRequest,frame:int,offset:int):
+        # 在 cache line 上完成 req 的读写
+        data = self.line_data[frame]
+        if req.command == 'read':
+            if data is not None:
+                req.data.payload = data[offset]
+        else:
+            if data is not None:
+                data[offset] = req.data.payload
+            if self.write_policy == 'write_back':
+                self.dirty[frame] = 1
+            else:
+                self.forward_write(req.addr,req.data)
+
+    def touch(self,frame:int):
+        if self.replacement == 'lru':
+            self._stamp += 1
+            self.lru_stamps[frame] = self._stamp
+        elif self.replacement == 'plru':
+            cache_set, way = divmod(frame,self.num_ways)
+            bits = self.plru_bits[cache_set]
+            node, low, size = 0, 0, self.num_ways
+            # 沿着树向下, 每个节点指向与本次访问相反的一侧
+            while size > 1:
+                size //= 2
+                if way < low + size:
+                    bits |= 1 << node
+                    node = 2 * node + 1
+                else:
+                    bits &= ~(1 << node)
+                    low += size
+                    node = 2 * node + 2
+            self.plru_bits[cache_set] = bits
+
+    def victim(self,cache_set:int)->int:
+        base = cache_set * self.num_ways
+        # 优先使用无效的 frame
+        for frame in range(base,base + self.num_ways):
+            if self.line_tags[frame] < 0:
+                return frame
+
+        if self.replacement == 'lru':
+            stamps = self.lru_stamps[base:base + self.num_ways]
+            return base + stamps.index(min(stamps))
+        elif self.replacement == 'plru':
+            bits = self.plru_bits[cache_set]
+            node, low, size = 0, 0, self.num_ways
+            while size > 1:
+                size //= 2
+                if bits >> node & 1:
+                    low += size
+                    node = 2 * node + 2
+                else:
+                    node = 2 * node + 1
+            return base + low
+        else:
+            return base + self.rng.randrange(self.num_ways)
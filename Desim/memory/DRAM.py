@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import math
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+from Desim.Core import SimSession, SimTime
+from Desim.memory.Memory import ChunkMemory, ChunkMemoryRequest
+from Desim.memory.Storage import NumpyChunkStorage
+
+
+@dataclass
+class DRAMConfig:
+    channels:int = 1
+    ranks:int = 1
+    banks:int = 8
+    # 每个 row 包含的 chunk 数量, 连续的 chunk 位于同一个 row 中
+    chunks_per_row:int = 16
+
+    # 时序参数, 单位为周期
+    tRCD:int = 14 # activate 到 read / write
+    tRP:int = 14 # precharge
+    tCAS:int = 14 # read / write 到数据
+
+    # 每个 channel 数据总线的带宽 bytes/cycle
+    channel_bandwidth:int = 32
+
+
+class DRAM(ChunkMemory):
+    """
+    带有 row buffer 状态的 DRAM, 与 ChunkMemory 使用相同的 port 和依赖规则
+    地址映射 (从低到高): row 内的 chunk / channel / bank / rank / row
+    每个 bank 保持一个打开的 row, 访问的延迟取决于 row buffer 的状态:
+        hit      tCAS
+        miss     tRCD + tCAS        (bank 中没有打开的 row)
+        conflict tRP + tRCD + tCAS  (需要先关闭其他 row)
+    之后在 channel 的数据总线上传输, 总线按照 FCFS 分配
+    每个 bank 同时只服务一个 req, 使用 FR-FCFS 选择下一个 req: 优先选择最早的 row hit, 否则选择最早的 req
+    只在 req 到达或者 bank 空闲的周期进行调度, 不需要每个周期轮询
+    """
+
+    def __init__(self,config:Optional[DRAMConfig]=None,timing_only:bool=False,
+                 storage:Optional[NumpyChunkStorage]=None):
+        super().__init__(timing_only=timing_only,storage=storage)
+
+        self.config = config or DRAMConfig()
+        num_banks = self.config.channels * self.config.ranks * self.config.banks
+
+        # 按照 (channel, rank, bank) 展开的 bank 状态
+        self.open_rows:list[int] = [-1] * num_banks
+        self.bank_free_cycle:list[int] = [0] * num_banks
+        self.bank_queues:list[deque[ChunkMemoryRequest]] = [deque() for _ in range(num_banks)]
+        self.channel_free_cycle:list[int] = [0] * self.config.channels
+        # 有 req 等待的 bank
+        self._pending_banks:dict[int,None] = {}
+
+        # 统计信息
+        self.row_hits:int = 0
+        self.row_misses:int = 0
+        self.row_conflicts:int = 0
+        self.transferred_bytes:int = 0
+
+    def decode(self,addr:int)->tuple[int,int,int]:
+        """
+        :return: (channel, 展开之后的 bank, row)
+        """
+        config = self.config
+        rest = addr // config.chunks_per_row
+        rest, channel = divmod(rest,config.channels)
+        rest, bank = divmod(rest,config.banks)
+        row, rank = divmod(rest,config.ranks)
+        return channel, (channel * config.ranks + rank) * config.banks + bank, row
+
+    def start_req(self,req:ChunkMemoryRequest):
+        # 进入 bank 的队列, 在 bank 空闲时由 dispatch 决定完成时间
+        _, bank, _ = self.decode(req.addr)
+        self.bank_queues[bank].append(req)
+        self._pending_banks[bank] = None
+
+    def schedule_waiting_reqs(self):
+        super().schedule_waiting_reqs()
+        self.dispatch()
+
+    def dispatch(self):
+        now = SimSession.sim_time.cycle
+        for bank in list(self._pending_banks):
+            if self.bank_free_cycle[bank] > now:
+                continue
+            queue = self.bank_queues[bank]
+            req = self.select(queue,self.open_rows[bank])
+            self.serve(req,bank,now)
+            if not queue:
+                del self._pending_banks[bank]
+
+    def select(self,queue:deque[ChunkMemoryRequest],open_row:int)->ChunkMemoryRequest:
+        # FR-FCFS
+        for i,req in enumerate(queue):
+            if self.decode(req.addr)[2] == open_row:
+                del queue[i]
+                return req
+        return queue.popleft()
+
+    def serve(self,req:ChunkMemoryRequest,bank:int,now:int):
+        config = self.config
+        channel, _, row = self.decode(req.addr)
+
+        open_row = self.open_rows[bank]
+        if open_row == row:
+            self.row_hits += 1
+            access_cycles = config.tCAS
+        elif open_row < 0:
+            self.row_misses += 1
+            access_cycles = config.tRCD + config.tCAS
+        else:
+            self.row_conflicts += 1
+            access_cycles = config.tRP + config.tRCD + config.tCAS
+        self.open_rows[bank] = row
+
+        # 数据在 channel 总线上传输
+        chunk_bytes = req.chunk_bytes
+        burst_cycles = math.ceil(chunk_bytes / config.channel_bandwidth)
+        burst_start = max(now + access_cycles,self.channel_free_cycle[channel])
+        finish = burst_start + burst_cycles
+        self.channel_free_cycle[channel] = finish
+        self.bank_free_cycle[bank] = finish
+        self.transferred_bytes += chunk_bytes
+
+        # bank 空闲时 process 被唤醒, 再次调用 dispatch
+        self.finish_req_after(req,SimTime(finish - now))
+
+    @property
+    def row_hit_rate(self)->float:
+        accesses = self.row_hits + self.row_misses + self.row_conflicts
+        return self.row_hits / accesses if accesses else 0.0
+
+    def achieved_bandwidth(self,cycles:Optional[int]=None)->float:
+        """
+        :param cycles: 统计的周期数, 默认为当前的仿真时间
+        :return: 平均带宽 bytes/cycle
+        """
+        cycles = SimSession.sim_time.cycle if cycles is None else cycles
+        return self.transferred_bytes / cycles if cycles else 0.0
@@ -1,122 +1,200 @@
 from __future__ import annotations
 
-import math
 from collections import defaultdict, deque
 from dataclasses import dataclass, field
-from typing import Literal, Optional, TypeVar, Generic
+from typing import Iterable, Literal, Optional, TypeVar, Generic
 from Desim.Core import Event, SimModule, SimTime, SimSession
 from Desim.Sync import EventQueue
-from Desim.Utils import UniquePriorityQueue, UniqueDeque
+from Desim.memory.Timing import ChunkMemoryTiming, BandwidthTiming
+from Desim.memory.Storage import NumpyChunkStorage, load_chunks, save_chunks, dump_payloads, range_to_slice
+from Desim.Utils import UniquePriorityQueue
 
 
-@dataclass
+@dataclass(slots=True)
 class DepMemoryRequest:
-    port:DepMemoryPort 
+    port:DepMemoryPort = field(repr=False)
     command:Literal['write','read']
     addr:int 
-    data:any = None
+    data:any = field(default=None,repr=False)
     clear:bool = False # 读完之后,最后进行进行 clear 操作
     expect_tag:int = 0 
-    read_finish_event:Optional[Event] = None
-    write_finish_event:Optional[Event] = None 
+    read_finish_event:Optional[Event] = field(default=None,repr=False)
+    write_finish_event:Optional[Event] = field(default=None,repr=False)
     check_write_tag:bool = True
 
+    expect_finish_time:Optional[SimTime]=None
+    status:Literal['waiting','running','finished']= 'waiting'
+
+    @property
+    def finish_event(self)->Event:
+        return self.read_finish_event if self.command == 'read' else self.write_finish_event
+
+    def done(self)->bool:
+        # memory 在确定完成时间时就会设置为 finished, 需要等到 finish time 才算真正完成
+        return self.status == 'finished' and self.expect_finish_time <= SimSession.sim_time
+
+    def finish(self,delay:SimTime):
+        self.status = 'finished'
+        now = SimSession.sim_time
+        finish_time = self.expect_finish_time = now + delay
+        # 同一个 port 上的 request 共享 finish event, 不能覆盖其他 request 还没有触发的 notify
+        event = self.finish_event
+        pending_time = event.notify_time
+        if pending_time is None or pending_time <= now:
+            event.notify(delay)
+        elif pending_time != finish_time:
+            event.queue_notify(delay)
+
 
 class DepMemory(SimModule):
     # 暂时只维护 读写的 正确顺序
     # 对于 带宽共享的情况不进行考虑
     
-    def __init__(self):
+    def __init__(self,timing_only:bool=False):
+        """
+        :param timing_only: 只维护 tag 和依赖关系, 不保存写入的数据, read 返回 None
+        """
         super().__init__()
 
+        self.timing_only:bool = timing_only
         self.memory_data:dict[int,any] = defaultdict(None)
         self.memory_tag:dict[int,int] = defaultdict(int)
 
         # 仅仅是该周期到来的 request ,在这一周期必须被处理 
         # 要么成功返回, 要么进入 waiting 状态 等待后续的触发
-        self.pending_write_reqs:defaultdict[int,deque[DepMemoryRequest]] = defaultdict(deque)
-        self.pending_read_reqs:defaultdict[int,deque[DepMemoryRequest]] = defaultdict(deque) 
+        # 每次处理时整体替换为新的 dict, 因此其中只有这一周期有 request 到来的地址
+        self.pending_write_reqs:dict[int,deque[DepMemoryRequest]] = {}
+        self.pending_read_reqs:dict[int,deque[DepMemoryRequest]] = {}
 
-        self.waiting_read_reqs:defaultdict[int,deque[DepMemoryRequest]] = defaultdict(deque)
+        # 按照 (addr, expect_tag) 索引等待的 read, 只有 tag 变为 expect_tag 时才需要检查, 为空时删除
+        self.waiting_read_reqs:dict[tuple[int,int],deque[DepMemoryRequest]] = {}
 
         # 可能会发生的事件
         self.process_trigger_event = Event()
 
 
-        self.register_coroutine(self.process)
+        self.register_coroutine(self.process,daemon=True)
 
 
     def process(self):
         while True:
             SimModule.wait(self.process_trigger_event)
+
+            pending_write_reqs, self.pending_write_reqs = self.pending_write_reqs, {}
+            pending_read_reqs, self.pending_read_reqs = self.pending_read_reqs, {}
+
             # 处理write, 同时唤醒等待 write 的 req
             # 这里要处理 WAW 异常 
             # 如果写了一个 有 tag 的地址, 那么要抛出异常
-            
-            for addr,write_req_deque in self.pending_write_reqs.items():
+            for addr,write_req_deque in pending_write_reqs.items():
                 for write_req in write_req_deque:
-                    if write_req.check_write_tag: 
-                        if self.memory_tag[addr] != 0:
-                            assert False, 'can not write data'
-                        else:
-                            self.memory_data[addr] = write_req.data
-                            self.memory_tag[addr] += 1 
-                    else:
+                    if write_req.check_write_tag and self.memory_tag[addr] != 0:
+                        assert False, 'can not write data'
+
+                    if not self.timing_only:
                         self.memory_data[addr] = write_req.data
-                        self.memory_tag[addr] += 1 
+                    self.memory_tag[addr] += 1 
                     
-                    write_req.write_finish_event.notify(SimTime(1))
-                
-                write_req_deque.clear()
-                
+                    write_req.finish(SimTime(1))
+
                 # 处理相应的 waiting req
-                finish_waiting_reqs = []
-                for waiting_req in self.waiting_read_reqs[addr]:
-                    if self.memory_tag[addr] == waiting_req.expect_tag:
-                        waiting_req.data = self.memory_data[addr]
-                        if waiting_req.clear:
-                            self.memory_tag[addr] = 0
-                        finish_waiting_reqs.append(waiting_req)
-                        waiting_req.read_finish_event.notify(SimTime(1))
-                
-                for finish_req in finish_waiting_reqs:
-                    self.waiting_read_reqs[addr].remove(finish_req)
-                
-                    
-                    
+                self.finish_waiting_reads(addr)
+
             # 最后处理read 操作, 保证 RAW 的正常 
-            for addr,read_req_deque in self.pending_read_reqs.items():
-                for write_req in read_req_deque:
-                    if self.memory_tag[addr] == write_req.expect_tag :
-                        write_req.data = self.memory_data[addr]
-                        if write_req.clear:
-                            self.memory_tag[addr] = 0 
-                        write_req.read_finish_event.notify(SimTime(1))
+            for addr,read_req_deque in pending_read_reqs.items():
+                for read_req in read_req_deque:
+                    if self.memory_tag[addr] == read_req.expect_tag:
+                        self.finish_read(read_req)
                     else:
                         # 进入 waiting 状态
-                        self.waiting_read_reqs[addr].append(write_req)
-                read_req_deque.clear()
+                        key = (addr,read_req.expect_tag)
+                        waiting = self.waiting_read_reqs.get(key)
+                        if waiting is None:
+                            waiting = self.waiting_read_reqs[key] = deque()
+                        waiting.append(read_req)
+                # clear 之后可能有等待 tag 为 0 的 read
+                self.finish_waiting_reads(addr)
+
+    def finish_read(self,read_req:DepMemoryRequest):
+        addr = read_req.addr
+        if not self.timing_only:
+            read_req.data = self.memory_data[addr]
+        if read_req.clear:
+            self.memory_tag[addr] = 0
+        read_req.finish(SimTime(1))
+
+    def finish_waiting_reads(self,addr:int):
+        """
+        按照到达的顺序完成等待当前 tag 的 read, clear 改变 tag 之后继续检查等待新 tag 的 read
+        """
+        while True:
+            tag = self.memory_tag[addr]
+            key = (addr,tag)
+            waiting = self.waiting_read_reqs.get(key)
+            if waiting is None:
+                return
+            while waiting and self.memory_tag[addr] == tag:
+                self.finish_read(waiting.popleft())
+            if not waiting:
+                del self.waiting_read_reqs[key]
+            if self.memory_tag[addr] == tag:
+                return
+
+
+    def preload(self,addr_range:range,source:any=None,tag:int=1,dtype:any=None,chunk_shape:Optional[tuple[int,...]]=None):
+        """
+        批量写入 addr_range 中的所有地址, 并将 tag 设置为 tag, 不检查之前的 tag
+        :param source: NumPy 数组 (第一维为地址), .npy 文件或者 raw 文件, 文件通过 mmap 读取
+            timing only 模式下可以为 None
+        :param dtype: raw 文件的数据类型
+        :param chunk_shape: raw 文件中每个地址的数据形状, None 时根据文件大小平均划分
+        """
+        if not self.timing_only:
+            array = load_chunks(source,len(addr_range),dtype,chunk_shape)
+            self.memory_data.update(zip(addr_range,array))
+        self.memory_tag.update(dict.fromkeys(addr_range,tag))
+
+        # 仿真过程中 preload 时, 完成等待这些地址的 read
+        for addr in dict.fromkeys(addr for addr,_ in self.waiting_read_reqs if addr in addr_range):
+            self.finish_waiting_reads(addr)
 
+    def dump(self,addr_range:range,path:str,dtype:any=None):
+        """
+        将 addr_range 中的数据写出到 .npy 或者 raw 文件中, 没有写入过的地址写出为 0
+        """
+        if self.timing_only:
+            raise ValueError("timing only memory has no data to dump")
+        dump_payloads(path,map(self.memory_data.get,addr_range),len(addr_range),dtype)
 
     def handle_read_request(self,read_req:DepMemoryRequest):
         # for port use 
-        if read_req.addr not in self.pending_read_reqs:
-            self.pending_read_reqs[read_req.addr] = deque()
-        self.pending_read_reqs[read_req.addr].append(read_req)
+        pending = self.pending_read_reqs.get(read_req.addr)
+        if pending is None:
+            pending = self.pending_read_reqs[read_req.addr] = deque()
+        pending.append(read_req)
         self.process_trigger_event.notify(SimTime(1))
 
     def handle_write_request(self,write_req:DepMemoryRequest):
-        if write_req.addr not in self.pending_read_reqs:
-            self.pending_write_reqs[write_req.addr] = deque()
-        self.pending_write_reqs[write_req.addr].append(write_req)
+        if self.timing_only:
+            write_req.data = None
+        pending = self.pending_write_reqs.get(write_req.addr)
+        if pending is None:
+            pending = self.pending_write_reqs[write_req.addr] = deque()
+        pending.append(write_req)
         self.process_trigger_event.notify(SimTime(1))
 
 
 class DepMemoryPort():
-    def __init__(self):
+    """
+    read / write 阻塞直到完成, 每个方向同时只允许一个阻塞的操作
+    issue_read / issue_write 不阻塞, 返回 request 作为 handle, 通过 wait / wait_any 等待完成
+    同一个 port 上可以有多个 outstanding 的 request, 最多 max_outstanding 个, 超过时 issue 阻塞直到有 request 完成
+    """
+    def __init__(self,max_outstanding:Optional[int]=None):
         
         self.dep_memory:Optional[DepMemory] = None
         
+        # 同一个 port 上的 request 共享 finish event, 被唤醒后检查 request 是否完成
         self.read_finish_event = Event()
         self.write_finish_event = Event()
         
@@ -124,12 +202,29 @@ class DepMemoryPort():
         self.read_busy:bool = False
         self.write_busy:bool = False
 
+        # None 表示不限制 outstanding request 的数量
+        self.max_outstanding:Optional[int] = max_outstanding
+        self.outstanding_reqs:deque[DepMemoryRequest] = deque()
+
     def read(self,addr:int,tag_value:int=0,clear:bool=False)->any:
         if self.read_busy:
             assert False,'read port busy'
         
         self.read_busy = True
+        data = self.wait(self.issue_read(addr,tag_value,clear))
+        self.read_busy = False
+        return data
 
+    def write(self,addr:int,data:any=None,check_write_tag:bool=True):
+        
+        if self.write_busy:
+            assert False,'write port busy'
+        
+        self.write_busy = True
+        self.wait(self.issue_write(addr,data,check_write_tag))
+        self.write_busy = False
+
+    def issue_read(self,addr:int,tag_value:int=0,clear:bool=False)->DepMemoryRequest:
         read_req = DepMemoryRequest(
             port=self,
             command='read',
@@ -138,20 +233,10 @@ class DepMemoryPort():
             expect_tag=tag_value,
             clear=clear
         )
+        self.issue(read_req)
+        return read_req
 
-        self.dep_memory.handle_read_request(read_req)
-        SimModule.wait(self.read_finish_event)
-
-        self.read_busy = False
-        return read_req.data
-
-    def write(self,addr:int,data:any,check_write_tag:bool=True):
-        
-        if self.write_busy:
-            assert False,'write port busy'
-        
-        self.write_busy = True
-
+    def issue_write(self,addr:int,data:any=None,check_write_tag:bool=True)->DepMemoryRequest:
         write_req = DepMemoryRequest(
             port=self,
             command='write',
@@ -160,13 +245,62 @@ class DepMemoryPort():
             check_write_tag=check_write_tag,
             write_finish_event=self.write_finish_event
         )
-        
-        self.dep_memory.handle_write_request(write_req)
-        SimModule.wait(self.write_finish_event)
+        self.issue(write_req)
+        return write_req
 
-        self.write_busy = False
+    def issue(self,req:DepMemoryRequest):
+        if self.max_outstanding is not None:
+            self.wait_slot()
+            self.outstanding_reqs.append(req)
 
-    
+        if req.command == 'read':
+            self.dep_memory.handle_read_request(req)
+        else:
+            self.dep_memory.handle_write_request(req)
+
+    def wait_slot(self):
+        # 等待直到 outstanding 的 request 少于 max_outstanding
+        while True:
+            if len(self.outstanding_reqs) >= self.max_outstanding:
+                self.outstanding_reqs = deque(req for req in self.outstanding_reqs if not req.done())
+            if len(self.outstanding_reqs) < self.max_outstanding:
+                return
+            SimModule.wait(self.read_finish_event,self.write_finish_event,reason=self)
+
+    def wait(self,req:DepMemoryRequest)->any:
+        """
+        等待 request 完成
+        :return: read 返回读取的数据, write 返回 None
+        """
+        while not req.done():
+            SimModule.wait(req.finish_event,reason=req)
+        return self.result(req)
+
+    def wait_any(self,reqs:list[DepMemoryRequest])->DepMemoryRequest:
+        """
+        等待任意一个 request 完成, 多个同时完成时返回列表中最靠前的
+        reqs 可以来自不同的 port
+        """
+        events = tuple(dict.fromkeys(req.finish_event for req in reqs))
+        while True:
+            for req in reqs:
+                if req.done():
+                    return req
+            SimModule.wait(*events,reason=reqs)
+
+    def wait_all(self,reqs:list[DepMemoryRequest])->list:
+        """
+        等待所有 request 完成, 返回每个 request 的结果
+        """
+        return [self.wait(req) for req in reqs]
+
+    def result(self,req:DepMemoryRequest)->any:
+        return req.data if req.command == 'read' else None
+
+    @property
+    def timing_only(self)->bool:
+        # timing only 时写入的数据会被丢弃, 使用者可以不构造数据
+        return self.dep_memory.timing_only
 
     def config_dep_memory(self,dep_memory:DepMemory):
         self.dep_memory = dep_memory
@@ -183,7 +317,7 @@ class ChunkMemoryConfig:
 
 T = TypeVar('T')
 
-@dataclass
+@dataclass(slots=True)
 class ChunkPacket(Generic[T]):
     payload: T = None
 
@@ -197,28 +331,32 @@ class ChunkPacket(Generic[T]):
         return self.num_elements * self.batch_size * self.element_bytes
 
 
-@dataclass
+@dataclass(slots=True)
 class ChunkMemoryRequest(DepMemoryRequest):
-    port:ChunkMemoryPort
+    port:ChunkMemoryPort = field(repr=False)
 
     data:ChunkPacket = field(default_factory=lambda: ChunkPacket(
         payload=None,
         num_elements=128,
         batch_size=16,
         element_bytes=2
-    ))
+    ),repr=False)
 
     # num_elements: int = 128 # 元素的个数
     # num_batch_size: int = 16
     # element_bytes: int = 1
 
+    # 不参与 tag 的依赖检查, read 不检查 expect_tag, write 不修改 tag, 用于 cache 的 fill 和 write back
+    # 与同一地址上其他 req 的顺序仍然保持
+    ignore_tag:bool = False
+
+    # 合并之后同时完成的 req, 只有代表整个 burst 的 req 才会设置
+    burst:Optional[list[ChunkMemoryRequest]] = field(default=None,repr=False)
+
     @property
     def chunk_bytes(self)->int:
         return self.data.num_elements*self.data.batch_size*self.data.element_bytes
 
-    expect_finish_time:Optional[SimTime]=None
-    status:Literal['waiting','running','finished']= 'waiting'
-
 
     def __eq__(self, other):
         return self.expect_finish_time == other.expect_finish_time and (id(self) == id(other))
@@ -257,29 +395,57 @@ class ChunkMemory(SimModule):
     基于DepMemory的依赖关系改造而来
     每个地址都表示一个chunk，一个chunk可以用 元素个数 batch size 和 datatype 来表示
     不同chunk之间的 实际大小 bytes 可能是不同的， 但是 element 数应该是一致的
-    读取和写入的时间取决于 bytes的情况，与其他的无关
+    读取和写入的时间由 timing 决定, 默认为 BandwidthTiming, 只取决于 bytes的情况，与其他的无关
     """
 
 
 
-    def __init__(self,bandwidth:int=16):
+    def __init__(self,bandwidth:int=16,timing:Optional[ChunkMemoryTiming]=None,timing_only:bool=False,
+                 storage:Optional[NumpyChunkStorage]=None,coalesce:bool=False,max_burst:int=16):
+        """
+        :param timing_only: 只维护 tag 和依赖关系, 不保存写入的 payload, read 返回 None
+        :param storage: 使用 NumPy 数组保存 payload, read 返回只读的 view
+            此时 request 的 chunk 大小由数组的 dtype 和 shape 决定
+        :param coalesce: 将同一次发射的, 地址连续且方向相同的 req 合并为一个 burst
+            burst 中的每个 req 仍然单独计算延迟, 完成时间与不合并时相同,
+            完成时间相同的 req 在 running queue 中只占一项, 只需要一次唤醒
+            依赖关系仍然按照每个地址单独处理
+        :param max_burst: 一个 burst 最多包含的 req 数量
+        """
         super().__init__()
 
+        if timing_only and storage is not None:
+            raise ValueError("timing_only memory can not have a storage")
+        self.timing_only:bool = timing_only
+        self.storage:Optional[NumpyChunkStorage] = storage
+
         self.bandwidth = bandwidth # bytes/cycle  每个 port 的
+        self.timing:ChunkMemoryTiming = timing if timing is not None else BandwidthTiming(bandwidth)
+
+        self.coalesce:bool = coalesce
+        self.max_burst:int = max_burst
+        # coalesce 时本次发射的 req, 发射结束之后再合并
+        self._issued_reqs:list[ChunkMemoryRequest] = []
 
         self.memory_data:dict[int,any] = defaultdict(None)
         self.memory_tag:dict[int,int] = defaultdict(int)
 
-        self.waiting_req_queue = deque()
         self.running_write_queue:UniquePriorityQueue[ChunkMemoryRequest] = UniquePriorityQueue()
         self.running_read_queue:UniquePriorityQueue[ChunkMemoryRequest] = UniquePriorityQueue()
 
-        self.waiting_req_queue:UniqueDeque[ChunkMemoryRequest] = UniqueDeque()
-
+        # 按地址索引的依赖信息, 冲突只会发生在同一个地址的 req 之间
+        # 每个地址上等待的 req, 保持到达的顺序, 为空时删除
+        self.waiting_reqs:dict[int,deque[ChunkMemoryRequest]] = {}
+        # 每个地址上正在执行的 read / clear read / write 的数量, 为 0 时删除
+        self._running_reads:dict[int,int] = {}
+        self._running_clear_reads:dict[int,int] = {}
+        self._running_writes:dict[int,int] = {}
+        # 状态发生变化 (新的 req 到达或者有 req 结束) 的地址, 只有这些地址需要重新检查发射
+        self._dirty_addrs:dict[int,None] = {}
 
         self._update_event_queue = EventQueue()
         self.update_event = self._update_event_queue.event
-        self.register_coroutine(self.process)
+        self.register_coroutine(self.process,daemon=True)
 
 
     def process(self):
@@ -290,9 +456,8 @@ class ChunkMemory(SimModule):
             # 首先处理 running queue 中已经结束的 req
             self.finish_running_reqs()
 
-            # 之后不断从waiting queue 中取出新的 req，将其迁移到  running queue 中执行
-            while self.schedule_one_waiting_req():
-                pass
+            # 之后对状态发生变化的地址, 发射所有没有冲突的 req
+            self.schedule_waiting_reqs()
 
 
     def finish_running_reqs(self):
@@ -303,32 +468,54 @@ class ChunkMemory(SimModule):
 
         # 首先处理 read queue
         while self.running_read_queue:
-            if self.running_read_queue.peek().expect_finish_time.cycle == cur_time.cycle:
-                finished_req = self.running_read_queue.pop()
-                finished_req.status = 'finished'
-                # 唤醒相关进程
-                finished_req.read_finish_event.notify(SimTime(0))
-                # 如果 clear == True 需要设置 tag 的状态
-                if finished_req.clear:
-                    self.memory_tag[finished_req.addr] = 0
-
-                finished_req.data.payload = self.memory_data[finished_req.addr]
+            if self.running_read_queue.peek().expect_finish_time.cycle <= cur_time.cycle:
+                finished = self.running_read_queue.pop()
+                for finished_req in finished.burst or (finished,):
+                    self.timing.on_finish(finished_req,cur_time.cycle)
+                    # 唤醒相关进程
+                    finished_req.finish(SimTime(0))
+                    # 如果 clear == True 需要设置 tag 的状态
+                    if finished_req.clear:
+                        self.memory_tag[finished_req.addr] = 0
+                        self._decrease_running(self._running_clear_reads,finished_req.addr)
+                    self._decrease_running(self._running_reads,finished_req.addr)
+                    self._dirty_addrs[finished_req.addr] = None
+
+                    if self.storage is not None:
+                        finished_req.data.payload = self.storage.read(finished_req.addr)
+                    elif not self.timing_only:
+                        # ignore_tag 的 read (例如 cache 的 fill) 可能读取从未写入的地址, 此时返回 None
+                        finished_req.data.payload = self.memory_data.get(finished_req.addr)
             else:
                 break
 
         # 然后处理write queue
         while self.running_write_queue:
-            if self.running_write_queue.peek().expect_finish_time.cycle == cur_time.cycle:
-                finished_req = self.running_write_queue.pop()
-                finished_req.status = 'finished'
-                # 唤醒相关的进程
-                finished_req.write_finish_event.notify(SimTime(0))
-
-                self.memory_data[finished_req.addr] = finished_req.data.payload
-                self.memory_tag[finished_req.addr] += 1
+            if self.running_write_queue.peek().expect_finish_time.cycle <= cur_time.cycle:
+                finished = self.running_write_queue.pop()
+                for finished_req in finished.burst or (finished,):
+                    self.timing.on_finish(finished_req,cur_time.cycle)
+                    # 唤醒相关的进程
+                    finished_req.finish(SimTime(0))
+
+                    if self.storage is not None:
+                        self.storage.write(finished_req.addr,finished_req.data.payload)
+                    elif not self.timing_only:
+                        self.memory_data[finished_req.addr] = finished_req.data.payload
+                    if not finished_req.ignore_tag:
+                        self.memory_tag[finished_req.addr] += 1
+                    self._decrease_running(self._running_writes,finished_req.addr)
+                    self._dirty_addrs[finished_req.addr] = None
             else:
                 break
 
+    @staticmethod
+    def _decrease_running(counter:dict[int,int],addr:int):
+        if counter[addr] == 1:
+            del counter[addr]
+        else:
+            counter[addr] -= 1
+
 
     def direct_write(self,addr:int,data:any,check_write_tag:bool=True,
                      num_elements:int=128,num_batch_size:int=1,element_bytes:int=1):
@@ -338,144 +525,228 @@ class ChunkMemory(SimModule):
         if check_write_tag:
             assert self.memory_tag[addr] == 0
 
-        self.memory_data[addr]  = data
+        if self.storage is not None:
+            self.storage.write(addr,data)
+        elif not self.timing_only:
+            self.memory_data[addr]  = data
         self.memory_tag[addr] += 1
+        self._dirty_addrs[addr] = None
 
 
-    def schedule_one_waiting_req(self)->bool:
-        """
-        每次只发射一条 req， 通过多次调用实现完整的一个cycle的发射任务
-        :return: 是否发射成功
-        """
-
-        def check_conflict(cur_req:ChunkMemoryRequest,pos:int)->bool:
-            """
-            有 conflict 返回一个true
-            :param cur_req:
-            :param pos:
-            :return:
-            """
-            if cur_req.command == 'read':
-
-                # 检查 waiting queue
-                req:ChunkMemoryRequest
-                for i,req in enumerate(self.waiting_req_queue):
-                    if i >= pos:
-                        break
-                    # 开始检查
-                    if req.addr == cur_req.addr:
-                        if req.command == 'write': # RAW
-                            return True
-                        elif req.command == 'read' and req.clear == True: # RAR
-                            return True
-
-                # 检查 running queue
-                for req in self.running_read_queue:
-                    if req.addr == cur_req.addr and req.clear: # RAR
-                        return True
-
-                for req in self.running_write_queue:
-                    if req.addr == cur_req.addr:
-                        return True # WAR
-
-                # 检查 tag
-                if cur_req.expect_tag != self.memory_tag[cur_req.addr]:
-                    return True
-
-
-            elif cur_req.command == 'write':
-                req:ChunkMemoryRequest
-                for i,req in enumerate(self.waiting_req_queue):
-                    if i >= pos:
-                        break
-
-                    if req.addr == cur_req.addr:
-                        if req.command == 'write': return True
-                        # if req.command == 'read' and req.clear == True:
-                        #     if self.memory_tag[req.addr] == 0: return False
-                        #     else: return True
-                        # 这段应该是重复的
-
-                for req in self.running_read_queue:
-                    if req.addr == cur_req.addr:
-                        return True
-
-                for req in self.running_write_queue:
-                    if req.addr == cur_req.addr:
-                        return True
-
-                # 检查TAG
-                if cur_req.check_write_tag and self.memory_tag[cur_req.addr] !=0:
-                    return True
-
+    def preload(self,addr_range:range,source:any=None,tag:int=1,dtype:any=None,chunk_shape:Optional[tuple[int,...]]=None):
+        """
+        批量写入 addr_range 中的所有地址, 并将 tag 设置为 tag, 不检查之前的 tag
+        :param source: NumPy 数组 (第一维为地址), .npy 文件或者 raw 文件, 文件通过 mmap 读取
+            使用 storage 时直接复制到 storage 的数组中, dtype 和 chunk_shape 由 storage 决定
+            timing only 模式下可以为 None
+        """
+        if self.storage is not None:
+            array = load_chunks(source,len(addr_range),self.storage.dtype,self.storage.chunk_shape)
+            self.storage.array[range_to_slice(addr_range)] = array
+        elif not self.timing_only:
+            array = load_chunks(source,len(addr_range),dtype,chunk_shape)
+            self.memory_data.update(zip(addr_range,array))
+        self.memory_tag.update(dict.fromkeys(addr_range,tag))
+
+        # 仿真过程中 preload 时, 等待这些地址的 req 需要重新检查
+        dirty = dict.fromkeys(addr for addr in self.waiting_reqs if addr in addr_range)
+        if dirty:
+            self._dirty_addrs.update(dirty)
+            self._update_event_queue.next_notify(SimTime(1))
+
+    def dump(self,addr_range:range,path:str,dtype:any=None):
+        """
+        将 addr_range 中的数据写出到 .npy 或者 raw 文件中, 没有写入过的地址写出为 0
+        """
+        if self.storage is not None:
+            save_chunks(path,self.storage.array[range_to_slice(addr_range)])
+        elif self.timing_only:
+            raise ValueError("timing only memory has no data to dump")
+        else:
+            dump_payloads(path,map(self.memory_data.get,addr_range),len(addr_range),dtype)
+
+    def schedule_waiting_reqs(self):
+        """
+        对每个状态发生变化的地址, 按照到达的顺序发射所有没有冲突的 req
+        与每次从整个 waiting queue 中找第一条没有冲突的 req 发射是等价的:
+        冲突只和同一地址上更早的 waiting req 以及 running req 有关, 发射一条 req 只会增加同一地址上的冲突
+        """
+        dirty_addrs = self._dirty_addrs
+        self._dirty_addrs = {}
+        for addr in dirty_addrs:
+            if addr in self.waiting_reqs:
+                self.schedule_addr(addr)
+
+        if self._issued_reqs:
+            issued, self._issued_reqs = self._issued_reqs, []
+            self.start_bursts(issued)
+
+    def start_bursts(self,issued:list[ChunkMemoryRequest]):
+        # 按照发射的顺序, 将地址连续且方向相同的 req 合并
+        burst:list[ChunkMemoryRequest] = []
+        for req in issued:
+            if burst and (req.command != burst[-1].command or req.addr != burst[-1].addr + 1
+                          or len(burst) >= self.max_burst):
+                self.start_burst(burst)
+                burst = []
+            burst.append(req)
+        if burst:
+            self.start_burst(burst)
+
+    def start_burst(self,reqs:list[ChunkMemoryRequest]):
+        if len(reqs) == 1:
+            self.start_req(reqs[0])
+            return
+        # 每个 req 按照发射的顺序单独计算延迟, 完成时间与不合并时相同
+        # 完成时间相同的 req 在 running queue 中只占一项, 只需要一次唤醒
+        groups:dict[SimTime,list[ChunkMemoryRequest]] = {}
+        for req in reqs:
+            latency = self.calc_latency(req)
+            group = groups.get(latency)
+            if group is None:
+                groups[latency] = [req]
             else:
-                raise ValueError
-
-
-            return False
+                group.append(req)
+
+        first = reqs[0]
+        for latency,group in groups.items():
+            if len(group) == 1:
+                self.finish_req_after(group[0],latency)
+                continue
+            # 代表这一组 req 的 req, 只用于在 running queue 中排序
+            burst_req = ChunkMemoryRequest(
+                port=first.port,
+                command=first.command,
+                addr=group[0].addr,
+                status='running',
+                burst=group
+            )
+            self.finish_req_after(burst_req,latency)
 
+    def schedule_addr(self,addr:int):
+        waiting = self.waiting_reqs[addr]
+        tag = self.memory_tag[addr]
 
-        to_be_issue_req:Optional[ChunkMemoryRequest] = None
+        # 同一地址上更早的, 仍然在等待的 req
+        prev_write = False
+        prev_clear_read = False
 
+        remaining:deque[ChunkMemoryRequest] = deque()
         req:ChunkMemoryRequest
-        for i,req in enumerate(self.waiting_req_queue):
-            if not check_conflict(req,i):
-                to_be_issue_req = req
-                break
-
-        if to_be_issue_req:
-            # 发射该条req
-
-            # 首先删除 waiting queue
-            self.waiting_req_queue.remove(to_be_issue_req)
-            # 配置延迟信息
-            latency = self.calc_latency(to_be_issue_req)
-            to_be_issue_req.expect_finish_time = SimSession.sim_time + latency
-            # 设定激发时间
-            self._update_event_queue.next_notify(latency)
-
-            to_be_issue_req.status = 'running'
+        for req in waiting:
+            if req.command == 'read':
+                # RAW / RAR(clear) / WAR, 以及 tag 检查
+                conflict = prev_write or prev_clear_read \
+                    or addr in self._running_clear_reads or addr in self._running_writes \
+                    or (not req.ignore_tag and req.expect_tag != tag)
+            elif req.command == 'write':
+                conflict = prev_write \
+                    or addr in self._running_reads or addr in self._running_writes \
+                    or (req.check_write_tag and tag != 0)
+            else:
+                raise ValueError
 
-            # 插入到队列中
-            if to_be_issue_req.command == 'read':
-                self.running_read_queue.add(to_be_issue_req)
-            elif to_be_issue_req.command == 'write':
-                self.running_write_queue.add(to_be_issue_req)
+            if conflict:
+                remaining.append(req)
+                if req.command == 'write':
+                    prev_write = True
+                elif req.clear:
+                    prev_clear_read = True
+            else:
+                self.issue_req(req)
+
+        if remaining:
+            self.waiting_reqs[addr] = remaining
+        else:
+            del self.waiting_reqs[addr]
+
+    def issue_req(self,req:ChunkMemoryRequest):
+        req.status = 'running'
+
+        # 记录依赖信息, 之后同一地址上的 req 需要等待该 req 完成
+        addr = req.addr
+        if req.command == 'read':
+            self._running_reads[addr] = self._running_reads.get(addr,0) + 1
+            if req.clear:
+                self._running_clear_reads[addr] = self._running_clear_reads.get(addr,0) + 1
+        else:
+            self._running_writes[addr] = self._running_writes.get(addr,0) + 1
+
+        if self.coalesce:
+            self._issued_reqs.append(req)
+        else:
+            self.start_req(req)
+
+    def start_req(self,req:ChunkMemoryRequest):
+        """
+        确定 req 的完成时间, 子类可以重写, 延后确定完成时间 (例如 DRAM 中在 bank 空闲时才开始)
+        """
+        # 配置延迟信息
+        latency = self.calc_latency(req)
+        self.finish_req_after(req,latency)
 
-            return True
+    def finish_req_after(self,req:ChunkMemoryRequest,latency:SimTime):
+        req.expect_finish_time = SimSession.sim_time + latency
+        # 设定激发时间
+        self._update_event_queue.next_notify(latency)
 
-        return False
+        # 插入到队列中
+        if req.command == 'read':
+            self.running_read_queue.add(req)
+        else:
+            self.running_write_queue.add(req)
 
 
     def calc_latency(self,req:ChunkMemoryRequest)->SimTime:
-        data_bytes = req.chunk_bytes
-
-        latency = math.ceil(data_bytes/self.bandwidth)
-        
-        return SimTime(latency)
+        return SimTime(self.timing.submit(req,SimSession.sim_time.cycle))
 
 
 
 
     def handle_read_request(self,read_req:ChunkMemoryRequest):
-        self.waiting_req_queue.append(read_req)
+        self.add_waiting_req(read_req)
         self._update_event_queue.next_notify(SimTime(1))
 
 
 
     def handle_write_request(self,write_req:ChunkMemoryRequest):
-        self.waiting_req_queue.append(write_req)
+        self.add_waiting_req(write_req)
+        self._update_event_queue.next_notify(SimTime(1))
+
+    def handle_requests(self,reqs:list[ChunkMemoryRequest]):
+        # 一次接收多个 req, 只需要一次 notify
+        for req in reqs:
+            self.add_waiting_req(req)
         self._update_event_queue.next_notify(SimTime(1))
 
+    def add_waiting_req(self,req:ChunkMemoryRequest):
+        if self.timing_only and req.command == 'write':
+            # 只保留大小信息, 不持有 payload
+            req.data.payload = None
+        if self.storage is not None:
+            # chunk 的大小由 storage 决定
+            req.data.num_elements = self.storage.num_elements
+            req.data.batch_size = self.storage.batch_size
+            req.data.element_bytes = self.storage.element_bytes
+        waiting = self.waiting_reqs.get(req.addr)
+        if waiting is None:
+            waiting = self.waiting_reqs[req.addr] = deque()
+        waiting.append(req)
+        self._dirty_addrs[req.addr] = None
+
 
 
 class ChunkMemoryPort(DepMemoryPort):
-    def __init__(self,chunk_memory:Optional[ChunkMemory]=None):
-        super().__init__()
+    def __init__(self,chunk_memory:Optional[ChunkMemory]=None,max_outstanding:Optional[int]=None):
+        super().__init__(max_outstanding)
 
         self.chunk_memory:Optional[ChunkMemory] = chunk_memory
 
 
+    @property
+    def timing_only(self)->bool:
+        return self.chunk_memory.timing_only
+
     def config_chunk_memory(self,chunk_memory:ChunkMemory) -> None:
         self.chunk_memory = chunk_memory
 
@@ -486,8 +757,63 @@ class ChunkMemoryPort(DepMemoryPort):
             raise RuntimeError('read busy')
 
         self.read_busy = True
+        data = self.wait(self.issue_read(addr,tag_value,clear,num_elements,num_batch_size,element_bytes))
+        self.read_busy = False
+        return data
+
+
+    def write(self,addr:int,data:any=None,check_write_tag:bool=True,
+                num_elements:int=128,num_batch_size:int=16,element_bytes:int=1):
+        if self.write_busy:
+            raise RuntimeError('write busy')
+        self.write_busy = True
+        self.wait(self.issue_write(addr,data,check_write_tag,num_elements,num_batch_size,element_bytes))
+        self.write_busy = False
 
-        read_req = ChunkMemoryRequest(
+    def read_many(self,addrs:Iterable[int],tag_value:int=0,clear:bool=False,
+                  num_elements:int=128,num_batch_size:int=16,element_bytes:int=1)->list:
+        """
+        一次读取多个地址, 阻塞直到全部完成, 返回的数据与 addrs 的顺序一致
+        """
+        return self.wait_all(self.issue_read_many(addrs,tag_value,clear,num_elements,num_batch_size,element_bytes))
+
+    def write_many(self,addrs:Iterable[int],data:Optional[Iterable[any]]=None,check_write_tag:bool=True,
+                   num_elements:int=128,num_batch_size:int=16,element_bytes:int=1):
+        self.wait_all(self.issue_write_many(addrs,data,check_write_tag,num_elements,num_batch_size,element_bytes))
+
+    def issue_read(self,addr:int,tag_value:int=0,clear:bool=False,
+                   num_elements:int=128,num_batch_size:int=16,element_bytes:int=1)->ChunkMemoryRequest:
+        read_req = self.make_read_req(addr,tag_value,clear,num_elements,num_batch_size,element_bytes)
+        self.issue(read_req)
+        return read_req
+
+    def issue_write(self,addr:int,data:any=None,check_write_tag:bool=True,
+                    num_elements:int=128,num_batch_size:int=16,element_bytes:int=1)->ChunkMemoryRequest:
+        write_req = self.make_write_req(addr,data,check_write_tag,num_elements,num_batch_size,element_bytes)
+        self.issue(write_req)
+        return write_req
+
+    def issue_read_many(self,addrs:Iterable[int],tag_value:int=0,clear:bool=False,
+                        num_elements:int=128,num_batch_size:int=16,element_bytes:int=1)->list[ChunkMemoryRequest]:
+        """
+        每个地址仍然是一个单独的 request, 依赖关系分别检查, 但是只需要一次提交
+        """
+        reqs = [self.make_read_req(addr,tag_value,clear,num_elements,num_batch_size,element_bytes) for addr in addrs]
+        self.issue_many(reqs)
+        return reqs
+
+    def issue_write_many(self,addrs:Iterable[int],data:Optional[Iterable[any]]=None,check_write_tag:bool=True,
+                         num_elements:int=128,num_batch_size:int=16,element_bytes:int=1)->list[ChunkMemoryRequest]:
+        addrs = list(addrs)
+        data = [None] * len(addrs) if data is None else data
+        reqs = [self.make_write_req(addr,payload,check_write_tag,num_elements,num_batch_size,element_bytes)
+                for addr,payload in zip(addrs,data,strict=True)]
+        self.issue_many(reqs)
+        return reqs
+
+    def make_read_req(self,addr:int,tag_value:int,clear:bool,
+                      num_elements:int,num_batch_size:int,element_bytes:int)->ChunkMemoryRequest:
+        return ChunkMemoryRequest(
             port=self,
             command='read',
             addr=addr,
@@ -501,19 +827,9 @@ class ChunkMemoryPort(DepMemoryPort):
             )
         )
 
-        self.chunk_memory.handle_read_request(read_req)
-        SimModule.wait(self.read_finish_event)
-
-        self.read_busy = False
-        return read_req.data.payload
-
-
-    def write(self,addr:int,data:any,check_write_tag:bool=True,
-                num_elements:int=128,num_batch_size:int=16,element_bytes:int=1):
-        if self.write_busy:
-            raise RuntimeError('write busy')
-        self.write_busy = True
-        write_req = ChunkMemoryRequest(
+    def make_write_req(self,addr:int,data:any,check_write_tag:bool,
+                       num_elements:int,num_batch_size:int,element_bytes:int)->ChunkMemoryRequest:
+        return ChunkMemoryRequest(
             port=self,
             command='write',
             addr=addr,
@@ -527,8 +843,23 @@ class ChunkMemoryPort(DepMemoryPort):
             ),
         )
 
-        self.chunk_memory.handle_write_request(write_req)
-        SimModule.wait(self.write_finish_event)
-
-        self.write_busy = False
-
+    def issue(self,req:ChunkMemoryRequest):
+        if self.max_outstanding is not None:
+            self.wait_slot()
+            self.outstanding_reqs.append(req)
+
+        if req.command == 'read':
+            self.chunk_memory.handle_read_request(req)
+        else:
+            self.chunk_memory.handle_write_request(req)
+
+    def issue_many(self,reqs:list[ChunkMemoryRequest]):
+        if self.max_outstanding is not None:
+            # 需要逐个等待空闲的位置
+            for req in reqs:
+                self.issue(req)
+        else:
+            self.chunk_memory.handle_requests(reqs)
+
+    def result(self,req:ChunkMemoryRequest)->any:
+        return req.data.payload if req.command == 'read' else None
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import math
+import os
+from typing import Any, Iterable, Optional
+
+
+def import_numpy():
+    # numpy 是可选的依赖, 只有使用 NumpyChunkStorage 或者 preload / dump 时才需要
+    try:
+        import numpy
+    except ImportError as e:
+        raise ImportError("this feature requires numpy, install it with `pip install numpy`") from e
+    return numpy
+
+
+class NumpyChunkStorage:
+    """
+    ChunkMemory 的 NumPy 后端, 所有 chunk 保存在一个预先分配的数组中, 第一维为 chunk 的地址
+    写入时复制一次到数组中, 读取时返回只读的 view, 不再复制
+    view 与数组共享内存, 之后对同一个地址的写入会反映到之前读取的 view 中
+    """
+    def __init__(self,num_chunks:int,chunk_shape:tuple[int,...]|int,dtype:Any='float32',
+                 path:Optional[str]=None,mode:str='w+'):
+        """
+        :param chunk_shape: 每个 chunk 的形状, 最后一维为 num_elements, 之前的维度合并为 batch_size
+        :param path: 不为 None 时使用 np.memmap 保存在文件中
+        :param mode: np.memmap 的打开模式, 'r+' 可以使用已有的文件
+        """
+        np = import_numpy()
+
+        if isinstance(chunk_shape,int):
+            chunk_shape = (chunk_shape,)
+        self.num_chunks:int = num_chunks
+        self.chunk_shape:tuple[int,...] = tuple(chunk_shape)
+        self.dtype = np.dtype(dtype)
+
+        shape = (num_chunks,*self.chunk_shape)
+        if path is None:
+            self.array = np.zeros(shape,self.dtype)
+        else:
+            self.array = np.memmap(path,self.dtype,mode=mode,shape=shape)
+
+    @property
+    def num_elements(self)->int:
+        return self.chunk_shape[-1]
+
+    @property
+    def batch_size(self)->int:
+        return math.prod(self.chunk_shape[:-1])
+
+    @property
+    def element_bytes(self)->int:
+        return self.dtype.itemsize
+
+    @property
+    def chunk_bytes(self)->int:
+        return self.num_elements * self.batch_size * self.element_bytes
+
+    def write(self,addr:int,payload:Any):
+        self.array[addr] = payload
+
+    def read(self,addr:int):
+        view = self.array[addr]
+        view.flags.writeable = False
+        return view
+
+    def flush(self):
+        if hasattr(self.array,'flush'):
+            self.array.flush()
+
+
+def range_to_slice(addr_range:range)->slice:
+    return slice(addr_range.start,addr_range.stop,addr_range.step)
+
+
+def load_chunks(source:Any,num_chunks:int,dtype:Any=None,chunk_shape:Optional[tuple[int,...]]=None):
+    """
+    将 preload 的数据源转换为第一维为 chunk 的数组, 文件通过 mmap 读取, 不会一次性读入内存
+    :param source: NumPy 数组, .npy 文件或者 raw 文件的路径
+    :param dtype: raw 文件的数据类型
+    :param chunk_shape: raw 文件中每个 chunk 的形状, None 时根据文件大小平均划分
+    """
+    np = import_numpy()
+
+    if isinstance(source,(str,os.PathLike)):
+        if os.fspath(source).endswith('.npy'):
+            array = np.load(source,mmap_mode='r')
+        else:
+            if dtype is None:
+                raise ValueError("dtype is required to preload a raw file")
+            if chunk_shape is None:
+                array = np.memmap(source,dtype,mode='r')
+                array = array.reshape(num_chunks,-1)
+            else:
+                array = np.memmap(source,dtype,mode='r',shape=(num_chunks,*chunk_shape))
+    else:
+        array = np.asarray(source,dtype)
+
+    if len(array) != num_chunks:
+        raise ValueError(f"expect {num_chunks} chunks, got {len(array)}")
+    return array
+
+
+def save_chunks(path:str|os.PathLike,array:Any):
+    """
+    .npy 文件使用 np.save 保存, 其他的按照 raw 格式保存
+    """
+    np = import_numpy()
+    if os.fspath(path).endswith('.npy'):
+        np.save(path,array)
+    else:
+        array.tofile(path)
+
+
+def dump_payloads(path:str|os.PathLike,payloads:Iterable[Any],num_chunks:int,dtype:Any=None):
+    """
+    逐个写出 payload, 不会构造包含所有 payload 的中间数组
+    所有 payload 需要具有相同的形状, 形状和 dtype 由第一个 payload 决定, 为 None 的 payload 写出为 0
+    """
+    np = import_numpy()
+
+    payloads = iter(payloads)
+    first = None
+    prefix = []
+    # 找到第一个不为 None 的 payload 确定形状
+    for payload in payloads:
+        prefix.append(payload)
+        if payload is not None:
+            first = np.asarray(payload,dtype)
+            break
+    if first is None:
+        raise ValueError("no data to dump")
+    zeros = np.zeros_like(first)
+
+    def rows():
+        for payload in prefix:
+            yield zeros if payload is None else payload
+        for payload in payloads:
+            yield zeros if payload is None else payload
+
+    if os.fspath(path).endswith('.npy'):
+        out = np.lib.format.open_memmap(path,mode='w+',dtype=first.dtype,shape=(num_chunks,*first.shape))
+        for i,row in enumerate(rows()):
+            out[i] = row
+        out.flush()
+        del out
+    else:
+        with open(path,'wb') as f:
+            for row in rows():
+                f.write(np.asarray(row,first.dtype).tobytes())
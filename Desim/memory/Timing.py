@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import math
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from Desim.memory.Memory import ChunkMemoryRequest
+
+
+class ChunkMemoryTiming(ABC):
+    """
+    ChunkMemory 的时序模型
+    req 发射时调用 submit, 直接计算出完成的周期, 之后由 ChunkMemory 在该周期唤醒, 不需要每个周期轮询
+    req 完成时调用 on_finish
+    子类必须实现 submit, 否则无法创建实例
+    """
+
+    @abstractmethod
+    def submit(self,req:ChunkMemoryRequest,now:int)->int:
+        """
+        :param now: 当前周期
+        :return: req 的延迟, 单位为周期
+        """
+
+    def on_finish(self,req:ChunkMemoryRequest,now:int):
+        pass
+
+
+class BandwidthTiming(ChunkMemoryTiming):
+    """
+    每个 req 都独占 bandwidth, 相互之间没有影响, 即 ChunkMemory 原来的时序
+    """
+    def __init__(self,bandwidth:int=16):
+        self.bandwidth = bandwidth # bytes/cycle
+
+    def submit(self,req:ChunkMemoryRequest,now:int)->int:
+        return math.ceil(req.chunk_bytes/self.bandwidth)
+
+
+class BankedTiming(ChunkMemoryTiming):
+    """
+    多个 bank 共享一条总线
+    地址按照 interleave 个 chunk 为单位交织到各个 bank 上, 每个 bank 同时只能服务一个 req, 冲突的 req 依次排队
+    所有 bank 共享总带宽 bandwidth, 总线按照 req 发射的顺序分配传输的时间片 (FCFS),
+    因此任意时刻的总吞吐不会超过 bandwidth
+    """
+    def __init__(self,num_banks:int=8,bandwidth:int=64,bank_bandwidth:int=16,
+                 interleave:int=1,bank_latency:int=0):
+        """
+        :param bandwidth: 所有 bank 共享的总带宽 bytes/cycle
+        :param bank_bandwidth: 单个 bank 的带宽 bytes/cycle
+        :param interleave: 连续多少个地址映射到同一个 bank
+        :param bank_latency: 每次访问 bank 的固定延迟
+        """
+        self.num_banks = num_banks
+        self.bandwidth = bandwidth
+        self.bank_bandwidth = bank_bandwidth
+        self.interleave = interleave
+        self.bank_latency = bank_latency
+
+        # 每个 bank 以及总线空闲下来的周期
+        self.bank_free_cycle:list[int] = [0] * num_banks
+        self.bus_free_cycle:int = 0
+
+        # 统计信息
+        self.bank_busy_cycles:list[int] = [0] * num_banks
+        self.bus_busy_cycles:int = 0
+        self.bank_conflicts:int = 0
+
+    def bank_of(self,addr:int)->int:
+        return (addr // self.interleave) % self.num_banks
+
+    def submit(self,req:ChunkMemoryRequest,now:int)->int:
+        bank = self.bank_of(req.addr)
+        chunk_bytes = req.chunk_bytes
+
+        # bank 被之前的 req 占用时需要等待
+        start = self.bank_free_cycle[bank]
+        if start > now:
+            self.bank_conflicts += 1
+        else:
+            start = now
+        bank_cycles = self.bank_latency + math.ceil(chunk_bytes/self.bank_bandwidth)
+        self.bank_free_cycle[bank] = start + bank_cycles
+        self.bank_busy_cycles[bank] += bank_cycles
+
+        # 在共享总线上预约传输的时间片
+        bus_cycles = math.ceil(chunk_bytes/self.bandwidth)
+        bus_start = max(start,self.bus_free_cycle)
+        self.bus_free_cycle = bus_start + bus_cycles
+        self.bus_busy_cycles += bus_cycles
+
+        return max(start + bank_cycles, self.bus_free_cycle) - now
+
+    def utilization(self,cycles:int)->tuple[float,list[float]]:
+        """
+        :return: 总线和每个 bank 在 cycles 个周期内的利用率
+        """
+        return self.bus_busy_cycles / cycles, [busy / cycles for busy in self.bank_busy_cycles]
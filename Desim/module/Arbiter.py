@@ -0,0 +1,150 @@
+from typing import Literal, Optional
+
+from greenlet import greenlet
+
+from Desim.Core import Event, SimModule, SimSession, SimTime
+
+
+ArbiterPolicy = Literal['round_robin','fixed','weighted']
+
+
+class Arbiter(SimModule):
+    """
+    多个 requester 共享一个资源 (例如一个 ChunkMemoryPort 或者一个 FIFO) 时的仲裁器
+    requester 通过编号调用 request 阻塞直到获得 grant, 使用完成之后调用 release
+    同时最多有 num_grants 个 requester 持有 grant
+
+    有空闲的 grant 时 request 在 requester 自己的 delta cycle 中直接获得 grant, 不需要等待
+    没有空闲的 grant 时 requester 记录在自己的 slot 中等待, release 时按照 policy 从等待的 requester 中选择
+        round_robin 从上一次获得 grant 的下一个 requester 开始查找
+        fixed       编号小的 requester 优先
+        weighted    加权的 round robin, 轮到 requester i 时最多连续获得 weights[i] 次 grant,
+                    它没有在等待时先 grant 给之后的 requester, 持续竞争时获得 grant 的比例接近 weights
+
+    所有请求保存在一个 bitmask 中, 通过位运算直接找到下一个 requester, 请求时不需要分配对象
+    所有 requester 共享一个 grant event, 等待时不注册在 event 上, 获得 grant 时才加入 event 的等待者,
+    因此每次 grant 只唤醒获得 grant 的 requester
+    """
+    def __init__(self,num_requesters:int,policy:ArbiterPolicy='round_robin',num_grants:int=1,
+                 weights:Optional[list[int]]=None,name:Optional[str]=None):
+        super().__init__()
+
+        if policy not in ('round_robin','fixed','weighted'):
+            raise ValueError(f"unknown arbiter policy: {policy}")
+        if policy == 'weighted':
+            if weights is None or len(weights) != num_requesters or min(weights) <= 0:
+                raise ValueError("weighted arbiter requires a positive weight for each requester")
+
+        self.name:str = name or f"Arbiter@{id(self):#x}"
+        self.num_requesters = num_requesters
+        self.policy:ArbiterPolicy = policy
+        self.num_grants = num_grants
+        self.weights:Optional[list[int]] = weights
+
+        # 等待 grant 以及持有 grant 的 requester, 第 i 位对应 requester i
+        self._pending:int = 0
+        self._granted:int = 0
+        self._free:int = num_grants
+        # round robin 开始查找的位置
+        self._pointer:int = 0
+        # weighted 中每个 requester 剩余的次数, 以及还有剩余次数的 requester
+        self._credits:list[int] = list(weights) if weights is not None else []
+        self._eligible:int = (1 << num_requesters) - 1
+
+        # 每个 requester 等待时所在的 coroutine
+        self._slots:list[Optional[greenlet]] = [None] * num_requesters
+        self._grant_event = Event()
+        self._grant_delay = SimTime(0)
+
+        # 统计信息
+        self.grants:list[int] = [0] * num_requesters
+        self.grant_wait_cycles:list[int] = [0] * num_requesters
+
+    def request(self,requester:int):
+        """
+        阻塞直到 requester 获得 grant
+        """
+        bit = 1 << requester
+        if (self._pending | self._granted) & bit:
+            raise RuntimeError(f"requester {requester} already requested {self!r}")
+        if self._free:
+            # 有空闲的 grant 时没有其他等待的 requester, 仍然经过 select 更新 policy 的状态
+            self.select(bit)
+            self._granted |= bit
+            self._free -= 1
+            self.grants[requester] += 1
+            return
+
+        self._pending |= bit
+        self._slots[requester] = greenlet.getcurrent()
+        scheduler = SimSession.scheduler
+        start = scheduler.sim_time.cycle
+        while not self._granted & bit:
+            # 不注册在任何 event 上, 获得 grant 时由 release 加入 grant event 的等待者
+            SimModule.wait(reason=self)
+        self.grant_wait_cycles[requester] += scheduler.sim_time.cycle - start
+
+    def release(self,requester:int):
+        bit = 1 << requester
+        if not self._granted & bit:
+            raise RuntimeError(f"requester {requester} does not hold a grant of {self!r}")
+
+        pending = self._pending
+        if not pending:
+            self._granted &= ~bit
+            self._free += 1
+            return
+
+        # 有等待的 requester 时直接将这个 grant 交给按照 policy 选出的 requester
+        winner = self.select(pending)
+        self._pending = pending & ~(1 << winner)
+        self._granted = self._granted & ~bit | 1 << winner
+        self.grants[winner] += 1
+
+        # 只唤醒获得 grant 的 requester, 在下一个 delta cycle 运行
+        slot, self._slots[winner] = self._slots[winner], None
+        grant_event = self._grant_event
+        grant_event.add_waiting_coroutine(slot)
+        grant_event.notify(self._grant_delay)
+
+    def holds(self,requester:int)->bool:
+        return bool(self._granted >> requester & 1)
+
+    def select(self,pending:int)->int:
+        if self.policy == 'fixed':
+            return (pending & -pending).bit_length() - 1
+
+        if self.policy == 'round_robin':
+            # 从 pointer 开始的第一个 requester, 没有时回到最低位
+            masked = pending >> self._pointer << self._pointer or pending
+            winner = (masked & -masked).bit_length() - 1
+            self._pointer = winner + 1
+            return winner
+
+        candidates = pending & self._eligible
+        if not candidates:
+            # 所有等待的 requester 都已经用完次数, 开始新的一轮
+            self._credits[:] = self.weights
+            self._eligible = (1 << self.num_requesters) - 1
+            candidates = pending
+        # 轮到的 requester 没有在等待时, 先 grant 给之后的 requester, 但是不改变 pointer, 仍然保留它的轮次
+        head = self._first_from_pointer(self._eligible)
+        winner = self._first_from_pointer(candidates)
+        self._credits[winner] -= 1
+        if self._credits[winner]:
+            if winner == head:
+                # 还有剩余次数, 下一次仍然从 winner 开始
+                self._pointer = winner
+            return winner
+        self._eligible &= ~(1 << winner)
+        if winner == head:
+            self._pointer = winner + 1
+        return winner
+
+    def _first_from_pointer(self,mask:int)->int:
+        # 从 pointer 开始的第一个 requester, 没有时回到最低位
+        masked = mask >> self._pointer << self._pointer or mask
+        return (masked & -masked).bit_length() - 1
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name}, granted={self._granted:#b}, pending={self._pending:#b})"
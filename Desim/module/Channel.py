@@ -0,0 +1,232 @@
+from collections import deque
+from typing import Optional, TypeVar, Generic, Iterable, Deque
+
+from Desim.Core import Event, SimModule, SimSession, SimTime
+from Desim.module.FIFO import DelayFIFO
+
+
+T = TypeVar('T')
+
+
+class CreditChannel(Generic[T]):
+    """
+    基于 credit 流控的单向 link
+    sender 每发送一个 flit 消耗一个 credit, receiver 读出 flit 之后 credit 经过 credit_latency 返回 sender
+    flit 从发出到可读需要 latency 个周期, link 每个周期最多发出 bandwidth 个 flit, 超出的 flit 顺延到之后的周期
+    数据使用 DelayFIFO 传递, 同一个 delta cycle 发出的 flit 共用一个 ready time, 同一周期到达的 flit 只需要唤醒一次
+    返回的 credit 只记录数量, 同一个 delta cycle 返回的 credit 合并为一项, 只有 sender 阻塞时才设置一次唤醒
+    bench_channel 中每个周期 16 个 flit 时, 逐个 send / receive 约 19 万 flit/s, 直接使用 DelayFIFO 和 SimDelaySemaphore 约 10 万 flit/s
+    """
+    def __init__(self,credits:int,latency:int=1,bandwidth:int=1,credit_latency:Optional[int]=None,
+                 name:Optional[str]=None):
+        """
+        :param credits: receiver 端 buffer 的大小, 即初始的 credit 数量
+        :param latency: flit 在 link 上的延迟
+        :param bandwidth: 每个周期最多发出的 flit 数量
+        :param credit_latency: credit 返回的延迟, 默认与 latency 相同
+        """
+        if credits <= 0 or bandwidth <= 0:
+            raise ValueError("credits and bandwidth must be positive")
+
+        self.name:str = name or f"CreditChannel@{id(self):#x}"
+        self.num_credits = credits
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.credit_latency = latency if credit_latency is None else credit_latency
+        self._credit_delay = SimTime(self.credit_latency)
+
+        # receiver 端的 buffer, 容量与 credit 数量相同, 因此写入不会阻塞
+        self.data_fifo:DelayFIFO[T] = DelayFIFO(credits,name=f"{self.name}.data")
+
+        # sender 端可用的 credit, 以及正在返回的 [ready time, 数量]
+        self._credits:int = credits
+        self._returning:Deque[list] = deque()
+        self._credit_event = Event()
+        self._credit_waiters:int = 0
+        # 最近一次返回 credit 的 delta cycle 以及对应的 ready time
+        self._return_now:Optional[SimTime] = None
+        self._return_ready:Optional[SimTime] = None
+
+        # 当前正在发出 flit 的周期, 以及该周期已经发出的 flit 数量
+        self._depart_cycle:int = 0
+        self._departed:int = 0
+        # 最近一次发出 flit 的 delta cycle, 以及这个 delta cycle 中发出的 flit 的 ready time
+        self._depart_now:Optional[SimTime] = None
+        self._depart_ready:Optional[SimTime] = None
+        self._depart_stalled:bool = False
+
+        # 统计信息
+        self.flits_sent:int = 0
+        self.flits_received:int = 0
+        self.credit_stalls:int = 0 # 因为没有 credit 而阻塞的次数
+        self.credit_stall_cycles:int = 0
+        self.bandwidth_stalls:int = 0 # 因为带宽不足而顺延的 flit 数量
+
+    def send(self,flit:T):
+        """
+        阻塞直到有 credit
+        """
+        if self._credits:
+            self._credits -= 1
+        else:
+            self._wait_credit()
+        self._depart_one(flit)
+
+    def send_n(self,flits:Iterable[T]):
+        """
+        依次发送多个 flit, 每次取得尽可能多的 credit, 同一周期发出的 flit 一起到达
+        """
+        flits = list(flits)
+        sent = 0
+        while sent < len(flits):
+            got = self._take_credits(len(flits) - sent)
+            if got == 0:
+                self._wait_credit()
+                got = 1 + self._take_credits(len(flits) - sent - 1)
+            self._depart(flits[sent:sent + got])
+            sent += got
+
+    def try_send(self,flit:T)->bool:
+        """
+        不阻塞, 没有 credit 时返回 False
+        """
+        if not self._credits and not self._release_credits():
+            return False
+        self._credits -= 1
+        self._depart_one(flit)
+        return True
+
+    def _release_credits(self)->int:
+        # 将已经返回的 credit 加入可用的 credit
+        returning = self._returning
+        if returning:
+            now = SimSession.scheduler.sim_time
+            while returning and returning[0][0] <= now:
+                self._credits += returning.popleft()[1]
+        return self._credits
+
+    def _take_credits(self,max_n:int)->int:
+        got = min(self._release_credits(),max_n)
+        self._credits -= got
+        return got
+
+    def _wait_credit(self):
+        # 阻塞直到取得一个 credit
+        if not self._release_credits():
+            self.credit_stalls += 1
+            start = SimSession.sim_time.cycle
+            self._credit_waiters += 1
+            while not self._release_credits():
+                if self._returning:
+                    SimSession.scheduler.notify_event(self._credit_event,self._returning[0][0])
+                SimModule.wait(self._credit_event,reason=self)
+            self._credit_waiters -= 1
+            self.credit_stall_cycles += SimSession.sim_time.cycle - start
+        self._credits -= 1
+
+    def _depart_one(self,flit:T):
+        # 与 _depart 相同的带宽分配, 只处理一个 flit, 同一个 delta cycle 中复用之前计算的 ready time
+        if SimSession.scheduler.sim_time != self._depart_now or self._departed == self.bandwidth:
+            self._next_depart()
+        if self._depart_stalled:
+            self.bandwidth_stalls += 1
+        self._departed += 1
+        self.flits_sent += 1
+        self.data_fifo.delay_write_at(flit,self._depart_ready)
+
+    def _next_depart(self):
+        # 进入新的 delta cycle 或者当前周期的带宽已经用完, 重新计算发出的周期和 ready time
+        now = SimSession.scheduler.sim_time
+        cycle = now.cycle
+        if self._depart_cycle < cycle:
+            self._depart_cycle = cycle
+            self._departed = 0
+        elif self._departed == self.bandwidth:
+            self._depart_cycle += 1
+            self._departed = 0
+        self._depart_now = now
+        self._depart_stalled = self._depart_cycle > cycle
+        self._depart_ready = now + SimTime(self._depart_cycle - cycle + self.latency)
+
+    def _depart(self,flits:Iterable[T]):
+        now = SimSession.sim_time.cycle
+        if self._depart_cycle < now:
+            self._depart_cycle = now
+            self._departed = 0
+        # 发出的周期可能改变, 之后的 _depart_one 重新计算 ready time
+        self._depart_now = None
+
+        # 按照带宽将 flit 分配到各个周期, 同一周期的 flit 使用同一个 ready time
+        batch = []
+        for flit in flits:
+            if self._departed == self.bandwidth:
+                self._write_batch(batch,now)
+                batch = []
+                self._depart_cycle += 1
+                self._departed = 0
+            if self._depart_cycle > now:
+                self.bandwidth_stalls += 1
+            batch.append(flit)
+            self._departed += 1
+        self._write_batch(batch,now)
+
+    def _write_batch(self,batch:list[T],now:int):
+        if batch:
+            self.flits_sent += len(batch)
+            self.data_fifo.delay_write_n(batch,SimTime(self._depart_cycle - now + self.latency))
+
+    def receive(self)->T:
+        """
+        阻塞直到有 flit 到达, 读出之后返回一个 credit
+        """
+        flit = self.data_fifo.read()
+        self._return_credits(1)
+        return flit
+
+    def receive_n(self,n:int)->list[T]:
+        flits = self.data_fifo.read_n(n)
+        self._return_credits(n)
+        return flits
+
+    def receive_available(self,max_n:Optional[int]=None)->list[T]:
+        """
+        不阻塞, 读出所有已经到达的 flit
+        """
+        flits = self.data_fifo.read_available(max_n)
+        self._return_credits(len(flits))
+        return flits
+
+    def _return_credits(self,n:int):
+        if not n:
+            return
+        self.flits_received += n
+        now = SimSession.scheduler.sim_time
+        if now != self._return_now:
+            self._return_now = now
+            self._return_ready = now + self._credit_delay
+            if self._return_ready <= now:
+                self._return_ready = SimTime(now.cycle,now.delta_cycle + 1)
+        returning = self._returning
+        if returning and returning[-1][0] == self._return_ready:
+            # 与同一个 delta cycle 中之前返回的 credit 合并
+            returning[-1][1] += n
+            return
+        returning.append([self._return_ready,n])
+        if self._credit_waiters and len(returning) == 1:
+            SimSession.scheduler.notify_event(self._credit_event,self._return_ready)
+
+    @property
+    def credits(self)->int:
+        # sender 当前可用的 credit
+        return self._release_credits()
+
+    def throughput(self,cycles:Optional[int]=None)->float:
+        """
+        :param cycles: 统计的周期数, 默认为当前的仿真时间
+        :return: 平均每个周期 receiver 读出的 flit 数量
+        """
+        cycles = SimSession.sim_time.cycle if cycles is None else cycles
+        return self.flits_received / cycles if cycles else 0.0
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name}, credits={self.credits}/{self.num_credits})"
@@ -1,53 +1,152 @@
-from typing import Optional, TypeVar, Generic, Deque
+from typing import Optional, TypeVar, Generic, Deque, Iterable
 from collections import deque
 
-from Desim.Core import Event, SimTime, SimModule
-from Desim.Sync import SimDelaySemaphore, SimSemaphore
+from Desim.Core import Event, SimSession, SimTime, SimModule
 
 
 T = TypeVar('T')
 
 
+class _FIFOWaitReason:
+    # 死锁报告中显示阻塞在 fifo 的哪一侧
+    __slots__ = ('fifo','side')
+
+    def __init__(self,fifo:'FIFO',side:str):
+        self.fifo = fifo
+        self.side = side
+
+    def __repr__(self):
+        return f"{self.fifo!r}.{self.side}"
+
+
 class FIFO(Generic[T]):
-    def __init__(self,fifo_size:int,init_size:int=0,init_data:Optional[list]=None):
+    """
+    使用计数器记录可读的数据和空闲的位置, 不经过 SimSemaphore
+    只有存在阻塞的 coroutine 时才会 notify, 没有等待者时读写不会产生额外的 delta cycle
+    阻塞的语义与 semaphore 实现相同: 被唤醒的 coroutine 在下一个 delta cycle 重新检查
+    """
+    def __init__(self,fifo_size:int,init_size:int=0,init_data:Optional[list]=None,name:Optional[str]=None):
         self.fifo_size = fifo_size
+        self.name:str = name or f"FIFO@{id(self):#x}"
 
         self.fifo_data:Deque[T] = deque(maxlen=fifo_size)
 
-        self.empty_semaphore = SimSemaphore(init_size)
-        self.full_semaphore = SimSemaphore(fifo_size - init_size)
+        # 可读的数据数量和空闲的位置数量, DelayFIFO 中数据在生效之前已经占用位置但不可读
+        self.readable_count:int = init_size
+        self.free_count:int = fifo_size - init_size
 
-        self.is_empty_event = Event()
-        self.is_full_event = Event()
+        # 阻塞在 read / write 上的 coroutine 数量以及对应的 event, event 在第一次阻塞时创建
+        self._read_waiters:int = 0
+        self._write_waiters:int = 0
+        self._not_empty_event:Optional[Event] = None
+        self._not_full_event:Optional[Event] = None
+        self._is_empty_event:Optional[Event] = None
+        self._is_full_event:Optional[Event] = None
 
         if init_size != 0 :
             assert init_size == len(init_data)
             for item in init_data:
                 self.fifo_data.append(item)
 
+    @property
+    def is_empty_event(self)->Event:
+        # 只有被使用过才会 notify
+        if self._is_empty_event is None:
+            self._is_empty_event = Event()
+        return self._is_empty_event
+
+    @property
+    def is_full_event(self)->Event:
+        if self._is_full_event is None:
+            self._is_full_event = Event()
+        return self._is_full_event
+
 
     def read(self)->T:
-        self.empty_semaphore.wait()
-        self.full_semaphore.post()
-        if self.empty_semaphore.get_value() == 0:
-            self.is_empty_event.notify(SimTime(1))
+        if self.readable_count <= 0:
+            self._wait_readable(1)
+        self.readable_count -= 1
+        self._add_free(1)
+        if self.readable_count == 0 and self._is_empty_event is not None:
+            self._is_empty_event.notify(SimTime(1))
 
         front_data = self.fifo_data.popleft()
         return front_data
 
 
     def write(self,data:T):
-        self.full_semaphore.wait()
-        self.empty_semaphore.post()
+        if self.free_count <= 0:
+            self._wait_free(1)
+        self.free_count -= 1
 
-        if self.full_semaphore.get_value() == 0:
-            self.is_full_event.notify(SimTime(1))
+        if self.free_count == 0 and self._is_full_event is not None:
+            self._is_full_event.notify(SimTime(1))
 
-        self.fifo_data.append(data)
+        self._push(data)
+
+    def read_n(self,n:int)->list[T]:
+        """
+        阻塞直到 FIFO 中有 n 个数据, 一次全部读出
+        """
+        if n > self.fifo_size:
+            raise ValueError(f"can not read {n} items from {self!r}")
+        if self.readable_count < n:
+            self._wait_readable(n)
+        self.readable_count -= n
+        return self._pop_n(n)
+
+    def read_available(self,max_n:Optional[int]=None)->list[T]:
+        """
+        不阻塞, 读出当前所有可读的数据 (最多 max_n 个), 没有数据时返回空的 list
+        """
+        n = self.readable_count
+        if max_n is not None:
+            n = min(n,max_n)
+        if n <= 0:
+            return []
+        self.readable_count -= n
+        return self._pop_n(n)
+
+    def _pop_n(self,n:int)->list[T]:
+        self._add_free(n)
+        if self.readable_count == 0 and self._is_empty_event is not None:
+            self._is_empty_event.notify(SimTime(1))
+
+        fifo_data = self.fifo_data
+        return [fifo_data.popleft() for _ in range(n)]
+
+    def write_n(self,items:Iterable[T]):
+        """
+        阻塞直到 FIFO 中有足够的空间, 一次全部写入
+        """
+        items = list(items)
+        n = len(items)
+        if n > self.fifo_size:
+            raise ValueError(f"can not write {n} items to {self!r}")
+        if n == 0:
+            return
+        if self.free_count < n:
+            self._wait_free(n)
+        self.free_count -= n
+
+        if self.free_count == 0 and self._is_full_event is not None:
+            self._is_full_event.notify(SimTime(1))
+
+        self._push_n(items)
+
+    def peek(self)->Optional[T]:
+        """
+        返回下一个可读的数据但不读出, 没有数据时返回 None
+        """
+        if self.readable_count <= 0:
+            return None
+        return self.fifo_data[0]
 
     def direct_read(self)->T:
-        if self.empty_semaphore.get_value() == 0:
+        if self.readable_count <= 0:
             return None
+        self.readable_count -= 1
+        self._add_free(1)
         data = self.fifo_data.popleft()
         return data
 
@@ -55,43 +154,183 @@ class FIFO(Generic[T]):
         """
         直接写入可能会失败, 因此返回bool 表示操作成功或失败
         """
-        if self.full_semaphore.get_value() == 0:
+        if self.free_count <= 0:
             return False
-        self.fifo_data.append(data)
+        self.free_count -= 1
+        self._push(data)
         return True
 
+    def _wait_readable(self,n:int):
+        if self._not_empty_event is None:
+            self._not_empty_event = Event()
+        self._read_waiters += 1
+        reason = _FIFOWaitReason(self,'empty')
+        while self.readable_count < n:
+            SimModule.wait(self._not_empty_event,reason=reason)
+        self._read_waiters -= 1
+
+    def _wait_free(self,n:int):
+        if self._not_full_event is None:
+            self._not_full_event = Event()
+        self._write_waiters += 1
+        reason = _FIFOWaitReason(self,'full')
+        while self.free_count < n:
+            SimModule.wait(self._not_full_event,reason=reason)
+        self._write_waiters -= 1
+
+    def _push(self,data:T):
+        self.fifo_data.append(data)
+        self._add_readable(1)
+
+    def _push_n(self,items:list[T]):
+        self.fifo_data.extend(items)
+        self._add_readable(len(items))
+
+    def _add_readable(self,n:int):
+        self.readable_count += n
+        if self._read_waiters:
+            self._not_empty_event.notify(SimTime(0))
+
+    def _add_free(self,n:int):
+        self.free_count += n
+        if self._write_waiters:
+            self._not_full_event.notify(SimTime(0))
+
 
     def wait_full(self):
-        if self.full_semaphore.get_value() != 0:
-            SimModule.wait(self.is_full_event)
+        if self.free_count != 0:
+            SimModule.wait(self.is_full_event,reason=self)
 
 
     def wait_empty(self):
-        if self.empty_semaphore.get_value() != 0:
-            SimModule.wait(self.is_empty_event)
+        if self.readable_count != 0:
+            SimModule.wait(self.is_empty_event,reason=self)
 
     def is_empty(self)->bool:
-        return self.empty_semaphore.get_value() == 0
+        return self.readable_count == 0
 
     def is_full(self)->bool:
-        return self.full_semaphore.get_value() == 0
+        return self.free_count == 0
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name}, {self.fifo_size - self.free_count}/{self.fifo_size})"
 
 
 
 class DelayFIFO(FIFO[T]):
-    # 支持延迟写入的功能 
-    def __init__(self,fifo_size:int,init_size:int=0):
-        super().__init__(fifo_size,init_size)
-        self.empty_semaphore = SimDelaySemaphore(init_size)
+    """
+    支持延迟写入的功能, 写入的数据在 ready time 之后才可读, 普通的 write 在下一个 delta cycle 可读
+    还没有 ready 的数据按照写入的顺序保存在 (ready_time, item) 的 deque 中, 已经占用 FIFO 的位置
+    数据在被访问时才移动到 fifo_data 中, 只有存在阻塞的 reader 时才为队首的 ready time 设置一次唤醒
+    与 FIFO 的顺序一致, 数据不会越过之前写入的, ready time 更晚的数据
+    """
+    def __init__(self,fifo_size:int,init_size:int=0,init_data:Optional[list]=None,name:Optional[str]=None):
+        self._in_flight:Deque[tuple[SimTime,T]] = deque()
+        self._readable_count:int = 0
+        super().__init__(fifo_size,init_size,init_data,name=name)
+
+    @property
+    def readable_count(self)->int:
+        in_flight = self._in_flight
+        if in_flight and in_flight[0][0] <= SimSession.sim_time:
+            self._release_ready()
+        return self._readable_count
+
+    @readable_count.setter
+    def readable_count(self,value:int):
+        self._readable_count = value
+
 
+    def delay_write(self,data:any,delay_time:SimTime):
+        if self.free_count <= 0:
+            self._wait_free(1)
+        self.free_count -= 1
 
+        if self.free_count == 0 and self._is_full_event is not None:
+            self._is_full_event.notify(SimTime(0))
 
+        self._in_flight.append((self._ready_time(delay_time),data))
 
-    def delay_write(self,data:any,delay_time:SimTime):
-        self.full_semaphore.wait()
-        self.empty_semaphore.post(delay_time)
+    def delay_write_at(self,data:any,ready_time:SimTime):
+        """
+        与 delay_write 相同, 但是直接给出 ready time, 同一周期写入多个数据时只需要计算一次 ready time
+        """
+        if self.free_count <= 0:
+            self._wait_free(1)
+        self.free_count -= 1
 
-        if self.full_semaphore.get_value() == 0:
-            self.is_full_event.notify(SimTime(0))
-        
-        self.fifo_data.append(data)
\ No newline at end of file
+        if self.free_count == 0 and self._is_full_event is not None:
+            self._is_full_event.notify(SimTime(0))
+
+        self._in_flight.append((self._clamp_ready_time(ready_time,SimSession.sim_time),data))
+
+    def delay_write_n(self,items:Iterable[T],delay_time:SimTime):
+        """
+        阻塞直到 FIFO 中有足够的空间, 所有的数据在同一个 ready time 之后可读
+        """
+        items = list(items)
+        n = len(items)
+        if n > self.fifo_size:
+            raise ValueError(f"can not write {n} items to {self!r}")
+        if n == 0:
+            return
+        if self.free_count < n:
+            self._wait_free(n)
+        self.free_count -= n
+
+        if self.free_count == 0 and self._is_full_event is not None:
+            self._is_full_event.notify(SimTime(0))
+
+        self._push_delayed(items,delay_time)
+
+    def _push(self,data:T):
+        self._in_flight.append((self._ready_time(SimTime(0)),data))
+
+    def _push_n(self,items:list[T]):
+        self._push_delayed(items,SimTime(0))
+
+    def _push_delayed(self,items:Iterable[T],delay_time:SimTime):
+        # 同一次写入的数据使用相同的 ready time
+        ready_time = self._ready_time(delay_time)
+        self._in_flight.extend([(ready_time,item) for item in items])
+
+    def _ready_time(self,delay_time:SimTime)->SimTime:
+        # 计算新写入数据的 ready time
+        now = SimSession.sim_time
+        return self._clamp_ready_time(now + delay_time,now)
+
+    def _clamp_ready_time(self,ready_time:SimTime,now:SimTime)->SimTime:
+        # 调整 ready time 的范围, 队列为空且有阻塞的 reader 时设置唤醒
+        if ready_time <= now:
+            # 与 Scheduler.queue_event 一致, 不晚于当前时间的数据在下一个 delta cycle 可读
+            ready_time = SimTime(now.cycle,now.delta_cycle + 1)
+        in_flight = self._in_flight
+        if in_flight:
+            # 不越过之前的数据
+            if ready_time < in_flight[-1][0]:
+                ready_time = in_flight[-1][0]
+        elif self._read_waiters:
+            self._schedule_wake(ready_time)
+        return ready_time
+
+    def _release_ready(self):
+        in_flight = self._in_flight
+        now = SimSession.sim_time
+        n = 0
+        while in_flight and in_flight[0][0] <= now:
+            self.fifo_data.append(in_flight.popleft()[1])
+            n += 1
+        self._readable_count += n
+        if in_flight and self._read_waiters:
+            self._schedule_wake(in_flight[0][0])
+
+    def _wait_readable(self,n:int):
+        if self._not_empty_event is None:
+            self._not_empty_event = Event()
+        if self._in_flight:
+            self._schedule_wake(self._in_flight[0][0])
+        super()._wait_readable(n)
+
+    def _schedule_wake(self,ready_time:SimTime):
+        # 只保留一次唤醒, 重新设置时覆盖之前的时间
+        SimSession.scheduler.notify_event(self._not_empty_event,ready_time)
@@ -16,7 +16,8 @@ class PipeStage(SimModule):
         self.start_semaphore = SimSemaphore(0)
         self.end_semaphore = SimSemaphore(0)
 
-        self.register_coroutine(self.process)
+        # process 一直循环等待 start, 空闲时处于阻塞状态是正常的
+        self.register_coroutine(self.process,daemon=True)
 
         self.input_fifo_map:Optional[dict[str,FIFO]] = {}
         self.output_fifo_map:Optional[dict[str,FIFO]] = {}
@@ -78,10 +79,13 @@ class PipeGraph:
         self.sink_stages_name:set[str] = set() # 特殊的 stage 用于作为结束的stage
 
     def add_stages_by_dict(self,stages_dict:dict[str,PipeStage]):
-        self.stages_dict.update(stages_dict)
+        for name,stage in stages_dict.items():
+            self.add_stage(stage,name)
 
     def add_stage(self,stage:PipeStage,name:str):
         self.stages_dict[name] = stage
+        stage.start_semaphore.name = f"{name}.start"
+        stage.end_semaphore.name = f"{name}.end"
 
     def add_edges_by_list(self,edges_list:list[tuple[str,str,int,int]]):
         # 一次性插入所有的 边 
@@ -99,7 +103,7 @@ class PipeGraph:
         self.connection_prev_dict[to_stage_name].append(from_stage_name)
 
         # 构建fifo
-        fifo = FIFO(fifo_size,init_size)
+        fifo = FIFO(fifo_size,init_size,name=fifo_name)
         self.edges_dict[(from_stage_name,to_stage_name)]=(fifo_name,fifo)
 
     def add_edge_with_fifo(self,from_stage_name:str,to_stage_name:str,fifo_name:str,fifo:FIFO):
@@ -0,0 +1,57 @@
+import time
+
+from Desim.Core import SimSession, SimModule, SimTime
+from Desim.Sync import SimOrderedSemaphore
+from Desim.module.Arbiter import Arbiter
+
+
+class Contenders(SimModule):
+    # num_requesters 个 requester 竞争同一个资源, 每次持有 1 个 cycle
+    def __init__(self, num_requesters:int, times:int, mode:str):
+        super().__init__()
+        self.times = times
+        self.count = 0
+        if mode == 'semaphore':
+            self.semaphore = SimOrderedSemaphore(1)
+        else:
+            self.arbiter = Arbiter(num_requesters, mode)
+
+        for requester in range(num_requesters):
+            if mode == 'semaphore':
+                self.register_coroutine(self.semaphore_process)
+            else:
+                self.register_coroutine(lambda requester=requester: self.arbiter_process(requester))
+
+    def semaphore_process(self):
+        for _ in range(self.times):
+            self.semaphore.wait()
+            self.count += 1
+            SimModule.wait_time(SimTime(1))
+            self.semaphore.post()
+
+    def arbiter_process(self, requester:int):
+        for _ in range(self.times):
+            self.arbiter.request(requester)
+            self.count += 1
+            SimModule.wait_time(SimTime(1))
+            self.arbiter.release(requester)
+
+
+def bench_arbiter(mode:str, num_requesters:int, times:int)->tuple[float,SimTime]:
+    SimSession.reset()
+    SimSession.init()
+    contenders = Contenders(num_requesters, times, mode)
+
+    start = time.perf_counter()
+    SimSession.scheduler.run()
+    elapsed = time.perf_counter() - start
+
+    assert contenders.count == num_requesters * times
+    return contenders.count / elapsed, SimSession.sim_time
+
+
+if __name__ == '__main__':
+    for num_requesters in [4, 64]:
+        for mode in ['semaphore', 'round_robin', 'fixed']:
+            rate, finish_time = bench_arbiter(mode, num_requesters, 200_000 // num_requesters)
+            print(f"requesters={num_requesters:>3} {mode:>11}: {rate:12.0f} grants/s, finish at {finish_time}")
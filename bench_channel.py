@@ -0,0 +1,92 @@
+import time
+
+from Desim.Core import SimSession, SimModule, SimTime
+from Desim.Sync import SimDelaySemaphore
+from Desim.module.FIFO import DelayFIFO
+from Desim.module.Channel import CreditChannel
+
+
+class ManualLink(SimModule):
+    # 手动组合 DelayFIFO 和 SimDelaySemaphore 实现的 credit link, 每个周期发送 flits_per_cycle 个 flit
+    def __init__(self, num_flits:int, flits_per_cycle:int, credits:int, latency:int):
+        super().__init__()
+        self.num_flits = num_flits
+        self.flits_per_cycle = flits_per_cycle
+        self.latency = latency
+        self.data_fifo = DelayFIFO(credits)
+        self.credit_semaphore = SimDelaySemaphore(credits)
+        self.checksum = 0
+
+        self.register_coroutine(self.sender)
+        self.register_coroutine(self.receiver)
+
+    def sender(self):
+        for flit in range(self.num_flits):
+            self.credit_semaphore.wait()
+            self.data_fifo.delay_write(flit, SimTime(self.latency))
+            if flit % self.flits_per_cycle == self.flits_per_cycle - 1:
+                SimModule.wait_time(SimTime(1))
+
+    def receiver(self):
+        for _ in range(self.num_flits):
+            self.checksum += self.data_fifo.read()
+            self.credit_semaphore.post(SimTime(self.latency))
+
+
+class ChannelLink(SimModule):
+    def __init__(self, num_flits:int, flits_per_cycle:int, credits:int, latency:int, batch:bool):
+        super().__init__()
+        self.num_flits = num_flits
+        self.flits_per_cycle = flits_per_cycle
+        self.batch = batch
+        self.channel = CreditChannel(credits, latency, flits_per_cycle)
+        self.checksum = 0
+
+        self.register_coroutine(self.sender)
+        self.register_coroutine(self.receiver)
+
+    def sender(self):
+        for start in range(0, self.num_flits, self.flits_per_cycle):
+            flits = range(start, min(start + self.flits_per_cycle, self.num_flits))
+            if self.batch:
+                self.channel.send_n(flits)
+            else:
+                for flit in flits:
+                    self.channel.send(flit)
+            SimModule.wait_time(SimTime(1))
+
+    def receiver(self):
+        received = 0
+        while received < self.num_flits:
+            if self.batch:
+                flits = self.channel.receive_available()
+                if not flits:
+                    flits = [self.channel.receive()]
+            else:
+                flits = [self.channel.receive()]
+            self.checksum += sum(flits)
+            received += len(flits)
+
+
+def bench_channel(mode:str, num_flits:int, flits_per_cycle:int)->tuple[float,SimTime]:
+    SimSession.reset()
+    SimSession.init()
+    credits, latency = 4 * flits_per_cycle, 3
+    if mode == 'manual':
+        link = ManualLink(num_flits, flits_per_cycle, credits, latency)
+    else:
+        link = ChannelLink(num_flits, flits_per_cycle, credits, latency, mode == 'batch')
+
+    start = time.perf_counter()
+    SimSession.scheduler.run()
+    elapsed = time.perf_counter() - start
+
+    assert link.checksum == num_flits * (num_flits - 1) // 2
+    return num_flits / elapsed, SimSession.sim_time
+
+
+if __name__ == '__main__':
+    for flits_per_cycle in [1, 16]:
+        for mode in ['manual', 'channel', 'batch']:
+            rate, finish_time = bench_channel(mode, 100_000, flits_per_cycle)
+            print(f"flits/cycle={flits_per_cycle:>3} {mode:>7}: {rate:12.0f} flits/s, finish at {finish_time}")
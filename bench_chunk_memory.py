@@ -0,0 +1,109 @@
+import time
+
+from Desim.Core import SimSession, SimModule, Event, SimTime
+from Desim.memory.Memory import ChunkMemory, ChunkMemoryPort, ChunkMemoryRequest, ChunkPacket
+
+
+class Requester(SimModule):
+    # 一次性提交大量的 request, 每个地址上依次为 read(等待写入) / write / read(clear) / write
+    # 所有 request 同时处于 outstanding 状态, 依赖关系通过 tag 保证
+    def __init__(self, memory:ChunkMemory, num_reqs:int):
+        super().__init__()
+        self.memory = memory
+        self.num_reqs = num_reqs
+        self.finish_event = Event()
+        self.reqs:list[ChunkMemoryRequest] = []
+
+        self.register_coroutine(self.process)
+
+    def make_req(self, command:str, addr:int, **kwargs)->ChunkMemoryRequest:
+        return ChunkMemoryRequest(
+            port=None,
+            command=command,
+            addr=addr,
+            read_finish_event=self.finish_event,
+            write_finish_event=self.finish_event,
+            data=ChunkPacket(payload=addr, num_elements=16, batch_size=1, element_bytes=1),
+            **kwargs
+        )
+
+    def process(self):
+        num_addrs = self.num_reqs // 4
+        for addr in range(num_addrs):
+            self.reqs.append(self.make_req('read', addr, expect_tag=1))
+        for addr in range(num_addrs):
+            self.reqs.append(self.make_req('write', addr))
+        for addr in range(num_addrs):
+            self.reqs.append(self.make_req('read', addr, expect_tag=1, clear=True))
+        for addr in range(num_addrs):
+            self.reqs.append(self.make_req('write', addr))
+
+        for req in self.reqs:
+            if req.command == 'read':
+                self.memory.handle_read_request(req)
+            else:
+                self.memory.handle_write_request(req)
+
+
+def bench_chunk_memory(num_reqs:int)->tuple[float,SimTime]:
+    SimSession.reset()
+    SimSession.init()
+    memory = ChunkMemory()
+    requester = Requester(memory, num_reqs)
+
+    start = time.perf_counter()
+    SimSession.scheduler.run()
+    elapsed = time.perf_counter() - start
+
+    assert all(req.status == 'finished' for req in requester.reqs)
+    return num_reqs / elapsed, SimSession.sim_time
+
+
+class Streamer(SimModule):
+    # 顺序写入再读出一段连续的地址, 每次 batch 个地址
+    def __init__(self, memory:ChunkMemory, num_addrs:int, batch:int):
+        super().__init__()
+        self.port = ChunkMemoryPort(memory)
+        self.num_addrs = num_addrs
+        self.batch = batch
+        self.checksum = 0
+
+        self.register_coroutine(self.process)
+
+    def process(self):
+        for start in range(0, self.num_addrs, self.batch):
+            addrs = range(start, min(start + self.batch, self.num_addrs))
+            if self.batch == 1:
+                self.port.write(start, start, num_elements=16, num_batch_size=1)
+            else:
+                self.port.write_many(addrs, addrs, num_elements=16, num_batch_size=1)
+        for start in range(0, self.num_addrs, self.batch):
+            addrs = range(start, min(start + self.batch, self.num_addrs))
+            if self.batch == 1:
+                self.checksum += self.port.read(start, tag_value=1, num_elements=16, num_batch_size=1)
+            else:
+                self.checksum += sum(self.port.read_many(addrs, tag_value=1, num_elements=16, num_batch_size=1))
+
+
+def bench_streaming(num_addrs:int, batch:int, coalesce:bool)->tuple[float,SimTime]:
+    SimSession.reset()
+    SimSession.init()
+    memory = ChunkMemory(coalesce=coalesce)
+    streamer = Streamer(memory, num_addrs, batch)
+
+    start = time.perf_counter()
+    SimSession.scheduler.run()
+    elapsed = time.perf_counter() - start
+
+    assert streamer.checksum == num_addrs * (num_addrs - 1) // 2
+    return 2 * num_addrs / elapsed, SimSession.sim_time
+
+
+if __name__ == '__main__':
+    for num_reqs in [1_000, 10_000]:
+        rate, finish_time = bench_chunk_memory(num_reqs)
+        print(f"outstanding={num_reqs:>6}: {rate:12.0f} reqs/s, finish at {finish_time}")
+
+    for batch, coalesce in [(1, False), (16, False), (16, True)]:
+        rate, finish_time = bench_streaming(20_000, batch, coalesce)
+        print(f"batch={batch:>2} coalesce={coalesce!s:>5}: {rate:12.0f} reqs/s, finish at {finish_time}")
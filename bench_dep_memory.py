@@ -0,0 +1,53 @@
+import time
+
+from Desim.Core import SimSession, SimModule, SimTime
+from Desim.memory.Memory import DepMemory, DepMemoryPort
+
+
+class ProducerConsumer(SimModule):
+    # 与 test_memory.py 相同的读写模式: producer 顺序写入, consumer 逆序读取并等待 tag
+    # consumer 一开始就发出所有的 read, producer 每个周期写入 batch 个地址
+    def __init__(self, memory:DepMemory, num_addrs:int, batch:int):
+        super().__init__()
+        self.num_addrs = num_addrs
+        self.batch = batch
+
+        self.producer_port = DepMemoryPort()
+        self.consumer_port = DepMemoryPort()
+        self.producer_port.config_dep_memory(memory)
+        self.consumer_port.config_dep_memory(memory)
+        self.checksum = 0
+
+        self.register_coroutine(self.producer)
+        self.register_coroutine(self.consumer)
+
+    def producer(self):
+        for start in range(0, self.num_addrs, self.batch):
+            for addr in range(start, min(start + self.batch, self.num_addrs)):
+                self.producer_port.issue_write(addr, addr)
+            SimModule.wait_time(SimTime(1))
+
+    def consumer(self):
+        handles = [self.consumer_port.issue_read(addr, tag_value=1, clear=True)
+                   for addr in reversed(range(self.num_addrs))]
+        for handle in handles:
+            self.checksum += self.consumer_port.wait(handle)
+
+
+def bench_dep_memory(num_addrs:int, batch:int)->float:
+    SimSession.reset()
+    SimSession.init()
+    module = ProducerConsumer(DepMemory(), num_addrs, batch)
+
+    start = time.perf_counter()
+    SimSession.scheduler.run()
+    elapsed = time.perf_counter() - start
+
+    assert module.checksum == num_addrs * (num_addrs - 1) // 2
+    return 2 * num_addrs / elapsed
+
+
+if __name__ == '__main__':
+    for num_addrs in [10_000, 100_000, 1_000_000]:
+        rate = bench_dep_memory(num_addrs, 1000)
+        print(f"addrs={num_addrs:>8}: {rate:12.0f} reqs/s")
@@ -0,0 +1,84 @@
+import random
+import time
+
+from Desim.Core import SimSession, SimModule, Event, SimTime, Scheduler
+from Desim.Sync import SimSemaphore
+
+
+class NotifyModule(SimModule):
+    # 在少数几个未来周期上 notify 大量的 event, 并对其中一部分重新 notify
+    def __init__(self, num_events:int, num_cycles:int, renotify_ratio:float):
+        super().__init__()
+
+        self.events = [Event() for _ in range(num_events)]
+        self.num_cycles = num_cycles
+        self.renotify_ratio = renotify_ratio
+
+        self.register_coroutine(self.process)
+
+    def process(self):
+        rng = random.Random(0)
+        for event in self.events:
+            event.notify(SimTime(rng.randint(1, self.num_cycles)))
+        for event in self.events:
+            if rng.random() < self.renotify_ratio:
+                event.notify(SimTime(rng.randint(1, self.num_cycles)))
+
+
+def bench_scheduler(backend:str, num_events:int, num_cycles:int, renotify_ratio:float=0.5)->float:
+    SimSession.reset()
+    SimSession.init(event_queue=backend)
+    NotifyModule(num_events, num_cycles, renotify_ratio)
+
+    start = time.perf_counter()
+    SimSession.scheduler.run()
+    elapsed = time.perf_counter() - start
+
+    # 每个 event 至少 notify 一次, 再加上重新 notify 的次数
+    return num_events * (1 + renotify_ratio) / elapsed
+
+
+class SemaphoreModule(SimModule):
+    # SimSemaphore.post 每次都会重新 notify 同一个 event
+    def __init__(self, num_posts:int):
+        super().__init__()
+        self.semaphore = SimSemaphore(0)
+        self.num_posts = num_posts
+
+        self.register_coroutine(self.producer)
+        self.register_coroutine(self.consumer)
+
+    def producer(self):
+        for i in range(self.num_posts):
+            self.semaphore.post()
+            SimModule.wait_time(SimTime(1))
+
+    def consumer(self):
+        for i in range(self.num_posts):
+            self.semaphore.wait()
+
+
+def bench_renotify(backend:str, num_posts:int)->float:
+    SimSession.reset()
+    SimSession.init(event_queue=backend)
+    SemaphoreModule(num_posts)
+
+    start = time.perf_counter()
+    SimSession.scheduler.run()
+    elapsed = time.perf_counter() - start
+
+    return num_posts / elapsed
+
+
+if __name__ == '__main__':
+    for num_events in [10_000, 100_000, 300_000]:
+        for num_cycles in [4, 64]:
+            print(f"events={num_events} cycles={num_cycles}")
+            for backend in Scheduler.event_queue_backends:
+                rate = bench_scheduler(backend, num_events, num_cycles)
+                print(f"    {backend:>10}: {rate:12.0f} events/s")
+
+    print("semaphore post/wait")
+    for backend in Scheduler.event_queue_backends:
+        rate = bench_renotify(backend, 100_000)
+        print(f"    {backend:>10}: {rate:12.0f} posts/s")
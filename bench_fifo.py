@@ -0,0 +1,85 @@
+import time
+from typing import Optional
+
+from Desim.Core import SimSession, SimModule, SimTime
+from Desim.module.FIFO import FIFO
+from Desim.module.Pipeline import PipeGraph, PipeStage
+
+
+class StreamPipe(SimModule):
+    # producer -> consumer 的两级 pipeline, 每个 cycle producer 写入 tokens_per_cycle 个 token
+    # element 模式下 handler 每次读写一个 token, batch 模式下使用 write_n / read_n
+    def __init__(self, num_tokens:int, tokens_per_cycle:int, batch:bool):
+        super().__init__()
+        self.num_tokens = num_tokens
+        self.tokens_per_cycle = tokens_per_cycle
+        self.checksum = 0
+
+        if batch:
+            handlers = [self.batch_producer, self.batch_consumer]
+        else:
+            handlers = [self.element_producer, self.element_consumer]
+        self.pipe_graph = PipeGraph()
+        self.pipe_graph.add_stage(PipeStage(handlers[0], 1), 'producer')
+        self.pipe_graph.add_stage(PipeStage(handlers[1], 1), 'consumer')
+        # fifo 可以容纳一个 cycle 的 token
+        self.pipe_graph.add_edge('producer', 'consumer', 'stream', tokens_per_cycle)
+        self.pipe_graph.build_graph()
+        self.pipe_graph.config_sink_stage_names(['consumer'])
+
+        self.register_coroutine(self.process)
+
+    def process(self):
+        self.pipe_graph.start_pipe_graph()
+        self.pipe_graph.wait_pipe_graph_finish()
+
+    def element_producer(self, input_fifo_map:Optional[dict[str,FIFO]], output_fifo_map:Optional[dict[str,FIFO]])->bool:
+        fifo = output_fifo_map['stream']
+        for start in range(0, self.num_tokens, self.tokens_per_cycle):
+            for token in range(start, min(start + self.tokens_per_cycle, self.num_tokens)):
+                fifo.write(token)
+            SimModule.wait_time(SimTime(1))
+        return False
+
+    def element_consumer(self, input_fifo_map:Optional[dict[str,FIFO]], output_fifo_map:Optional[dict[str,FIFO]])->bool:
+        fifo = input_fifo_map['stream']
+        for _ in range(self.num_tokens):
+            self.checksum += fifo.read()
+        return False
+
+    def batch_producer(self, input_fifo_map:Optional[dict[str,FIFO]], output_fifo_map:Optional[dict[str,FIFO]])->bool:
+        fifo = output_fifo_map['stream']
+        for start in range(0, self.num_tokens, self.tokens_per_cycle):
+            fifo.write_n(range(start, min(start + self.tokens_per_cycle, self.num_tokens)))
+            SimModule.wait_time(SimTime(1))
+        return False
+
+    def batch_consumer(self, input_fifo_map:Optional[dict[str,FIFO]], output_fifo_map:Optional[dict[str,FIFO]])->bool:
+        fifo = input_fifo_map['stream']
+        remaining = self.num_tokens
+        while remaining:
+            tokens = fifo.read_n(min(self.tokens_per_cycle, remaining))
+            self.checksum += sum(tokens)
+            remaining -= len(tokens)
+        return False
+
+
+def bench_fifo(num_tokens:int, tokens_per_cycle:int, batch:bool)->tuple[float,SimTime]:
+    SimSession.reset()
+    SimSession.init()
+    pipe = StreamPipe(num_tokens, tokens_per_cycle, batch)
+
+    start = time.perf_counter()
+    SimSession.scheduler.run()
+    elapsed = time.perf_counter() - start
+
+    assert pipe.checksum == num_tokens * (num_tokens - 1) // 2
+    return num_tokens / elapsed, SimSession.sim_time
+
+
+if __name__ == '__main__':
+    for tokens_per_cycle in [16, 1024]:
+        for batch in [False, True]:
+            rate, finish_time = bench_fifo(200_000, tokens_per_cycle, batch)
+            mode = 'batch' if batch else 'element'
+            print(f"tokens/cycle={tokens_per_cycle:>5} {mode:>7}: {rate:12.0f} tokens/s, finish at {finish_time}")
@@ -0,0 +1,40 @@
+import time
+
+from Desim.Utils import UniqueDeque, UniquePriorityQueue, invariant_checker
+
+
+def bench_container(size:int, rounds:int=500)->tuple[float,float]:
+    """
+    容器中保持 size 个元素, 之后进行 rounds 次 插入/删除 操作
+    :return: (UniquePriorityQueue, UniqueDeque) 每次操作的平均耗时 us
+    """
+    pq:UniquePriorityQueue[int] = UniquePriorityQueue()
+    dq:UniqueDeque[int] = UniqueDeque()
+    for i in range(size):
+        pq.add(i)
+        dq.append(i)
+
+    start = time.perf_counter()
+    for i in range(size, size + rounds):
+        pq.add(i)
+        pq.pop()
+    pq_time = (time.perf_counter() - start) / rounds * 1e6
+
+    start = time.perf_counter()
+    for i in range(size, size + rounds):
+        dq.append(i)
+        dq.pop()
+    dq_time = (time.perf_counter() - start) / rounds * 1e6
+
+    return pq_time, dq_time
+
+
+if __name__ == '__main__':
+    # 'always' 下每次操作的耗时随容器大小线性增长, 'never' 和 'sampled' 基本不变
+    for level in ['never', 'sampled', 'always']:
+        invariant_checker.configure(level, 1024)
+        print(f"check_level={level}")
+        for size in [1_000, 4_000, 16_000]:
+            pq_time, dq_time = bench_container(size)
+            print(f"    size={size:>6}: UniquePriorityQueue {pq_time:8.2f} us/op, UniqueDeque {dq_time:8.2f} us/op")
+    invariant_checker.configure('never')
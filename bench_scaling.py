@@ -0,0 +1,83 @@
+import gc
+import sys
+import time
+import tracemalloc
+
+from Desim.Core import SimSession, SimModule, Event, SimTime
+
+
+class PE(SimModule):
+    # 一个最简单的处理单元, 每次 start 触发后进行一次计数, coroutine 作为 daemon 一直挂起等待
+    def __init__(self, start:Event, mode:str):
+        super().__init__()
+        self.start = start
+        self.done = Event()
+        self.count = 0
+
+        if mode == 'coroutine':
+            self.register_coroutine(self.process, daemon=True)
+        elif mode == 'method':
+            self.register_method(self.on_start, self.start, dont_initialize=True)
+
+    def process(self):
+        while True:
+            SimModule.wait(self.start)
+            self.count += 1
+            self.done.notify(SimTime(1))
+
+    def on_start(self):
+        self.count += 1
+        self.done.notify(SimTime(1))
+
+
+class Starter(SimModule):
+    def __init__(self, start:Event):
+        super().__init__()
+        self.start = start
+        self.register_coroutine(self.process)
+
+    def process(self):
+        SimModule.wait_time(SimTime(1))
+        self.start.notify(SimTime(1))
+
+
+def bench_scaling(mode:str, num_modules:int)->tuple[float,float,float]:
+    """
+    :return: (每个模块的内存 bytes, 构建时间 s, 运行时间 s)
+    模块的内存包括 SimModule 本身, 一个 Event, 以及挂起后的 coroutine 或者 method
+    """
+    SimSession.reset()
+    SimSession.init(track_modules=False)
+    gc.collect()
+
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    start = Event()
+    modules = [PE(start, mode) for _ in range(num_modules)]
+    Starter(start)
+    build_time = time.perf_counter() - start_time
+
+    # 先运行到所有 coroutine 都挂起, 之后再统计内存
+    start_time = time.perf_counter()
+    SimSession.scheduler.run()
+    run_time = time.perf_counter() - start_time
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert mode == 'none' or all(module.count == 1 for module in modules)
+    return current / num_modules, build_time, run_time
+
+
+if __name__ == '__main__':
+    # python bench_scaling.py [max_modules]
+    max_modules = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    sizes = [size for size in [10_000, 100_000, 1_000_000] if size <= max_modules]
+    for mode in ['none', 'method', 'coroutine']:
+        print(f"mode={mode}")
+        for num_modules in sizes:
+            if mode == 'coroutine' and num_modules > 100_000:
+                # 挂起的 greenlet 会保存栈, 1M 个 coroutine 需要数 GB 的内存
+                continue
+            per_module, build_time, run_time = bench_scaling(mode, num_modules)
+            print(f"    modules={num_modules:>8}: {per_module:8.0f} bytes/module, "
+                  f"build {build_time:6.2f} s, run {run_time:6.2f} s")
@@ -0,0 +1,48 @@
+import time
+
+from Desim.Core import SimSession, SimModule, Event, SimTime
+
+
+class DelayModule(SimModule):
+    # 类似 test_rtl_model.py 中的 Send/Compute/Receive, 在循环中不断进行纯延迟的等待
+    def __init__(self, mode:str, iterations:int):
+        super().__init__()
+        self.mode = mode
+        self.iterations = iterations
+
+        self.register_coroutine(self.process)
+
+    def process(self):
+        if self.mode == 'event':
+            # 原来 wait_time 的实现, 每次都创建一个新的 Event
+            for i in range(self.iterations):
+                event = Event()
+                event.notify(SimTime(2))
+                SimModule.wait(event)
+        elif self.mode == 'wait_time':
+            for i in range(self.iterations):
+                SimModule.wait_time(SimTime(2))
+        elif self.mode == 'wait_cycles':
+            for i in range(self.iterations):
+                SimModule.wait_cycles(2)
+
+
+def bench_wait(mode:str, num_modules:int, iterations:int)->float:
+    SimSession.reset()
+    SimSession.init()
+    for i in range(num_modules):
+        DelayModule(mode, iterations)
+
+    start = time.perf_counter()
+    SimSession.scheduler.run()
+    elapsed = time.perf_counter() - start
+
+    return num_modules * iterations / elapsed
+
+
+if __name__ == '__main__':
+    for num_modules in [1, 100, 1000]:
+        print(f"modules={num_modules}")
+        for mode in ['event', 'wait_time', 'wait_cycles']:
+            rate = bench_wait(mode, num_modules, 100_000 // num_modules)
+            print(f"    {mode:>12}: {rate:12.0f} waits/s")
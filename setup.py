@@ -5,10 +5,14 @@ setup(
     name='Desim',
     version='0.1',
     packages=find_packages(),
+    python_requires='>=3.10',
     install_requires=[
         'greenlet',
         'sortedcontainers'
     ],
+    extras_require={
+        'numpy': ['numpy'],
+    },
     author='xyfuture',
     author_email='xyfuture01@gmail.com',
     description='Discrete event simulation for circuit in Python, similar to SystemC',
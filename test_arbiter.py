@@ -0,0 +1,94 @@
+import pytest
+
+from Desim.Core import SimSession, SimModule, SimTime
+from Desim.module.Arbiter import Arbiter
+
+
+class Contender(SimModule):
+    # 每个 requester 重复 times 次: 请求, 持有 hold 个 cycle, 释放
+    def __init__(self,arbiter:Arbiter,times:int,hold:int=1):
+        super().__init__()
+        self.arbiter = arbiter
+        self.times = times
+        self.hold = hold
+        self.trace = []
+
+        for requester in range(arbiter.num_requesters):
+            self.register_coroutine(lambda requester=requester: self.process(requester))
+
+    def process(self,requester:int):
+        for _ in range(self.times):
+            self.arbiter.request(requester)
+            self.trace.append((SimSession.sim_time.cycle,requester))
+            SimModule.wait_time(SimTime(self.hold))
+            self.arbiter.release(requester)
+
+
+def run_arbiter(times:int,**kwargs)->Contender:
+    SimSession.reset()
+    SimSession.init()
+    contender = Contender(Arbiter(**kwargs),times)
+    SimSession.scheduler.run()
+    return contender
+
+
+def test_policies():
+    # 第一个运行的 requester 直接获得空闲的 grant, 之后在每次 release 时选择
+    contender = run_arbiter(2,num_requesters=3)
+    assert [requester for _,requester in contender.trace] == [2,0,1] * 2
+    # 每个 cycle 一次 grant, 获得 grant 的 requester 在下一个 delta cycle 运行
+    assert [cycle for cycle,_ in contender.trace] == list(range(6))
+    assert contender.arbiter.grants == [2,2,2]
+
+    # release 的 requester 不在等待中, 编号小的 requester 优先
+    contender = run_arbiter(2,num_requesters=3,policy='fixed')
+    assert [requester for _,requester in contender.trace] == [2,0,1,0,1,2]
+    assert contender.arbiter.grant_wait_cycles == [2,3,4]
+
+    # 持续竞争时获得 grant 的比例接近 weights, 每个 requester 最多获得一半
+    contender = run_arbiter(100,num_requesters=3,policy='weighted',weights=[3,1,1])
+    assert [requester for _,requester in contender.trace[:10]] == [2,0,1,0,1,0,2,0,1,0]
+    shares = [sum(1 for cycle,r in contender.trace if cycle < 200 and r == requester) for requester in range(3)]
+    assert shares == [100,50,50]
+
+
+class Queued(SimModule):
+    # requester 0 持有 grant 时其他 requester 按照编号从大到小依次请求
+    def __init__(self,arbiter:Arbiter):
+        super().__init__()
+        self.arbiter = arbiter
+        self.trace = []
+        for requester in range(arbiter.num_requesters):
+            self.register_coroutine(lambda requester=requester: self.process(requester))
+
+    def process(self,requester:int):
+        if requester:
+            SimModule.wait_cycles(self.arbiter.num_requesters - requester)
+        start = SimSession.sim_time
+        self.arbiter.request(requester)
+        self.trace.append((requester,SimSession.sim_time.cycle,SimSession.sim_time == start))
+        SimModule.wait_cycles(5)
+        self.arbiter.release(requester)
+
+
+def test_grant_order():
+    for policy,order in [('fixed',[0,1,2,3]),('round_robin',[0,1,2,3])]:
+        SimSession.reset()
+        SimSession.init()
+        queued = Queued(Arbiter(4,policy))
+        SimSession.scheduler.run()
+
+        assert [requester for requester,_,_ in queued.trace] == order
+        # 空闲的 grant 在 request 的 delta cycle 中直接获得
+        assert queued.trace[0] == (0,0,True)
+        assert [cycle for _,cycle,_ in queued.trace] == [0,5,10,15]
+        assert 'wait_cycles' not in vars(queued.arbiter)
+
+
+def test_multiple_grants():
+    contender = run_arbiter(2,num_requesters=4,num_grants=2)
+    assert sorted(contender.trace) == [(0,2),(0,3),(1,0),(1,1),(2,2),(2,3),(3,0),(3,1)]
+    assert contender.arbiter.grants == [2,2,2,2]
+
+    with pytest.raises(ValueError):
+        Arbiter(2,policy='weighted')
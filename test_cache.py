@@ -0,0 +1,129 @@
+from Desim.Core import SimSession, SimModule, SimTime
+from Desim.memory.Memory import ChunkMemory, ChunkMemoryPort
+from Desim.memory.Cache import Cache
+
+
+class CacheUser(SimModule):
+    def __init__(self,cache:Cache,script):
+        super().__init__()
+        self.port = ChunkMemoryPort(cache)
+        self.script = script
+        self.trace = []
+
+        self.register_coroutine(self.process)
+
+    def process(self):
+        self.script(self)
+
+
+def run_cache(script,num_chunks:int=64,**kwargs)->tuple[Cache,ChunkMemory,CacheUser]:
+    SimSession.reset()
+    SimSession.init()
+    memory = ChunkMemory()
+    for addr in range(num_chunks):
+        memory.direct_write(addr,addr)
+    cache = Cache(memory,**kwargs)
+    user = CacheUser(cache,script)
+    SimSession.scheduler.run()
+    return cache, memory, user
+
+
+def read_and_record(user:CacheUser,addr:int):
+    value = user.port.read(addr,num_elements=16,num_batch_size=1)
+    user.trace.append((addr,value,SimSession.sim_time.cycle))
+
+
+def test_hit_miss_and_merge():
+    def script(user:CacheUser):
+        # 同一 line 上的两个 miss 合并到一个 MSHR 中
+        handles = [user.port.issue_read(addr,num_elements=16,num_batch_size=1) for addr in (4,5)]
+        user.trace.append([user.port.wait(handle) for handle in handles])
+        read_and_record(user,4)
+        read_and_record(user,5)
+
+    cache, memory, user = run_cache(script,num_sets=4,num_ways=2,line_size=2)
+    assert user.trace[0] == [4,5]
+    # 命中只需要 hit_latency
+    assert [(addr,value) for addr,value,_ in user.trace[1:]] == [(4,4),(5,5)]
+    assert user.trace[2][2] - user.trace[1][2] == 1
+    assert (cache.hits,cache.misses,cache.mshr_merges) == (2,2,1)
+    assert cache.hit_rate == 0.5
+    # cache 的访问不会修改 memory 的 tag
+    assert memory.memory_tag[4] == memory.memory_tag[5] == 1
+
+
+def test_write_back_and_replacement():
+    for replacement in ['lru','plru','random']:
+        def script(user:CacheUser):
+            # 1 个 set, 2 个 way, 访问 0 1 0 2 时 lru/plru 替换 1
+            user.port.write(0,100,num_elements=16,num_batch_size=1)
+            read_and_record(user,1)
+            read_and_record(user,0)
+            read_and_record(user,2)
+            read_and_record(user,0)
+
+        cache, memory, user = run_cache(script,num_sets=1,num_ways=2,replacement=replacement)
+        if replacement == 'random':
+            assert cache.evictions == cache.misses - 2
+            continue
+        assert [value for _,value,_ in user.trace] == [1,100,2,100]
+        assert (cache.hits,cache.misses,cache.evictions,cache.writebacks) == (2,3,1,0)
+        # 写入只在 cache 中
+        assert memory.memory_data[0] == 0
+
+        cache.flush()
+        SimSession.scheduler.run()
+        assert memory.memory_data[0] == 100
+        assert memory.memory_tag[0] == 1
+
+
+def test_write_through_and_mshr_stall():
+    def script(user:CacheUser):
+        user.port.write(3,300,num_elements=16,num_batch_size=1)
+        handles = [user.port.issue_read(addr,num_elements=16,num_batch_size=1) for addr in (8,16,24)]
+        user.trace.append([user.port.wait(handle) for handle in handles])
+        SimModule.wait_time(SimTime(10))
+        read_and_record(user,3)
+
+    cache, memory, user = run_cache(script,num_sets=8,num_ways=4,write_policy='write_through',num_mshrs=1)
+    assert user.trace[0] == [8,16,24]
+    assert cache.mshr_stalls == 2
+    assert memory.memory_data[3] == 300
+    assert user.trace[1][1] == 300
+    assert cache.writebacks == 0
+
+
+def test_write_allocate_unwritten():
+    def script(user:CacheUser):
+        # write allocate 时 fill 整个 line, 10 和 11 都没有写入过
+        user.port.write(10,'x',num_elements=16,num_batch_size=1)
+        read_and_record(user,10)
+        read_and_record(user,11)
+
+    for line_size in [1,2]:
+        cache, memory, user = run_cache(script,num_chunks=0,line_size=line_size)
+        assert [value for _,value,_ in user.trace] == ['x',None]
+        assert cache.misses == (2 if line_size == 1 else 1)
+
+        cache.flush()
+        SimSession.scheduler.run()
+        assert memory.memory_data[10] == 'x'
+
+
+def test_outstanding_hits():
+    def script(user:CacheUser):
+        read_and_record(user,0)
+        read_and_record(user,1)
+        start = SimSession.sim_time.cycle
+        # 两个 outstanding 的 hit 共享 port 的 finish event, 后一个不能推迟前一个的唤醒
+        first = user.port.issue_read(0,num_elements=16,num_batch_size=1)
+        SimModule.wait_time(SimTime(2))
+        second = user.port.issue_read(1,num_elements=16,num_batch_size=1)
+        user.port.wait(first)
+        user.trace.append(SimSession.sim_time.cycle - start)
+        user.port.wait(second)
+        user.trace.append(SimSession.sim_time.cycle - start)
+
+    cache, memory, user = run_cache(script,hit_latency=5)
+    assert user.trace[2:] == [5,7]
+    assert cache.hits == 2
@@ -0,0 +1,53 @@
+from Desim.Core import SimSession, SimModule, SimTime
+from Desim.module.Channel import CreditChannel
+
+
+class Link(SimModule):
+    def __init__(self,channel:CreditChannel,num_flits:int,batch:bool):
+        super().__init__()
+        self.channel = channel
+        self.num_flits = num_flits
+        self.batch = batch
+        self.trace = []
+
+        self.register_coroutine(self.sender)
+        self.register_coroutine(self.receiver)
+
+    def sender(self):
+        SimModule.wait_time(SimTime(1))
+        if self.batch:
+            self.channel.send_n(range(self.num_flits))
+        else:
+            for flit in range(self.num_flits):
+                self.channel.send(flit)
+
+    def receiver(self):
+        for _ in range(self.num_flits):
+            self.trace.append((self.channel.receive(),SimSession.sim_time.cycle))
+
+
+def run_link(num_flits:int,batch:bool,**kwargs)->Link:
+    SimSession.reset()
+    SimSession.init()
+    link = Link(CreditChannel(**kwargs),num_flits,batch)
+    SimSession.scheduler.run()
+    return link
+
+
+def test_credit_flow_control():
+    for batch in [False,True]:
+        link = run_link(8,batch,credits=4,latency=2,bandwidth=2)
+        channel = link.channel
+        assert link.trace == [(0,3),(1,3),(2,4),(3,4),(4,7),(5,7),(6,8),(7,8)]
+        # 第 3, 4 个 flit 因为带宽顺延, 之后两次等待 credit
+        assert channel.bandwidth_stalls == 2
+        assert channel.credit_stalls == 2
+        assert channel.flits_sent == channel.flits_received == 8
+        assert channel.throughput(8) == 1.0
+
+
+def test_credit_latency():
+    # credit 立即返回, 但是 2 个 credit 不足以覆盖 3 个周期的 latency
+    link = run_link(6,False,credits=2,latency=3,bandwidth=1,credit_latency=0)
+    assert [cycle for _,cycle in link.trace] == [4,5,7,8,10,11]
+    assert link.channel.credit_stalls == 4
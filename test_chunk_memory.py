@@ -0,0 +1,333 @@
+import pytest
+
+from Desim.Core import SimSession, SimModule, Event
+from Desim.memory.Memory import ChunkMemory, ChunkMemoryRequest, ChunkPacket, ChunkMemoryPort, DepMemory, DepMemoryPort
+from Desim.memory.Timing import BandwidthTiming, BankedTiming, ChunkMemoryTiming
+from Desim.memory.Storage import NumpyChunkStorage
+
+
+class Requester(SimModule):
+    # 同时提交所有的 request, 每个地址上依次为 read(等待写入) / write / read(clear) / write
+    def __init__(self,memory:ChunkMemory,num_addrs:int):
+        super().__init__()
+        self.memory = memory
+        self.num_addrs = num_addrs
+        self.finish_event = Event()
+        self.reqs:list[ChunkMemoryRequest] = []
+
+        self.register_coroutine(self.process)
+
+    def make_req(self,command:str,addr:int,**kwargs)->ChunkMemoryRequest:
+        return ChunkMemoryRequest(
+            port=None,
+            command=command,
+            addr=addr,
+            read_finish_event=self.finish_event,
+            write_finish_event=self.finish_event,
+            data=ChunkPacket(payload=addr,num_elements=16,batch_size=1,element_bytes=1),
+            **kwargs
+        )
+
+    def process(self):
+        for addr in range(self.num_addrs):
+            self.reqs.append(self.make_req('read',addr,expect_tag=1))
+            self.reqs.append(self.make_req('write',addr))
+            self.reqs.append(self.make_req('read',addr,expect_tag=1,clear=True))
+            self.reqs.append(self.make_req('write',addr))
+
+        for req in self.reqs:
+            if req.command == 'read':
+                self.memory.handle_read_request(req)
+            else:
+                self.memory.handle_write_request(req)
+
+
+def test_chunk_memory_dependency():
+    SimSession.reset()
+    SimSession.init()
+    memory = ChunkMemory()
+    requester = Requester(memory,8)
+    SimSession.scheduler.run()
+
+    # write 在 cycle 1 发射, 两个 read 等待 tag 之后同时发射, 第二个 write 等待 clear read 结束
+    finish_cycles = [req.expect_finish_time.cycle for req in requester.reqs]
+    assert finish_cycles == [3,2,3,4] * 8
+    assert all(req.status == 'finished' for req in requester.reqs)
+    assert all(req.data.payload == req.addr for req in requester.reqs)
+
+    assert not memory.waiting_reqs
+    assert not memory._running_reads and not memory._running_clear_reads and not memory._running_writes
+    assert all(memory.memory_tag[addr] == 1 for addr in range(8))
+
+
+class DMAEngine(SimModule):
+    # 单个 coroutine 通过一个 port 发出多个 outstanding 的 read
+    def __init__(self,memory:ChunkMemory,max_outstanding:int):
+        super().__init__()
+        self.port = ChunkMemoryPort(memory,max_outstanding=max_outstanding)
+        self.handles = []
+        self.values = []
+        self.finish_time = None
+
+        for addr in range(8):
+            memory.direct_write(addr,addr * 10)
+
+        self.register_coroutine(self.process)
+
+    def process(self):
+        handles = [self.port.issue_read(addr,tag_value=1,num_elements=64,num_batch_size=1) for addr in range(8)]
+
+        first = self.port.wait_any(handles)
+        assert first is handles[0]
+
+        self.handles = handles
+        self.values = [self.port.wait(handle) for handle in handles]
+        self.finish_time = SimSession.sim_time
+
+
+def run_dma(max_outstanding:int,timing=None,timing_only:bool=False,storage=None)->DMAEngine:
+    SimSession.reset()
+    SimSession.init()
+    engine = DMAEngine(ChunkMemory(timing=timing,timing_only=timing_only,storage=storage),max_outstanding)
+    SimSession.scheduler.run()
+    return engine
+
+
+def test_multi_outstanding_port():
+    serial = run_dma(1)
+    pipelined = run_dma(4)
+
+    assert serial.values == pipelined.values == [addr * 10 for addr in range(8)]
+    # 每个 read 需要 4 个周期, 4 个 outstanding 时分两批完成
+    assert serial.finish_time.cycle == 40
+    assert pipelined.finish_time.cycle == 10
+    assert all(req.done() for req in pipelined.port.outstanding_reqs)
+
+
+def test_banked_timing():
+    timing = BankedTiming(num_banks=4,bandwidth=32,bank_bandwidth=16)
+    engine = run_dma(8,timing)
+
+    assert engine.values == [addr * 10 for addr in range(8)]
+    # 每个 read 在 bank 上需要 4 个周期, 在总线上需要 2 个周期
+    # 8 个 read 同时在 cycle 1 发射, 受限于总带宽, 最后一个在 1 + 8 * 2 = 17 完成
+    assert engine.finish_time.cycle == 17
+    assert [handle.expect_finish_time.cycle for handle in engine.handles] == [5,5,7,9,11,13,15,17]
+    assert timing.bank_conflicts == 4
+    bus, banks = timing.utilization(16)
+    assert bus == 1.0 and banks == [0.5] * 4
+
+
+def test_custom_timing():
+    class FixedTiming(ChunkMemoryTiming):
+        def submit(self,req,now):
+            return 3
+
+    class MissingSubmit(ChunkMemoryTiming):
+        pass
+
+    # 没有实现 submit 的时序模型在创建时报错, 而不是在第一个 req 发射时
+    with pytest.raises(TypeError):
+        MissingSubmit()
+    # 8 个 read 同时在 cycle 1 发射, 都是固定的 3 个周期
+    engine = run_dma(8,FixedTiming())
+    assert engine.values == [addr * 10 for addr in range(8)]
+    assert [handle.expect_finish_time.cycle for handle in engine.handles] == [4] * 8
+
+
+class DepProducerConsumer(SimModule):
+    def __init__(self,memory:DepMemory):
+        super().__init__()
+        self.producer_port = DepMemoryPort()
+        self.consumer_port = DepMemoryPort()
+        self.producer_port.config_dep_memory(memory)
+        self.consumer_port.config_dep_memory(memory)
+        self.trace = []
+
+        self.register_coroutine(self.producer)
+        self.register_coroutine(self.consumer)
+
+    def producer(self):
+        for i in range(4):
+            self.producer_port.write(i,None if self.producer_port.timing_only else [i] * 1024)
+
+    def consumer(self):
+        for i in reversed(range(4)):
+            value = self.consumer_port.read(i,tag_value=1,clear=True)
+            self.trace.append((i,SimSession.sim_time.cycle,value))
+
+
+def run_dep_memory(timing_only:bool)->tuple[DepMemory,list]:
+    SimSession.reset()
+    SimSession.init()
+    memory = DepMemory(timing_only=timing_only)
+    module = DepProducerConsumer(memory)
+    SimSession.scheduler.run()
+    return memory, module.trace
+
+
+def test_timing_only():
+    full = run_dma(4)
+    timing_only = run_dma(4,timing_only=True)
+    assert timing_only.finish_time == full.finish_time
+    assert timing_only.values == [None] * 8
+    assert all(handle.data.payload is None for handle in timing_only.handles)
+
+    memory, trace = run_dep_memory(False)
+    timing_memory, timing_trace = run_dep_memory(True)
+    assert [(addr,cycle) for addr,cycle,_ in trace] == [(addr,cycle) for addr,cycle,_ in timing_trace]
+    assert [value[0] for _,_,value in trace] == [3,2,1,0]
+    assert [value for _,_,value in timing_trace] == [None] * 4
+    assert not timing_memory.memory_data
+    assert all(timing_memory.memory_tag[addr] == 0 for addr in range(4))
+
+
+def test_numpy_storage(tmp_path):
+    np = pytest.importorskip('numpy')
+
+    for path in [None, tmp_path / 'chunks.bin']:
+        storage = NumpyChunkStorage(8,(4,16),'float32',path=path)
+        engine = run_dma(8,storage=storage)
+
+        # chunk 大小为 4 * 16 * 4 bytes, 带宽 16 bytes/cycle
+        assert storage.chunk_bytes == 256
+        assert all(handle.chunk_bytes == 256 for handle in engine.handles)
+        assert engine.finish_time.cycle == 17
+
+        for addr, value in enumerate(engine.values):
+            assert value.shape == (4,16)
+            assert np.all(value == addr * 10)
+            assert not value.flags.writeable
+            assert np.shares_memory(value, storage.array)
+
+
+class PreloadReader(SimModule):
+    def __init__(self,memory:ChunkMemory):
+        super().__init__()
+        self.port = ChunkMemoryPort(memory,max_outstanding=4)
+        self.values = []
+        self.register_coroutine(self.process)
+
+    def process(self):
+        handles = [self.port.issue_read(addr,tag_value=1) for addr in range(100,104)]
+        self.values = [self.port.wait(handle) for handle in handles]
+
+
+def test_preload_and_dump(tmp_path):
+    np = pytest.importorskip('numpy')
+    weights = np.arange(1000 * 4 * 16,dtype='float32').reshape(1000,4,16)
+    np.save(tmp_path / 'weights.npy',weights)
+    weights.tofile(tmp_path / 'weights.bin')
+
+    sources = [weights, tmp_path / 'weights.npy', tmp_path / 'weights.bin']
+    for source in sources:
+        for storage in [None, NumpyChunkStorage(2000,(4,16),'float32')]:
+            SimSession.reset()
+            SimSession.init()
+            memory = ChunkMemory(storage=storage)
+            memory.preload(range(100,1100),source,dtype='float32',chunk_shape=(4,16))
+            reader = PreloadReader(memory)
+            SimSession.scheduler.run()
+
+            assert memory.memory_tag[100] == memory.memory_tag[1099] == 1
+            assert all(np.array_equal(value,weights[i]) for i,value in enumerate(reader.values))
+
+            memory.dump(range(100,1100),tmp_path / 'dump.npy')
+            assert np.array_equal(np.load(tmp_path / 'dump.npy'),weights)
+            memory.dump(range(100,1100),tmp_path / 'dump.bin')
+            assert np.array_equal(np.fromfile(tmp_path / 'dump.bin','float32').reshape(1000,4,16),weights)
+
+    SimSession.reset()
+    SimSession.init()
+    dep_memory = DepMemory()
+    dep_memory.preload(range(0,2000,2),tmp_path / 'weights.bin',dtype='float32')
+    assert dep_memory.memory_data[1998].shape == (64,)
+    dep_memory.dump(range(0,4),tmp_path / 'dep.npy')
+    dumped = np.load(tmp_path / 'dep.npy')
+    assert np.array_equal(dumped[2],weights[1].ravel()) and not dumped[1].any()
+
+    timing_memory = DepMemory(timing_only=True)
+    timing_memory.preload(range(10))
+    assert timing_memory.memory_tag[9] == 1 and not timing_memory.memory_data
+
+
+class BlockedPreloadReader(SimModule):
+    # reader 先阻塞在 tag 1 上, 之后在仿真过程中 preload
+    def __init__(self,memory:ChunkMemory|DepMemory,port:ChunkMemoryPort|DepMemoryPort):
+        super().__init__()
+        self.memory = memory
+        self.port = port
+        self.finish_cycle = None
+        self.register_coroutine(self.reader)
+        self.register_coroutine(self.loader)
+
+    def reader(self):
+        self.port.read(5,tag_value=1)
+        self.finish_cycle = SimSession.sim_time.cycle
+
+    def loader(self):
+        SimModule.wait_cycles(10)
+        self.memory.preload(range(4,8),tag=1)
+
+
+def test_preload_wakes_blocked_reader():
+    for memory_type in [ChunkMemory,DepMemory]:
+        SimSession.reset()
+        SimSession.init(on_deadlock='raise')
+        memory = memory_type(timing_only=True)
+        if memory_type is ChunkMemory:
+            port = ChunkMemoryPort(memory)
+        else:
+            port = DepMemoryPort()
+            port.config_dep_memory(memory)
+        reader = BlockedPreloadReader(memory,port)
+        SimSession.scheduler.run()
+
+        assert reader.finish_cycle is not None and reader.finish_cycle > 10
+        assert memory.memory_tag[5] == 1
+
+
+class BurstUser(SimModule):
+    def __init__(self,memory:ChunkMemory):
+        super().__init__()
+        self.port = ChunkMemoryPort(memory)
+        self.handles = []
+        self.values = []
+        self.register_coroutine(self.process)
+
+    def process(self):
+        self.port.write_many(range(8),[addr * 10 for addr in range(8)],num_elements=16,num_batch_size=1)
+        self.handles = self.port.issue_read_many(range(8),tag_value=1,num_elements=16,num_batch_size=1)
+        self.values = self.port.wait_all(self.handles)
+
+
+def test_coalesce_burst():
+    for make_timing in [BandwidthTiming,lambda: BankedTiming(num_banks=1,bandwidth=32,bank_bandwidth=32,bank_latency=4)]:
+        finish = {}
+        for coalesce in [False,True]:
+            SimSession.reset()
+            SimSession.init()
+            memory = ChunkMemory(timing=make_timing(),coalesce=coalesce,max_burst=4)
+            user = BurstUser(memory)
+            SimSession.scheduler.run()
+
+            assert user.values == [addr * 10 for addr in range(8)]
+            finish[coalesce] = [handle.expect_finish_time.cycle for handle in user.handles]
+
+        # 合并只减少唤醒的次数, 不改变每个 req 的完成时间
+        assert finish[True] == finish[False]
+
+    # 单个 bank 上的 req 依次完成, 每个 req 需要 4 + 1 个周期
+    start = finish[True][0] - 5
+    assert finish[True] == [start + 5 * (i + 1) for i in range(8)]
+
+    # 合并之后 tag 依赖仍然按照地址单独处理
+    SimSession.reset()
+    SimSession.init()
+    memory = ChunkMemory(coalesce=True)
+    requester = Requester(memory,8)
+    SimSession.scheduler.run()
+    assert all(req.status == 'finished' for req in requester.reqs)
+    assert all(req.data.payload == req.addr for req in requester.reqs)
+    assert not memory.waiting_reqs and not memory._running_writes
+    assert all(memory.memory_tag[addr] == 1 for addr in range(8))
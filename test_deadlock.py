@@ -0,0 +1,136 @@
+import warnings
+
+import pytest
+
+from Desim.Core import SimSession, SimModule, SimTime, SimDeadlockError, Event
+from Desim.Sync import SimSemaphore
+from Desim.module.FIFO import FIFO
+
+
+class CrossWait(SimModule):
+    # 两个 coroutine 互相等待对方的 semaphore
+    def __init__(self):
+        super().__init__()
+        self.sem_a = SimSemaphore(0,'sem_a')
+        self.sem_b = SimSemaphore(0,'sem_b')
+
+        self.register_coroutine(self.worker_a)
+        self.register_coroutine(self.worker_b)
+
+    def worker_a(self):
+        SimModule.wait_time(SimTime(3))
+        self.sem_a.wait()
+        self.sem_b.post()
+
+    def worker_b(self):
+        self.sem_b.wait()
+        self.sem_a.post()
+
+
+class Service(SimModule):
+    # daemon 一直等待请求, 同时有一个 daemon 时钟一直运行
+    def __init__(self):
+        super().__init__()
+        self.requests = FIFO(4,name='requests')
+        self.served = []
+
+        self.register_coroutine(self.server,daemon=True)
+        self.register_coroutine(self.clock,daemon=True)
+
+    def server(self):
+        while True:
+            self.served.append(self.requests.read())
+
+    def clock(self):
+        while True:
+            SimModule.wait_time(SimTime(1))
+
+
+def test_deadlock_raise():
+    SimSession.reset()
+    SimSession.init(on_deadlock='raise')
+    CrossWait()
+    with pytest.raises(SimDeadlockError) as info:
+        SimSession.scheduler.run()
+
+    report = info.value.report
+    assert report.startswith('2 process(es) blocked at SimTime(cycle=3')
+    assert 'CrossWait.worker_a' in report and 'sem_a' in report
+    assert 'CrossWait.worker_b' in report and 'sem_b' in report
+    assert SimSession.scheduler.status == 'paused'
+
+
+def test_deadlock_warn_and_daemon():
+    SimSession.reset()
+    SimSession.init(on_deadlock='warn')
+    CrossWait()
+    with pytest.warns(RuntimeWarning, match='no pending events') as record:
+        SimSession.scheduler.run()
+    assert SimSession.scheduler.status == 'finished'
+    # 警告指向调用 run 的位置, 而不是 scheduler 的 main loop
+    assert [warning.filename for warning in record] == [__file__]
+
+    # 只有 daemon 阻塞时不报告
+    SimSession.reset()
+    SimSession.init(on_deadlock='raise')
+    service = Service()
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        assert SimSession.scheduler.run(until=20)
+    assert service.served == []
+
+
+class Starved(SimModule):
+    def __init__(self,service:Service):
+        super().__init__()
+        self.service = service
+        self.register_coroutine(self.client)
+
+    def client(self):
+        self.service.requests.write(2)
+        # 没有人会写入这个 FIFO
+        FIFO(1,name='reply').read()
+
+
+def test_watchdog():
+    SimSession.reset()
+    SimSession.init(on_deadlock='raise',watchdog=50)
+    service = Service()
+    Starved(service)
+    with pytest.raises(SimDeadlockError) as info:
+        SimSession.scheduler.run(until=1000)
+
+    assert 'no progress for 50 cycles' in info.value.report
+    assert 'Starved.client' in info.value.report
+    assert 'FIFO(reply, 0/1).empty' in info.value.report
+    assert SimSession.sim_time.cycle == 50
+    assert service.served == [2]
+
+
+class Crowd(SimModule):
+    # 大量 coroutine 等待同一个永远不会触发的 event
+    def __init__(self,num_waiters:int):
+        super().__init__()
+        self.never = Event()
+        for _ in range(num_waiters):
+            self.register_coroutine(self.waiter)
+
+    def waiter(self):
+        SimModule.wait(self.never)
+
+
+def test_report_size_with_many_waiters():
+    SimSession.reset()
+    SimSession.init(on_deadlock='raise')
+    Crowd(1000)
+    with pytest.raises(SimDeadlockError) as info:
+        SimSession.scheduler.run()
+
+    report = info.value.report
+    assert report.startswith('1000 process(es) blocked')
+    assert len(report) < 10_000
+    assert '+980 more process(es)' in report
+    # event 只列出一次, 等待者的名字最多显示 5 个
+    assert report.count('shared by') == 1
+    assert '+995 more' in report
+    assert '(1000 waiter(s))' in report
@@ -0,0 +1,56 @@
+from Desim.Core import SimSession, SimModule
+from Desim.memory.Memory import ChunkMemoryPort
+from Desim.memory.DRAM import DRAM, DRAMConfig
+
+
+class Reader(SimModule):
+    # 一次性发出所有的 read
+    def __init__(self,dram:DRAM,addrs:list[int]):
+        super().__init__()
+        self.port = ChunkMemoryPort(dram)
+        self.addrs = addrs
+        self.handles = []
+
+        self.register_coroutine(self.process)
+
+    def process(self):
+        self.handles = [self.port.issue_read(addr,tag_value=1,num_elements=32,num_batch_size=1) for addr in self.addrs]
+        for handle in self.handles:
+            self.port.wait(handle)
+
+
+def run_dram(addrs:list[int],**kwargs)->tuple[DRAM,Reader]:
+    SimSession.reset()
+    SimSession.init()
+    dram = DRAM(DRAMConfig(**kwargs),timing_only=True)
+    dram.preload(range(1024))
+    reader = Reader(dram,addrs)
+    SimSession.scheduler.run()
+    return dram, reader
+
+
+def test_row_buffer_hits():
+    # 同一个 row 中的连续访问, 只有第一次需要 activate
+    dram, reader = run_dram(list(range(16)),chunks_per_row=16,tRCD=10,tCAS=5,channel_bandwidth=32)
+    assert (dram.row_hits,dram.row_misses,dram.row_conflicts) == (15,1,0)
+    assert dram.row_hit_rate == 15 / 16
+
+    finish = [handle.expect_finish_time.cycle for handle in reader.handles]
+    # cycle 1 发射, 第一次 10 + 5 + 1, 之后每次 5 + 1
+    assert finish == [17 + 6 * i for i in range(16)]
+    assert dram.transferred_bytes == 16 * 32
+    assert dram.achieved_bandwidth(finish[-1]) == 16 * 32 / finish[-1]
+
+
+def test_fr_fcfs_and_banks():
+    # 地址 0 和 64 位于 bank 0 的不同 row, 16 位于 bank 1
+    config = dict(chunks_per_row=16,banks=4,tRCD=10,tRP=10,tCAS=5,channel_bandwidth=32)
+    dram, reader = run_dram([0,64,1,16],**config)
+
+    finish = {handle.addr: handle.expect_finish_time.cycle for handle in reader.handles}
+    # bank 0 先服务 0, 之后 row hit 的 1 越过更早的 64, 最后 64 需要关闭 row
+    assert finish[0] < finish[1] < finish[64]
+    assert finish[64] - finish[1] == 10 + 10 + 5 + 1
+    # bank 1 与 bank 0 并行, 只需要等待数据总线
+    assert finish[16] == finish[0] + 1
+    assert (dram.row_hits,dram.row_misses,dram.row_conflicts) == (1,2,1)
@@ -1,5 +1,7 @@
+import pytest
+
 from Desim.Core import SimModule, SimTime, SimSession
-from Desim.module.FIFO import DelayFIFO
+from Desim.module.FIFO import FIFO, DelayFIFO
 
 
 class TestDelayFifo(SimModule):
@@ -25,6 +27,162 @@ class TestDelayFifo(SimModule):
             SimModule.wait_time(SimTime(1))
 
 
+class BatchFifoUser(SimModule):
+    def __init__(self,fifo:FIFO):
+        super().__init__()
+        self.fifo = fifo
+        self.trace = []
+
+        self.register_coroutine(self.producer)
+        self.register_coroutine(self.consumer)
+
+    def producer(self):
+        self.fifo.write_n(range(6))
+        # 空间不足时等待 consumer 读出
+        self.fifo.write_n(range(6,10))
+        self.trace.append(('write',SimSession.sim_time.cycle))
+
+    def consumer(self):
+        SimModule.wait_time(SimTime(2))
+        self.trace.append(('peek',self.fifo.peek()))
+        self.trace.append(('read',self.fifo.read_n(3)))
+        SimModule.wait_time(SimTime(1))
+        self.trace.append(('available',self.fifo.read_available()))
+        self.trace.append(('available',self.fifo.read_available()))
+        self.trace.append(('peek',self.fifo.peek()))
+
+
+def test_batch_read_write():
+    for fifo_type in [FIFO,DelayFIFO]:
+        SimSession.reset()
+        SimSession.init()
+        user = BatchFifoUser(fifo_type(8))
+        SimSession.scheduler.run()
+
+        assert user.trace == [
+            ('peek',0),('read',[0,1,2]),('write',2),
+            ('available',[3,4,5,6,7,8,9]),('available',[]),('peek',None)
+        ]
+        assert user.fifo.free_count == 8
+        assert user.fifo.is_empty()
+
+    with pytest.raises(ValueError):
+        FIFO(2).write_n(range(3))
+
+
+
+class BlockingFifoUser(SimModule):
+    def __init__(self):
+        super().__init__()
+        self.fifo = FIFO(2,name='blocking')
+        self.trace = []
+
+        self.register_coroutine(self.producer)
+        self.register_coroutine(self.consumer)
+        self.register_coroutine(self.watcher)
+
+    def producer(self):
+        for i in range(4):
+            self.fifo.write(i)
+            self.trace.append(('write',i,SimSession.sim_time))
+
+    def consumer(self):
+        SimModule.wait_time(SimTime(3))
+        for i in range(4):
+            self.trace.append(('read',self.fifo.read(),SimSession.sim_time))
+
+    def watcher(self):
+        SimModule.wait_time(SimTime(1))
+        self.fifo.wait_empty()
+        self.trace.append(('empty',SimSession.sim_time.cycle))
+
+
+def test_blocking_semantics():
+    SimSession.reset()
+    SimSession.init()
+    user = BlockingFifoUser()
+    SimSession.scheduler.run()
+
+    writes = [time for op,_,time in user.trace[:-1] if op == 'write']
+    reads = [time for op,_,time in user.trace[:-1] if op == 'read']
+    # 前两次写入不阻塞, 之后等待 read 释放位置, 在下一个 delta cycle 被唤醒
+    assert writes == [SimTime(0,0),SimTime(0,0),SimTime(3,2),SimTime(3,2)]
+    assert [value for op,value,_ in user.trace[:-1] if op == 'read'] == [0,1,2,3]
+    assert reads == [SimTime(3,1),SimTime(3,1),SimTime(3,3),SimTime(3,3)]
+    # 在变为空之后的下一个 cycle 通知
+    assert user.trace[-1] == ('empty',4)
+    assert user.fifo.free_count == 2 and user.fifo.is_empty()
+
+
+
+class DelayFifoUser(SimModule):
+    def __init__(self):
+        super().__init__()
+        self.fifo = DelayFIFO(4)
+        self.trace = []
+
+        self.register_coroutine(self.producer)
+        self.register_coroutine(self.consumer)
+
+    def producer(self):
+        SimModule.wait_time(SimTime(1))
+        self.fifo.delay_write('a',SimTime(5))
+        # ready time 更早, 但是不能越过 a
+        self.fifo.delay_write('b',SimTime(2))
+        SimModule.wait_time(SimTime(1))
+        self.fifo.delay_write('c',SimTime(10))
+
+    def consumer(self):
+        for _ in range(3):
+            value = self.fifo.read()
+            self.trace.append((value,SimSession.sim_time.cycle))
+        self.trace.append(('peek',self.fifo.peek(),self.fifo.is_empty()))
+
+
+def test_delay_fifo_ready_time():
+    SimSession.reset()
+    SimSession.init()
+    user = DelayFifoUser()
+    SimSession.scheduler.run()
+
+    # reader 在 ready time 所在的 cycle 被唤醒
+    assert user.trace == [('a',6),('b',6),('c',12),('peek',None,True)]
+    assert user.fifo.free_count == 4
+
+
+
+class ZeroDelayFifoUser(SimModule):
+    def __init__(self):
+        super().__init__()
+        self.fifo = DelayFIFO(4)
+        self.trace = []
+
+        self.register_coroutine(self.producer)
+        self.register_coroutine(self.consumer)
+
+    def producer(self):
+        # consumer 已经阻塞在 read 上
+        SimModule.wait_time(SimTime(2))
+        self.fifo.delay_write('a',SimTime(0,0))
+        self.fifo.delay_write_n(['b','c'],SimTime(0,0))
+
+    def consumer(self):
+        for _ in range(3):
+            value = self.fifo.read()
+            self.trace.append((value,SimSession.sim_time.cycle))
+
+
+def test_delay_fifo_zero_delay():
+    SimSession.reset()
+    SimSession.init(on_deadlock='raise')
+    user = ZeroDelayFifoUser()
+    SimSession.scheduler.run()
+
+    # SimTime(0,0) 与普通的 write 一样在下一个 delta cycle 可读
+    assert user.trace == [('a',2),('b',2),('c',2)]
+    assert user.fifo.free_count == 4
+
+
 if __name__ == '__main__':
     SimSession.reset()
     SimSession.init()
@@ -0,0 +1,80 @@
+from Desim.Core import SimModule, SimSession, SimTime, Event
+
+
+class Counter(SimModule):
+    def __init__(self):
+        super().__init__()
+
+        self.tick = Event()
+        self.other = Event()
+
+        self.static_trace = []
+        self.dynamic_trace = []
+        self.override_trace = []
+
+        self.register_coroutine(self.driver)
+        self.register_method(self.on_tick, self.tick, dont_initialize=True)
+        self.register_method(self.dynamic)
+        self.register_method(self.override, self.tick, dont_initialize=True)
+
+    def driver(self):
+        for i in range(5):
+            self.tick.notify(SimTime(1))
+            SimModule.wait_time(SimTime(2))
+        self.other.notify(SimTime(1))
+
+    def on_tick(self):
+        self.static_trace.append(SimSession.sim_time.cycle)
+
+    def dynamic(self):
+        # 首先等待 3 个周期, 之后等待 other, 最后恢复到静态敏感列表 (为空, 不再触发)
+        self.dynamic_trace.append(SimSession.sim_time.cycle)
+        if len(self.dynamic_trace) == 1:
+            SimModule.next_trigger(SimTime(3))
+        elif len(self.dynamic_trace) == 2:
+            SimModule.next_trigger(self.other)
+
+    def override(self):
+        # 第一次触发之后等待 3 个周期, 期间 tick 的触发被忽略
+        self.override_trace.append(SimSession.sim_time.cycle)
+        if len(self.override_trace) == 1:
+            SimModule.next_trigger(SimTime(3))
+
+
+class WaitInMethod(SimModule):
+    def __init__(self):
+        super().__init__()
+        self.register_method(self.process)
+
+    def process(self):
+        SimModule.wait_time(SimTime(1))
+
+
+def test_method():
+    SimSession.reset()
+    SimSession.init()
+    module = Counter()
+    SimSession.scheduler.run()
+
+    assert module.static_trace == [1, 3, 5, 7, 9]
+    assert module.dynamic_trace == [0, 3, 11]
+    assert module.override_trace == [1, 4, 5, 7, 9]
+
+
+def test_wait_in_method():
+    SimSession.reset()
+    SimSession.init()
+    WaitInMethod()
+    try:
+        SimSession.scheduler.run()
+    except RuntimeError:
+        return
+    assert False, 'wait inside a method should raise'
+
+
+if __name__ == '__main__':
+    SimSession.reset()
+    SimSession.init()
+    module = Counter()
+    SimSession.scheduler.run()
+    print(f"dynamic trigger at {module.dynamic_trace}")
@@ -0,0 +1,199 @@
+from Desim.Core import SimSession, SimModule, Event, SimTime, Scheduler
+
+
+class PingPong(SimModule):
+    def __init__(self):
+        super().__init__()
+        self.ping = Event()
+        self.pong = Event()
+        self.cancelled = Event()
+        self.trace = []
+
+        self.register_coroutine(self.producer)
+        self.register_coroutine(self.consumer)
+
+    def producer(self):
+        for i in range(5):
+            self.ping.notify(SimTime(1))
+            # 重复 notify 会更新 notify time
+            self.ping.notify(SimTime(2))
+            self.cancelled.notify(SimTime(1))
+            self.cancelled.cancel()
+            SimModule.wait(self.pong)
+
+    def consumer(self):
+        for i in range(5):
+            SimModule.wait(self.ping, self.cancelled)
+            self.trace.append(SimSession.sim_time.cycle)
+            self.pong.notify(SimTime(3))
+
+
+def run_ping_pong(backend:str,check_level:str='never')->list[int]:
+    SimSession.reset()
+    SimSession.init(event_queue=backend,check_level=check_level,check_interval=3)
+    module = PingPong()
+    SimSession.scheduler.run()
+    return module.trace
+
+
+def test_event_queue_backends():
+    expected = [2, 7, 12, 17, 22]
+    for backend in Scheduler.event_queue_backends:
+        assert run_ping_pong(backend) == expected, backend
+
+
+def test_sim_time_arithmetic():
+    assert SimTime(5,0) + SimTime(2) == SimTime(7,0)
+    assert SimTime(0,3) + SimTime(2) == SimTime(2,4)
+    assert SimTime(5,3) + SimTime(0) == SimTime(5,4)
+    assert SimTime(7,1) - SimTime(5,0) == SimTime(2,0)
+    assert SimTime(7,1) - SimTime(0,0) == SimTime(7,1)
+    assert SimTime(3,0) < SimTime(3,1) < SimTime(4,0)
+    assert SimTime(1000,2).cycle == 1000 and SimTime(1000,2).delta_cycle == 2
+    assert SimTime(3) is SimTime(3)
+    assert {SimTime(1,0): 'a'}[SimTime(1,0)] == 'a'
+    assert repr(SimTime(2,0)) == 'SimTime(cycle=2, delta_cycle=0)'
+
+
+class Waiter(SimModule):
+    def __init__(self):
+        super().__init__()
+        self.time_trace = []
+        self.cycles_trace = []
+
+        self.register_coroutine(self.by_time)
+        self.register_coroutine(self.by_cycles)
+
+    def by_time(self):
+        for delay in [0, 0, 3, 0, 5]:
+            SimModule.wait_time(SimTime(delay))
+            self.time_trace.append(SimSession.sim_time)
+
+    def by_cycles(self):
+        for delay in [0, 0, 3, 0, 5]:
+            SimModule.wait_cycles(delay)
+            self.cycles_trace.append(SimSession.sim_time)
+
+
+def test_wait_cycles():
+    for backend in Scheduler.event_queue_backends:
+        SimSession.reset()
+        SimSession.init(event_queue=backend)
+        module = Waiter()
+        SimSession.scheduler.run()
+        assert module.time_trace == module.cycles_trace
+        assert module.cycles_trace[-1] == SimTime(8,0)
+
+
+class QueuedNotify(SimModule):
+    def __init__(self):
+        super().__init__()
+        self.event = Event()
+        self.trace = []
+
+        self.register_coroutine(self.producer)
+        self.register_method(self.consumer, self.event, dont_initialize=True)
+
+    def producer(self):
+        # 多次 queue_notify 不会相互覆盖
+        for delay in [5, 2, 9, 2]:
+            self.event.queue_notify(SimTime(delay))
+        SimModule.wait_time(SimTime(3))
+        self.event.queue_notify(SimTime(0))
+
+    def consumer(self):
+        self.trace.append(SimSession.sim_time)
+
+
+def test_queue_notify():
+    for backend in Scheduler.event_queue_backends:
+        SimSession.reset()
+        SimSession.init(event_queue=backend)
+        module = QueuedNotify()
+        SimSession.scheduler.run()
+        assert module.trace == [SimTime(2,1), SimTime(3,2), SimTime(5,1), SimTime(9,1)], module.trace
+
+
+class Ticker(SimModule):
+    def __init__(self, ticks:int):
+        super().__init__()
+        self.ticks = ticks
+        self.count = 0
+        self.register_coroutine(self.process)
+
+    def process(self):
+        for i in range(self.ticks):
+            SimModule.wait_cycles(1)
+            self.count += 1
+
+
+def test_run_control():
+    SimSession.reset()
+    SimSession.init()
+    ticker = Ticker(100)
+    scheduler = SimSession.scheduler
+
+    assert scheduler.run(until=10)
+    assert ticker.count == 10 and SimSession.sim_time.cycle == 10
+    assert scheduler.status == 'paused'
+
+    # 继续运行到 SimTime(20, 0)
+    assert scheduler.run(until=SimTime(20,0))
+    assert ticker.count == 20
+
+    assert scheduler.run(max_events=5)
+    assert ticker.count == 25
+
+    # step 每次推进一个时间点, 下一次 step 时运行被唤醒的 coroutine
+    scheduler.step()
+    assert ticker.count == 25 and SimSession.sim_time.cycle == 26
+    scheduler.step()
+    assert ticker.count == 26
+
+    assert not scheduler.run()
+    assert ticker.count == 100 and scheduler.status == 'finished'
+
+    # 结束之后可以添加新的 module 继续运行
+    other = Ticker(5)
+    SimSession.scheduler.add_module(other)
+    scheduler.run()
+    assert other.count == 5 and SimSession.sim_time.cycle == 105
+
+
+class NestedRun(SimModule):
+    def __init__(self):
+        super().__init__()
+        self.error = None
+        self.register_coroutine(self.process)
+
+    def process(self):
+        SimModule.wait_cycles(1)
+        try:
+            SimSession.scheduler.run()
+        except RuntimeError as error:
+            self.error = error
+        SimModule.wait_cycles(1)
+
+
+def test_nested_run():
+    SimSession.reset()
+    SimSession.init()
+    module = NestedRun()
+    SimSession.scheduler.run()
+
+    # 在仿真内部调用 run 会报错, 外层的 run 正常结束
+    assert isinstance(module.error,RuntimeError)
+    assert SimSession.scheduler.status == 'finished'
+    assert SimSession.sim_time.cycle == 2
+
+
+def test_check_levels():
+    for check_level in ['never','sampled','always']:
+        for backend in Scheduler.event_queue_backends:
+            assert run_ping_pong(backend,check_level) == [2, 7, 12, 17, 22], (backend,check_level)
+    SimSession.init()
+
+
+if __name__ == '__main__':
+    for backend in Scheduler.event_queue_backends:
+        print(f"{backend}: {run_ping_pong(backend)}")
@@ -1,5 +1,5 @@
 from Desim.Core import SimSession, SimModule
-from Desim.Sync import SimSemaphore, SimOrderedSemaphore
+from Desim.Sync import SimSemaphore, SimOrderedSemaphore, SimDelaySemaphore
 from Desim.Core import SimTime
 
 
@@ -36,6 +36,35 @@ class TestSemaphore(SimModule):
 
 
 
+class DelayPoster(SimModule):
+    def __init__(self,delay_time:SimTime):
+        super().__init__()
+        self.semaphore = SimDelaySemaphore(0)
+        self.delay_time = delay_time
+        self.acquired = None
+
+        self.register_coroutine(self.poster)
+        self.register_coroutine(self.waiter)
+
+    def poster(self):
+        SimModule.wait_time(SimTime(1))
+        self.semaphore.post_n(2,self.delay_time)
+
+    def waiter(self):
+        self.semaphore.wait_n(2)
+        self.acquired = SimSession.sim_time
+
+
+def test_delay_semaphore_zero_delay():
+    # SimTime(0,0) 与 SimTime(0) 一样在下一个 delta cycle 生效
+    for delay_time in [SimTime(0,0),SimTime(0),SimTime(3)]:
+        SimSession.reset()
+        SimSession.init(on_deadlock='raise')
+        module = DelayPoster(delay_time)
+        SimSession.scheduler.run()
+        assert module.acquired is not None
+        assert module.acquired.cycle == 1 + delay_time.cycle
+        assert module.semaphore.get_value() == 0
 
 
 if __name__ == '__main__':